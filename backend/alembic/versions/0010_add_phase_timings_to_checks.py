@@ -0,0 +1,30 @@
+"""add phase timing columns to checks
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PHASE_COLUMNS = ["dns_time", "connect_time", "tls_time", "ttfb_time", "download_time"]
+
+
+def upgrade() -> None:
+    for name in PHASE_COLUMNS:
+        op.add_column("checks", sa.Column(name, sa.Integer(), nullable=True))
+    op.add_column("checks", sa.Column("connection_reused", sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("checks", "connection_reused")
+    for name in reversed(PHASE_COLUMNS):
+        op.drop_column("checks", name)
@@ -0,0 +1,24 @@
+"""add max_response_bytes to monitors
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("monitors", sa.Column("max_response_bytes", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("monitors", "max_response_bytes")
@@ -0,0 +1,30 @@
+"""add partial index for the missed-heartbeat sweep
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HEARTBEAT_WHERE = sa.text("monitor_type = 'heartbeat' AND is_active")
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_monitors_heartbeat_last_ping", "monitors", ["last_ping_at"],
+        postgresql_where=HEARTBEAT_WHERE,
+        sqlite_where=HEARTBEAT_WHERE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_monitors_heartbeat_last_ping", table_name="monitors")
@@ -0,0 +1,38 @@
+"""create check_rollups table
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0014"
+down_revision: Union[str, None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "check_rollups",
+        sa.Column("monitor_id", sa.String(36), sa.ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("period", sa.String(10), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("up", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("degraded", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("down", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("latency_sum", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("latency_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("latency_min", sa.Integer(), nullable=True),
+        sa.Column("latency_max", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("monitor_id", "period", "bucket_start"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("check_rollups")
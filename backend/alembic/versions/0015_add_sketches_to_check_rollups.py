@@ -0,0 +1,24 @@
+"""add latency sketches to check_rollups
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0015"
+down_revision: Union[str, None] = "0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("check_rollups", sa.Column("sketches", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("check_rollups", "sketches")
@@ -0,0 +1,45 @@
+"""create incidents table
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0016"
+down_revision: Union[str, None] = "0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN_WHERE = sa.text("resolved_at IS NULL")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "incidents",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("monitor_id", sa.String(36), sa.ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("peak_status", sa.String(20), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("resolved_at", sa.DateTime(), nullable=True),
+        sa.Column("duration_seconds", sa.Integer(), nullable=True),
+        sa.Column("first_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_incidents_monitor_started", "incidents", ["monitor_id", "started_at"])
+    op.create_index(
+        "ix_incidents_open", "incidents", ["monitor_id"],
+        postgresql_where=OPEN_WHERE,
+        sqlite_where=OPEN_WHERE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_incidents_open", table_name="incidents")
+    op.drop_index("ix_incidents_monitor_started", table_name="incidents")
+    op.drop_table("incidents")
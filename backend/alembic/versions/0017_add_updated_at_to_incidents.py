@@ -0,0 +1,26 @@
+"""add updated_at to incidents
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0017"
+down_revision: Union[str, None] = "0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("incidents", sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()))
+    op.create_index("ix_incidents_monitor_updated", "incidents", ["monitor_id", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_incidents_monitor_updated", table_name="incidents")
+    op.drop_column("incidents", "updated_at")
@@ -0,0 +1,30 @@
+"""create sla_report_deliveries table
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0018"
+down_revision: Union[str, None] = "0017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sla_report_deliveries",
+        sa.Column("user_id", sa.String(36), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("month", sa.String(7), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("user_id", "month"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sla_report_deliveries")
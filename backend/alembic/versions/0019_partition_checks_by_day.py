@@ -0,0 +1,115 @@
+"""partition checks by day (Postgres)
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-18 00:00:00.000000
+
+Rebuilds checks as a table range-partitioned on checked_at, one partition per
+UTC day (checks_pYYYYMMDD) from the oldest stored check to a week ahead, plus
+checks_default for anything outside them. Existing rows are copied over, so
+run it in a maintenance window on large tables. The primary key becomes
+(id, checked_at) because Postgres requires the partition key in it.
+
+No-op on other databases.
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0019"
+down_revision: Union[str, None] = "0018"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREMAKE_DAYS = 7
+
+COLUMNS = (
+    "id, monitor_id, status, status_code, response_time, dns_time, connect_time, "
+    "tls_time, ttfb_time, download_time, connection_reused, error_message, checked_at, ai_analysis"
+)
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    if not _is_postgres():
+        return
+    conn = op.get_bind()
+
+    op.rename_table("checks", "checks_unpartitioned")
+    op.execute("ALTER INDEX ix_checks_monitor_id RENAME TO ix_checks_unpartitioned_monitor_id")
+    op.execute("ALTER INDEX ix_checks_checked_at RENAME TO ix_checks_unpartitioned_checked_at")
+
+    op.execute("""
+        CREATE TABLE checks (
+            id VARCHAR(36) NOT NULL,
+            monitor_id VARCHAR(36) NOT NULL REFERENCES monitors(id) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL,
+            status_code INTEGER,
+            response_time INTEGER,
+            dns_time INTEGER,
+            connect_time INTEGER,
+            tls_time INTEGER,
+            ttfb_time INTEGER,
+            download_time INTEGER,
+            connection_reused BOOLEAN,
+            error_message TEXT,
+            checked_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            ai_analysis JSON,
+            PRIMARY KEY (id, checked_at)
+        ) PARTITION BY RANGE (checked_at)
+    """)
+    op.create_index("ix_checks_monitor_id", "checks", ["monitor_id"])
+    op.create_index("ix_checks_checked_at", "checks", ["checked_at"])
+    op.execute("CREATE TABLE checks_default PARTITION OF checks DEFAULT")
+
+    oldest = conn.execute(sa.text("SELECT min(checked_at) FROM checks_unpartitioned")).scalar()
+    today = datetime.utcnow().date()
+    day = oldest.date() if oldest else today
+    while day <= today + timedelta(days=PREMAKE_DAYS):
+        op.execute(
+            f"CREATE TABLE checks_p{day:%Y%m%d} PARTITION OF checks "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+        )
+        day += timedelta(days=1)
+
+    op.execute(
+        f"INSERT INTO checks ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM checks_unpartitioned WHERE checked_at IS NOT NULL"
+    )
+    op.drop_table("checks_unpartitioned")
+
+
+def downgrade() -> None:
+    if not _is_postgres():
+        return
+
+    op.rename_table("checks", "checks_partitioned")
+    op.execute("ALTER INDEX ix_checks_monitor_id RENAME TO ix_checks_partitioned_monitor_id")
+    op.execute("ALTER INDEX ix_checks_checked_at RENAME TO ix_checks_partitioned_checked_at")
+
+    op.create_table(
+        "checks",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("monitor_id", sa.String(36), sa.ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("status_code", sa.Integer()),
+        sa.Column("response_time", sa.Integer()),
+        sa.Column("dns_time", sa.Integer()),
+        sa.Column("connect_time", sa.Integer()),
+        sa.Column("tls_time", sa.Integer()),
+        sa.Column("ttfb_time", sa.Integer()),
+        sa.Column("download_time", sa.Integer()),
+        sa.Column("connection_reused", sa.Boolean()),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("checked_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("ai_analysis", sa.JSON()),
+    )
+    op.create_index("ix_checks_monitor_id", "checks", ["monitor_id"])
+    op.create_index("ix_checks_checked_at", "checks", ["checked_at"])
+    op.execute(f"INSERT INTO checks ({COLUMNS}) SELECT {COLUMNS} FROM checks_partitioned")
+    op.drop_table("checks_partitioned")  # drops every partition with it
@@ -0,0 +1,43 @@
+"""add composite/covering checks index and partial due-monitor index
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-18 00:00:00.000000
+
+ix_checks_monitor_checked (monitor_id, checked_at) serves every
+"one monitor since T, ordered by time" read; on Postgres it also INCLUDEs the
+columns the history/uptime readers select, so they run as index-only scans.
+It replaces ix_checks_monitor_id, which is its leading column.
+
+ix_monitors_due covers the scheduler's "active and due" scan.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0020"
+down_revision: Union[str, None] = "0019"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_WHERE = sa.text("is_active")
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_checks_monitor_checked", "checks", ["monitor_id", "checked_at"],
+        postgresql_include=["status", "response_time", "status_code"],
+    )
+    op.drop_index("ix_checks_monitor_id", table_name="checks")
+    op.create_index(
+        "ix_monitors_due", "monitors", ["next_check_at"],
+        postgresql_where=ACTIVE_WHERE,
+        sqlite_where=ACTIVE_WHERE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_monitors_due", table_name="monitors")
+    op.create_index("ix_checks_monitor_id", "checks", ["monitor_id"])
+    op.drop_index("ix_checks_monitor_checked", table_name="checks")
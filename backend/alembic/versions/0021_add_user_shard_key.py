@@ -0,0 +1,35 @@
+"""add users.shard_key
+
+Revision ID: 0021
+Revises: 0020
+Create Date: 2026-10-18 00:00:00.000000
+
+Random key in [0, 65536) per user, indexed, so sharded batch jobs (the
+monthly SLA reports) select their users with an index range instead of
+scanning every user. Existing users get a random key.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0021"
+down_revision: Union[str, None] = "0020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARD_KEY_RANGE = 1 << 16
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("shard_key", sa.Integer(), nullable=False, server_default="0"))
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"UPDATE users SET shard_key = floor(random() * {SHARD_KEY_RANGE})::int")
+    else:
+        op.execute(f"UPDATE users SET shard_key = abs(random()) % {SHARD_KEY_RANGE}")
+    op.create_index("ix_users_shard_key", "users", ["shard_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_shard_key", table_name="users")
+    op.drop_column("users", "shard_key")
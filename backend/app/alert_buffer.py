@@ -0,0 +1,131 @@
+"""
+Alert coalescing per alert channel.
+
+A regional outage flips hundreds of monitors at once, and every one of them
+used to become its own Slack post / email per channel — the provider then
+rate-limits us and send_channel_alert's retries pile up. Instead, send_alerts
+buffers each (channel, status change) here for ALERT_DIGEST_WINDOW seconds:
+
+  - the first change buffered in a window schedules flush_alert_buffers
+    (countdown = window); later ones just RPUSH onto their channel's list
+  - beat also runs flush_alert_buffers every 2 windows as a fallback. It
+    only drains when no flush is due (the scheduled task was never published
+    or got lost), so buffered alerts always go out
+  - the flush drains every channel with pending changes. A channel with at
+    most ALERT_DIGEST_THRESHOLD monitors changed gets the usual individual
+    alerts; above that it gets one digest ("37 monitors down, 2 recovered")
+  - every email that goes out in a flush, digest or individual, is sent
+    through one Resend batch request
+  - if a flush fails before handing a channel's alerts to their send tasks,
+    they are put back in the buffer for the next flush
+
+Webhook channels always get individual status_changed events — receivers
+are programs that expect one event per change.
+
+With ALERT_DIGEST_WINDOW = 0, or when Redis is unavailable, alerts are
+dispatched immediately as before.
+"""
+
+import json
+import time
+from typing import Dict, List, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+BUFFER_KEY = "checkapi:alerts:buffer:{}"  # list of JSON alerts for one channel
+PENDING_KEY = "checkapi:alerts:pending"  # set of channel ids with buffered alerts
+WINDOW_KEY = "checkapi:alerts:window"  # unix time the window opened, exists while a flush is scheduled
+
+# Channel types that can receive a digest
+DIGEST_TYPES = ("email", "slack", "telegram", "discord")
+
+
+def is_enabled() -> bool:
+    return settings.ALERT_DIGEST_WINDOW > 0
+
+
+def buffer_alerts(entries: List[Tuple[str, dict]]) -> bool:
+    """
+    Buffer (channel_id, alert) pairs for the next flush. Returns False if
+    they could not be buffered — the caller then dispatches them directly.
+    """
+    if not entries:
+        return True
+    try:
+        from app.redis_client import get_redis
+
+        window = settings.ALERT_DIGEST_WINDOW
+        pipe = get_redis().pipeline(transaction=True)
+        for channel_id, alert in entries:
+            pipe.rpush(BUFFER_KEY.format(channel_id), json.dumps(alert))
+            pipe.sadd(PENDING_KEY, channel_id)
+        # The window key outlives the countdown a little so a slow worker doesn't open a second window
+        pipe.set(WINDOW_KEY, int(time.time()), nx=True, ex=window * 4)
+        opened = pipe.execute()[-1]
+    except Exception as e:
+        print(f"⚠️  Alert buffer unavailable, sending immediately: {e}")
+        return False
+
+    if opened:
+        from app.tasks import flush_alert_buffers
+
+        try:
+            flush_alert_buffers.apply_async(countdown=window)
+        except Exception as e:
+            # Already buffered: the beat fallback flush picks them up
+            print(f"⚠️  Failed to schedule alert flush, leaving it to the fallback: {e}")
+    return True
+
+
+def drain() -> Dict[str, List[dict]]:
+    """Take every buffered alert: {channel_id: [alert, ...]} in arrival order."""
+    from app.redis_client import get_redis
+
+    r = get_redis()
+    # Close the window first: anything buffered from now on schedules its own flush
+    r.delete(WINDOW_KEY)
+
+    drained = {}
+    for channel_id in r.smembers(PENDING_KEY):
+        # A channel leaves the pending set together with its list, so nothing is stranded midway
+        pipe = r.pipeline(transaction=True)
+        pipe.lrange(BUFFER_KEY.format(channel_id), 0, -1)
+        pipe.delete(BUFFER_KEY.format(channel_id))
+        pipe.srem(PENDING_KEY, channel_id)
+        raw, _, _ = pipe.execute()
+        if raw:
+            drained[channel_id] = [json.loads(item) for item in raw]
+    return drained
+
+
+def restore(drained: Dict[str, List[dict]]) -> None:
+    """Put drained alerts back in front of their buffers, for the next flush to pick up."""
+    from app.redis_client import get_redis
+
+    pipe = get_redis().pipeline(transaction=True)
+    for channel_id, alerts in drained.items():
+        # LPUSH prepends one by one, so push newest first to keep arrival order
+        pipe.lpush(BUFFER_KEY.format(channel_id), *[json.dumps(a) for a in reversed(alerts)])
+        pipe.sadd(PENDING_KEY, channel_id)
+    pipe.execute()
+
+
+def flush_overdue() -> bool:
+    """
+    True when the fallback flush should drain: nothing is scheduled to (no
+    window open) or the scheduled flush is more than a window late.
+    """
+    from app.redis_client import get_redis
+
+    opened = get_redis().get(WINDOW_KEY)
+    if opened is None:
+        return True
+    return time.time() - int(opened) > 2 * max(settings.ALERT_DIGEST_WINDOW, 1)
+
+
+def wants_digest(channel_type: str, alerts: List[dict]) -> bool:
+    if channel_type not in DIGEST_TYPES:
+        return False
+    return len({a["monitor_id"] for a in alerts}) > settings.ALERT_DIGEST_THRESHOLD
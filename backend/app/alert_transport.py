@@ -0,0 +1,238 @@
+"""
+HTTP transport for alert deliveries.
+
+Every alert request goes through post() here instead of a bare requests.post:
+
+  - one pooled requests.Session per worker process, so repeated sends to
+    Resend / Slack / Telegram / Discord reuse keep-alive connections
+  - a token bucket per destination (a Telegram bot, a Discord or Slack
+    webhook, the Resend account, or the host of a customer webhook), kept
+    in Redis so all workers share it. A send waits for a token instead of
+    hitting the provider's limit. Resend's per-account rate is split into
+    budgets: alert emails get most of it, bulk report emails the rest, so a
+    report run can't hold back alerts
+  - on 429 / 503 the Retry-After (header, or retry_after in Telegram and
+    Discord JSON bodies) blocks the destination for every worker, and the
+    request is sent again once it expires
+
+A send never waits more than ALERT_MAX_RATE_WAIT seconds in total; past that
+the last response is returned (or RateLimited raised) and the caller's
+Celery retry takes over — by then the destination is blocked in Redis, so
+retries are paced instead of failing back to back.
+
+Sends made inside an HTTP request (signup / team invite emails) pass
+blocking=False: no bucket, no waiting, a single attempt.
+
+If Redis is unavailable sends are not rate limited.
+"""
+
+import hashlib
+import os
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import get_settings
+
+settings = get_settings()
+
+BUCKET_KEY = "checkapi:alerts:bucket:{}"  # hash {tokens, ts}
+BLOCK_KEY = "checkapi:alerts:block:{}"  # exists while a destination asked us to back off
+
+# (tokens per second, burst) per destination kind
+LIMITS = {
+    # Resend default: 2 requests/s per team, split by budget
+    "resend:alerts": (1.5, 2),
+    "resend:reports": (0.5, 1),
+    "telegram": (30.0, 30),  # 30 messages/s per bot
+    "discord": (0.5, 5),  # 5 per 2 s per webhook, 30/min per channel
+    "slack": (1.0, 3),  # 1 message/s per incoming webhook, short bursts allowed
+    "host": (10.0, 20),  # customer webhook receivers
+}
+
+# Times one request is sent again after a 429 / 503 with Retry-After
+RATE_LIMIT_ATTEMPTS = 3
+
+# KEYS: bucket, block. ARGV: rate (tokens/s), burst.
+# Returns 0 when a token was taken, else milliseconds to wait before asking again.
+TOKEN_BUCKET_LUA = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens < 1 then
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimited(Exception):
+    """A destination stayed rate limited longer than ALERT_MAX_RATE_WAIT."""
+
+    def __init__(self, destination: str, retry_after: float):
+        super().__init__(f"{destination} rate limited, retry in {retry_after:.1f}s")
+        self.destination = destination
+        self.retry_after = retry_after
+
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_bucket_script = None
+
+
+def get_session() -> requests.Session:
+    """The process-wide pooled session (re-created after a fork)."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=settings.ALERT_HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()[:16]
+
+
+def destination(url: str, budget: str = "alerts") -> Tuple[str, str, str]:
+    """
+    (bucket key, block key, LIMITS kind) for a request URL. The block key is
+    the provider account a Retry-After applies to; it differs from the bucket
+    key only for Resend budgets. Secrets in URLs are hashed.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path.split("/")
+
+    if host == "api.resend.com":
+        return f"resend:{budget}", "resend", f"resend:{budget}"
+    key, kind = _destination(parts, host, path)
+    return key, key, kind
+
+
+def _destination(parts, host: str, path: list) -> Tuple[str, str]:
+    if host == "api.telegram.org" and len(path) > 1 and path[1].startswith("bot"):
+        return f"telegram:{_digest(path[1])}", "telegram"
+    if host.endswith(("discord.com", "discordapp.com")) and "webhooks" in path:
+        webhook_id = path[path.index("webhooks") + 1] if len(path) > path.index("webhooks") + 1 else ""
+        return f"discord:{webhook_id}", "discord"
+    if host == "hooks.slack.com":
+        return f"slack:{_digest(parts.path)}", "slack"
+    return f"host:{parts.netloc.lower()}", "host"
+
+
+def _take(key: str, block: str, kind: str) -> int:
+    global _bucket_script
+    from app.redis_client import get_redis
+
+    if _bucket_script is None:
+        _bucket_script = get_redis().register_script(TOKEN_BUCKET_LUA)
+    rate, burst = LIMITS[kind]
+    return int(_bucket_script(keys=[BUCKET_KEY.format(key), BLOCK_KEY.format(block)], args=[rate, burst]))
+
+
+def acquire(key: str, block: str, kind: str, deadline: float) -> None:
+    """Wait for a token of the destination's bucket; RateLimited past the deadline."""
+    while True:
+        try:
+            wait_ms = _take(key, block, kind)
+        except Exception as e:
+            print(f"⚠️  Alert rate limiter unavailable, sending unthrottled: {e}")
+            return
+        if not wait_ms:
+            return
+        wait = wait_ms / 1000
+        if time.monotonic() + wait > deadline:
+            raise RateLimited(key, wait)
+        time.sleep(wait)
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds a 429 / 503 response asks us to wait, if it says."""
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(header)
+                return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    # Telegram: {"parameters": {"retry_after": 5}}, Discord: {"retry_after": 1.5}
+    value = (body.get("parameters") or {}).get("retry_after", body.get("retry_after"))
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _block(key: str, seconds: float) -> bool:
+    """Make every worker wait `seconds` before its next send to the destination."""
+    try:
+        from app.redis_client import get_redis
+
+        get_redis().set(BLOCK_KEY.format(key), 1, px=max(1, int(seconds * 1000)))
+        return True
+    except Exception as e:
+        print(f"⚠️  Failed to record rate limit for {key}: {e}")
+        return False
+
+
+def post(url: str, budget: str = "alerts", blocking: bool = True, **kwargs) -> requests.Response:
+    """
+    requests.post through the pooled session, paced per destination.
+    budget: "alerts" or "reports" (Resend only). blocking=False skips the
+    rate limiter and never waits — for sends inside an HTTP request.
+    """
+    key, block, kind = destination(url, budget)
+    kwargs.setdefault("timeout", 10)
+
+    if not blocking:
+        response = get_session().post(url, **kwargs)
+        wait = retry_after(response) if response.status_code in (429, 503) else None
+        if wait is not None:
+            _block(block, wait)
+        return response
+
+    deadline = time.monotonic() + settings.ALERT_MAX_RATE_WAIT
+    for attempt in range(RATE_LIMIT_ATTEMPTS):
+        acquire(key, block, kind, deadline)
+        response = get_session().post(url, **kwargs)
+        if response.status_code not in (429, 503):
+            return response
+
+        wait = retry_after(response)
+        if wait is None:
+            return response
+        print(f"⏳ {key} rate limited ({response.status_code}), retry after {wait:.1f}s")
+        if time.monotonic() + wait > deadline:
+            _block(block, wait)
+            return response
+        if not _block(block, wait):
+            time.sleep(wait)  # no shared block to wait on in acquire()
+    return response
@@ -2,10 +2,10 @@
 Alert sending utilities for different channels
 """
 
-import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from app import alert_transport
 from app.config import get_settings
 
 settings = get_settings()
@@ -28,26 +28,14 @@ def _build_email_ai_block(ai_analysis: Optional[Dict[str, Any]]) -> str:
     </div>"""
 
 
-def send_email_alert(channel_config: Dict[str, Any], monitor_name: str, monitor_url: str,
-                     new_status: str, old_status: str, ai_analysis: Dict[str, Any] = None) -> bool:
-    """
-    Send email alert using Resend
-    """
-    resend_api_key = settings.RESEND_API_KEY
-    if not resend_api_key:
-        print("⚠️  Resend API key not configured")
-        return False
+def build_email_alert(email: str, monitor_name: str, monitor_url: str,
+                      new_status: str, old_status: str, ai_analysis: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Resend message for one status change"""
+    status_emoji = {"up": "✅", "down": "🔴", "degraded": "⚠️"}
+    subject = f"{status_emoji.get(new_status, '🔔')} {monitor_name} is {new_status.upper()}"
+    status_color = "#16a34a" if new_status == "up" else "#dc2626"
 
-    email = channel_config.get("email")
-    if not email:
-        return False
-
-    try:
-        status_emoji = {"up": "✅", "down": "🔴", "degraded": "⚠️"}
-        subject = f"{status_emoji.get(new_status, '🔔')} {monitor_name} is {new_status.upper()}"
-        status_color = "#16a34a" if new_status == "up" else "#dc2626"
-
-        html_content = f"""
+    html_content = f"""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <div style="background: {status_color}; color: white; padding: 16px 24px; border-radius: 8px 8px 0 0;">
@@ -70,14 +58,32 @@ def send_email_alert(channel_config: Dict[str, Any], monitor_name: str, monitor_
         </html>
         """
 
-        response = requests.post(
+    return {
+        "from": "CheckAPI <noreply@checkapi.io>",
+        "to": [email],
+        "subject": subject,
+        "html": html_content,
+    }
+
+
+def send_email_alert(channel_config: Dict[str, Any], monitor_name: str, monitor_url: str,
+                     new_status: str, old_status: str, ai_analysis: Dict[str, Any] = None) -> bool:
+    """
+    Send email alert using Resend
+    """
+    resend_api_key = settings.RESEND_API_KEY
+    if not resend_api_key:
+        print("⚠️  Resend API key not configured")
+        return False
+
+    email = channel_config.get("email")
+    if not email:
+        return False
+
+    try:
+        response = alert_transport.post(
             "https://api.resend.com/emails",
-            json={
-                "from": "CheckAPI <noreply@checkapi.io>",
-                "to": [email],
-                "subject": subject,
-                "html": html_content,
-            },
+            json=build_email_alert(email, monitor_name, monitor_url, new_status, old_status, ai_analysis),
             headers={
                 "Authorization": f"Bearer {resend_api_key}",
                 "Content-Type": "application/json"
@@ -95,6 +101,8 @@ def send_email_alert(channel_config: Dict[str, Any], monitor_name: str, monitor_
     except Exception as e:
         print(f"❌ Email error: {str(e)}")
         return False
+
+
 def send_welcome_email(user_email: str, user_name: str) -> bool:
     """Send welcome email to new user after signup"""
     resend_api_key = settings.RESEND_API_KEY
@@ -152,8 +160,9 @@ def send_welcome_email(user_email: str, user_name: str) -> bool:
         </html>
         """
 
-        response = requests.post(
+        response = alert_transport.post(
             "https://api.resend.com/emails",
+            blocking=False,  # sent inside the signup request handler
             json={
                 "from": "Axiom Technologies for CheckAPI <axiomtech@checkapi.io>",
                 "to": [user_email],
@@ -222,8 +231,9 @@ def send_team_invite_email(invited_email: str, inviter_name: str, invite_url: st
         </html>
         """
 
-        response = requests.post(
+        response = alert_transport.post(
             "https://api.resend.com/emails",
+            blocking=False,  # sent inside the team invite request handler
             json={
                 "from": "CheckAPI <noreply@checkapi.io>",
                 "to": [invited_email],
@@ -309,7 +319,7 @@ def send_slack_alert(channel_config: Dict[str, Any], monitor_name: str, monitor_
                 "fields": [{"title": "🤖 AI Analysis", "value": ai_text, "short": False}],
             })
 
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        response = alert_transport.post(webhook_url, json=payload, timeout=10)
         
         if response.status_code == 200:
             print(f"💬 Slack alert sent")
@@ -370,7 +380,7 @@ def send_telegram_alert(channel_config: Dict[str, Any], monitor_name: str, monit
             "parse_mode": "Markdown"
         }
         
-        response = requests.post(url, json=payload, timeout=10)
+        response = alert_transport.post(url, json=payload, timeout=10)
         
         if response.status_code == 200:
             print(f"✈️  Telegram alert sent")
@@ -429,7 +439,7 @@ def send_discord_alert(channel_config: Dict[str, Any], monitor_name: str, monito
         # Discord embed
         payload = {"embeds": embeds}
         
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        response = alert_transport.post(webhook_url, json=payload, timeout=10)
         
         if response.status_code == 204:
             print(f"🎮 Discord alert sent")
@@ -544,8 +554,9 @@ def send_sla_report_email(
         </html>
         """
 
-        response = requests.post(
+        response = alert_transport.post(
             "https://api.resend.com/emails",
+            budget="reports",  # bulk: must not use up the alert emails' share
             json={
                 "from": "CheckAPI Reports <noreply@checkapi.io>",
                 "to": [user_email],
@@ -613,7 +624,7 @@ def send_webhook_alert(channel_config: Dict[str, Any], monitor_name: str, monito
         headers["Content-Type"] = "application/json"
         headers["X-CheckAPI-Idempotency-Key"] = idempotency_key
         
-        response = requests.post(webhook_url, json=payload, headers=headers, timeout=10)
+        response = alert_transport.post(webhook_url, json=payload, headers=headers, timeout=10)
         
         if 200 <= response.status_code < 300:
             print(f"🔗 Webhook alert sent")
@@ -625,3 +636,260 @@ def send_webhook_alert(channel_config: Dict[str, Any], monitor_name: str, monito
     except Exception as e:
         print(f"❌ Webhook error: {str(e)}")
         return False
+
+
+# ---------------------------------------------------------------------------
+# Digests: many status changes on one channel as one message (app/alert_buffer.py).
+# alerts are dicts with monitor_id, monitor_name, monitor_url, new_status,
+# old_status, ai_analysis, at (ISO time of the change).
+# ---------------------------------------------------------------------------
+
+# Monitors listed by name in a digest; the rest are summarized as "+N more"
+DIGEST_MAX_LISTED = 25
+
+# Resend accepts up to 100 emails per batch request
+RESEND_BATCH_SIZE = 100
+
+
+def _latest_per_monitor(alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Last change of each monitor, in order of first appearance."""
+    latest = {}
+    for alert in alerts:
+        latest[alert["monitor_id"]] = alert
+    return list(latest.values())
+
+
+def _digest_summary(alerts: List[Dict[str, Any]]) -> str:
+    """e.g. "37 monitors down, 2 degraded, 5 recovered" """
+    counts = {}
+    for alert in alerts:
+        counts[alert["new_status"]] = counts.get(alert["new_status"], 0) + 1
+    parts = []
+    for status, label in (("down", "down"), ("degraded", "degraded"), ("up", "recovered")):
+        n = counts.get(status)
+        if n:
+            noun = "" if parts else ("monitor " if n == 1 else "monitors ")
+            parts.append(f"{n} {noun}{label}")
+    return ", ".join(parts)
+
+
+def _digest_lines(alerts: List[Dict[str, Any]], bold: str = "") -> List[str]:
+    lines = [
+        f"{a['monitor_name']}: {a['old_status'].upper()} → {bold}{a['new_status'].upper()}{bold}"
+        for a in alerts[:DIGEST_MAX_LISTED]
+    ]
+    if len(alerts) > DIGEST_MAX_LISTED:
+        lines.append(f"+{len(alerts) - DIGEST_MAX_LISTED} more")
+    return lines
+
+
+def build_email_digest(email: str, alerts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Resend message summarizing many status changes"""
+    monitors = _latest_per_monitor(alerts)
+    summary = _digest_summary(monitors)
+    any_down = any(a["new_status"] != "up" for a in monitors)
+    status_color = "#dc2626" if any_down else "#16a34a"
+
+    rows_html = "".join(
+        f"""<tr><td style="padding: 6px 0; font-weight: bold;">{a['monitor_name']}</td>"""
+        f"""<td style="padding: 6px 0; color: #6b7280;">{a['monitor_url']}</td>"""
+        f"""<td style="padding: 6px 0;">{a['old_status'].upper()} → <strong>{a['new_status'].upper()}</strong></td></tr>"""
+        for a in monitors[:DIGEST_MAX_LISTED]
+    )
+    more_html = ""
+    if len(monitors) > DIGEST_MAX_LISTED:
+        more_html = f'<p style="color: #6b7280;">+{len(monitors) - DIGEST_MAX_LISTED} more</p>'
+
+    html_content = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: {status_color}; color: white; padding: 16px 24px; border-radius: 8px 8px 0 0;">
+                <h2 style="margin: 0;">🔔 {summary}</h2>
+            </div>
+            <div style="border: 1px solid #e5e7eb; border-top: none; padding: 24px; border-radius: 0 0 8px 8px;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 14px;">{rows_html}</table>
+                {more_html}
+                <p style="color: #6b7280; font-size: 13px;">{datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")}</p>
+                <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 20px 0;">
+                <p style="font-size: 12px; color: #9ca3af; margin: 0;">
+                    Sent by <a href="https://checkapi.io" style="color: #16a34a;">CheckAPI</a>
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+
+    return {
+        "from": "CheckAPI <noreply@checkapi.io>",
+        "to": [email],
+        "subject": f"🔔 {summary}",
+        "html": html_content,
+    }
+
+
+def _resend_post(url: str, payload: Any, timeout: int) -> Any:
+    return alert_transport.post(
+        url,
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {settings.RESEND_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        timeout=timeout
+    )
+
+
+def _rejected(status_code: int) -> bool:
+    """Resend refused the request itself (bad address, validation) — resending won't help."""
+    return 400 <= status_code < 500 and status_code != 429
+
+
+def send_email_batch(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Send up to RESEND_BATCH_SIZE Resend messages (from build_email_alert /
+    build_email_digest) with one batch request. If Resend rejects the batch
+    (e.g. one invalid address fails validation for all of them), each
+    message is sent on its own instead, so one bad recipient doesn't hold
+    back the rest. Returns the messages worth retrying (not delivered, not
+    rejected).
+    """
+    if not settings.RESEND_API_KEY:
+        print("⚠️  Resend API key not configured")
+        return messages
+
+    try:
+        response = _resend_post("https://api.resend.com/emails/batch", messages, timeout=20)
+    except Exception as e:
+        print(f"❌ Email batch error: {str(e)}")
+        return messages
+
+    if response.status_code == 200:
+        print(f"✉️  Email batch sent ({len(messages)} emails)")
+        return []
+    print(f"❌ Email batch failed: {response.status_code} - {response.text}")
+    if not _rejected(response.status_code):
+        return messages
+
+    failed = []
+    for message in messages:
+        try:
+            response = _resend_post("https://api.resend.com/emails", message, timeout=10)
+        except Exception as e:
+            print(f"❌ Email error: {str(e)}")
+            failed.append(message)
+            continue
+        if response.status_code == 200:
+            continue
+        print(f"❌ Email to {', '.join(message['to'])} failed: {response.status_code} - {response.text}")
+        if not _rejected(response.status_code):
+            failed.append(message)
+    print(f"✉️  Email batch sent one by one ({len(messages) - len(failed)}/{len(messages)} emails)")
+    return failed
+
+
+def send_slack_digest(channel_config: Dict[str, Any], alerts: List[Dict[str, Any]]) -> bool:
+    """
+    Send one Slack message for many status changes
+    """
+    webhook_url = channel_config.get("webhook_url")
+    if not webhook_url:
+        return False
+
+    try:
+        monitors = _latest_per_monitor(alerts)
+        any_down = any(a["new_status"] != "up" for a in monitors)
+        payload = {
+            "text": _digest_summary(monitors),
+            "attachments": [{
+                "color": "#dc2626" if any_down else "#16a34a",
+                "text": "\n".join(_digest_lines(monitors, bold="*")),
+                "footer": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            }]
+        }
+
+        response = alert_transport.post(webhook_url, json=payload, timeout=10)
+
+        if response.status_code == 200:
+            print(f"💬 Slack digest sent ({len(monitors)} monitors)")
+            return True
+        else:
+            print(f"❌ Slack digest failed: {response.status_code}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Slack digest error: {str(e)}")
+        return False
+
+
+def send_telegram_digest(channel_config: Dict[str, Any], alerts: List[Dict[str, Any]]) -> bool:
+    """
+    Send one Telegram message for many status changes
+    """
+    chat_id = channel_config.get("chat_id")
+    bot_token = channel_config.get("bot_token")
+
+    if not chat_id or not bot_token:
+        return False
+
+    try:
+        monitors = _latest_per_monitor(alerts)
+        lines = "\n".join(f"• {line}" for line in _digest_lines(monitors, bold="*"))
+        message = f"""
+🔔 *{_digest_summary(monitors)}*
+
+{lines}
+
+*Time:* {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
+"""
+
+        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        payload = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": "Markdown"
+        }
+
+        response = alert_transport.post(url, json=payload, timeout=10)
+
+        if response.status_code == 200:
+            print(f"✈️  Telegram digest sent ({len(monitors)} monitors)")
+            return True
+        else:
+            print(f"❌ Telegram digest failed: {response.status_code}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Telegram digest error: {str(e)}")
+        return False
+
+
+def send_discord_digest(channel_config: Dict[str, Any], alerts: List[Dict[str, Any]]) -> bool:
+    """
+    Send one Discord embed for many status changes
+    """
+    webhook_url = channel_config.get("webhook_url")
+    if not webhook_url:
+        return False
+
+    try:
+        monitors = _latest_per_monitor(alerts)
+        any_down = any(a["new_status"] != "up" for a in monitors)
+        payload = {"embeds": [{
+            "title": f"🔔 {_digest_summary(monitors)}",
+            "color": 14423100 if any_down else 1356954,
+            "description": "\n".join(_digest_lines(monitors, bold="**")),
+            "timestamp": datetime.utcnow().isoformat()
+        }]}
+
+        response = alert_transport.post(webhook_url, json=payload, timeout=10)
+
+        if response.status_code == 204:
+            print(f"🎮 Discord digest sent ({len(monitors)} monitors)")
+            return True
+        else:
+            print(f"❌ Discord digest failed: {response.status_code}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Discord digest error: {str(e)}")
+        return False
@@ -0,0 +1,264 @@
+"""
+Parquet archive tier for old check history.
+
+archive_old_checks (daily, before cleanup_old_checks) moves checks of months
+that ended more than ARCHIVE_AFTER_DAYS ago out of the checks table into one
+zstd-compressed Parquet file per monitor-month:
+
+    {ARCHIVE_URI}/monitor_id=<id>/month=<YYYY-MM>/checks.parquet
+
+ARCHIVE_URI is any pyarrow filesystem URI — a local directory
+(file:///var/lib/checkapi/archive) or S3-compatible storage
+(s3://bucket/prefix?endpoint_override=minio:9000&scheme=http, credentials
+from the usual AWS_* environment variables).
+
+Only raw-check readers need the archive: uptime, latency, percentiles and
+incidents come from rollups and the incidents table, which are not archived.
+read_archived_checks() is the query layer they fall back to for ranges older
+than archive_horizon().
+
+pyarrow is optional: it is imported on first use, and with ARCHIVE_ENABLED
+off nothing here is touched.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from app.config import get_settings
+from app.models import Check
+
+settings = get_settings()
+
+CHECK_COLUMNS = (
+    "id", "monitor_id", "status", "status_code", "response_time",
+    "dns_time", "connect_time", "tls_time", "ttfb_time", "download_time",
+    "connection_reused", "error_message", "checked_at", "ai_analysis",
+)
+
+_fs = None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.fs
+        import pyarrow.parquet
+    except ImportError as e:  # pragma: no cover
+        raise RuntimeError("ARCHIVE_ENABLED requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _schema():
+    pa = _pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("monitor_id", pa.string()),
+        ("status", pa.string()),
+        ("status_code", pa.int32()),
+        ("response_time", pa.int32()),
+        ("dns_time", pa.int32()),
+        ("connect_time", pa.int32()),
+        ("tls_time", pa.int32()),
+        ("ttfb_time", pa.int32()),
+        ("download_time", pa.int32()),
+        ("connection_reused", pa.bool_()),
+        ("error_message", pa.string()),
+        ("checked_at", pa.timestamp("us")),
+        ("ai_analysis", pa.string()),  # JSON text
+    ])
+
+
+def get_filesystem():
+    """(filesystem, root path) for ARCHIVE_URI, created lazily."""
+    global _fs
+    if _fs is None:
+        pa = _pyarrow()
+        fs, root = pa.fs.FileSystem.from_uri(settings.ARCHIVE_URI)
+        _fs = (fs, root.rstrip("/"))
+    return _fs
+
+
+def is_enabled() -> bool:
+    return settings.ARCHIVE_ENABLED
+
+
+def month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(first_of_month: datetime) -> datetime:
+    return (first_of_month + timedelta(days=32)).replace(day=1)
+
+
+def archive_horizon(now: Optional[datetime] = None) -> datetime:
+    """Checks before this instant may live in the archive instead of the checks table."""
+    return month_start((now or datetime.utcnow()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS))
+
+
+def _month_dir(monitor_id: str, month: str) -> str:
+    _, root = get_filesystem()
+    return f"{root}/monitor_id={monitor_id}/month={month}"
+
+
+def _read_file(monitor_id: str, month: str, columns=None, filters=None):
+    pa = _pyarrow()
+    fs, _ = get_filesystem()
+    path = f"{_month_dir(monitor_id, month)}/checks.parquet"
+    if fs.get_file_info(path).type == pa.fs.FileType.NotFound:
+        return None
+    return pa.parquet.read_table(path, filesystem=fs, columns=columns, filters=filters)
+
+
+def write_month(monitor_id: str, month: str, rows: List[dict]) -> int:
+    """
+    Write one monitor-month file, merged (by check id) with the file already
+    there, so re-running after a crash between writing and deleting is safe.
+    Returns the number of checks in the file.
+    """
+    pa = _pyarrow()
+    fs, _ = get_filesystem()
+    schema = _schema()
+
+    merged: Dict[str, dict] = {}
+    existing = _read_file(monitor_id, month)
+    if existing is not None:
+        for row in existing.to_pylist():
+            merged[row["id"]] = row
+    for row in rows:
+        merged[row["id"]] = {
+            **{c: row.get(c) for c in CHECK_COLUMNS},
+            "ai_analysis": json.dumps(row["ai_analysis"]) if row.get("ai_analysis") is not None else None,
+        }
+
+    ordered = sorted(merged.values(), key=lambda r: r["checked_at"])
+    table = pa.Table.from_pylist(ordered, schema=schema)
+
+    directory = _month_dir(monitor_id, month)
+    fs.create_dir(directory, recursive=True)
+    tmp_path = f"{directory}/checks.parquet.tmp"
+    pa.parquet.write_table(table, tmp_path, filesystem=fs, compression="zstd")
+    fs.move(tmp_path, f"{directory}/checks.parquet")
+    return len(ordered)
+
+
+def _months(start: datetime, end: datetime) -> List[datetime]:
+    months = []
+    month = month_start(start)
+    while month < end:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def read_archived_checks(monitor_id: str, start: datetime, end: datetime,
+                         columns: Optional[List[str]] = None,
+                         newest_first: bool = False, limit: Optional[int] = None) -> List[dict]:
+    """
+    Archived checks of one monitor with start <= checked_at < end, oldest
+    first (or newest first). With a limit, month files are read only until
+    it is reached.
+    """
+    if not is_enabled() or start >= end:
+        return []
+    wanted = list(columns) if columns else list(CHECK_COLUMNS)
+    read_columns = list(dict.fromkeys(wanted + ["checked_at"]))
+
+    months = _months(start, end)
+    if newest_first:
+        months.reverse()
+
+    rows = []
+    for month in months:
+        table = _read_file(
+            str(monitor_id), month.strftime("%Y-%m"), columns=read_columns,
+            filters=[("checked_at", ">=", start), ("checked_at", "<", end)],
+        )
+        if table is None:
+            continue
+        month_rows = sorted(table.to_pylist(), key=lambda r: r["checked_at"], reverse=newest_first)
+        rows.extend(month_rows)
+        if limit is not None and len(rows) >= limit:
+            rows = rows[:limit]
+            break
+
+    for row in rows:
+        if row.get("ai_analysis"):
+            row["ai_analysis"] = json.loads(row["ai_analysis"])
+    if "checked_at" not in wanted:
+        for row in rows:
+            del row["checked_at"]
+    return rows
+
+
+def count_archived_checks(monitor_id: str, start: datetime, end: datetime) -> int:
+    """Archived checks in [start, end): row counts from file metadata for whole months."""
+    if not is_enabled() or start >= end:
+        return 0
+    pa = _pyarrow()
+    fs, _ = get_filesystem()
+    total = 0
+    for month in _months(start, end):
+        if month >= start and next_month(month) <= end:
+            path = f"{_month_dir(str(monitor_id), month.strftime('%Y-%m'))}/checks.parquet"
+            if fs.get_file_info(path).type != pa.fs.FileType.NotFound:
+                with fs.open_input_file(path) as f:
+                    total += pa.parquet.ParquetFile(f).metadata.num_rows
+        else:
+            total += len(read_archived_checks(
+                monitor_id, max(start, month), min(end, next_month(month)), columns=["id"]
+            ))
+    return total
+
+
+def delete_months_before(monitor_ids: List[str], cutoff: datetime) -> int:
+    """Remove monitor-month files whose whole month is older than cutoff. Returns files removed."""
+    if not is_enabled():
+        return 0
+    pa = _pyarrow()
+    fs, root = get_filesystem()
+    removed = 0
+    for monitor_id in monitor_ids:
+        selector = pa.fs.FileSelector(f"{root}/monitor_id={monitor_id}", allow_not_found=True)
+        for info in fs.get_file_info(selector):
+            if info.type != pa.fs.FileType.Directory or not info.base_name.startswith("month="):
+                continue
+            first = datetime.strptime(info.base_name[len("month="):], "%Y-%m")
+            if next_month(first) <= cutoff:
+                fs.delete_dir(info.path)
+                removed += 1
+    return removed
+
+
+def archive_monitor(db, monitor_id: str, horizon: datetime) -> int:
+    """
+    Move one monitor's checks older than horizon into the archive, a month
+    at a time (file written before the rows are deleted). Commits per month.
+    Returns the number of checks moved.
+    """
+    oldest = db.query(func.min(Check.checked_at)).filter(
+        Check.monitor_id == monitor_id,
+        Check.checked_at < horizon,
+    ).scalar()
+    if oldest is None:
+        return 0
+
+    moved = 0
+    month = month_start(oldest)
+    while month < horizon:
+        end = min(next_month(month), horizon)
+        in_month = (
+            Check.monitor_id == monitor_id,
+            Check.checked_at >= month,
+            Check.checked_at < end,
+        )
+        rows = db.query(*[getattr(Check, c) for c in CHECK_COLUMNS]).filter(*in_month).all()
+        if rows:
+            write_month(str(monitor_id), month.strftime("%Y-%m"), [r._asdict() for r in rows])
+            db.query(Check).filter(*in_month).delete(synchronize_session=False)
+            db.commit()
+            moved += len(rows)
+        month = next_month(month)
+    return moved
@@ -35,12 +35,33 @@ celery_app.conf.update(
 celery_app.conf.beat_schedule = {
     "check-monitors-every-minute": {
         "task": "app.tasks.check_monitors",
-        "schedule": 60.0,  # Every 60 seconds
+        "schedule": 60.0,  # Every 60 seconds — fallback, no-op while app.scheduler is running
+    },
+    "maintain-check-partitions": {
+        "task": "app.tasks.maintain_check_partitions",
+        "schedule": crontab(hour="*/6", minute=15),  # future daily partitions, no-op unless partitioned
+    },
+    "archive-old-checks": {
+        "task": "app.tasks.archive_old_checks",
+        "schedule": crontab(hour=2, minute=0),  # 2 AM daily, no-op unless ARCHIVE_ENABLED
     },
     "cleanup-old-checks": {
         "task": "app.tasks.cleanup_old_checks",
         "schedule": crontab(hour=3, minute=0),  # 3 AM daily
     },
+    "flush-heartbeat-pings": {
+        "task": "app.tasks.flush_heartbeat_pings",
+        "schedule": settings.HEARTBEAT_FLUSH_INTERVAL,  # coalesced pings -> DB
+    },
+    "flush-alert-buffers": {
+        "task": "app.tasks.flush_alert_buffers",
+        "schedule": float(2 * max(settings.ALERT_DIGEST_WINDOW, 30)),  # fallback if a scheduled flush was lost
+        "kwargs": {"fallback": True},
+    },
+    "refresh-rollup-sketches": {
+        "task": "app.tasks.refresh_rollup_sketches",
+        "schedule": float(settings.ROLLUP_SKETCH_INTERVAL),  # percentile sketches, off the check write path
+    },
     "check-heartbeat-monitors": {
         "task": "app.tasks.check_heartbeat_monitors",
         "schedule": 60.0,  # Every 60 seconds
@@ -0,0 +1,261 @@
+"""
+Compiled assertion plans.
+
+Compiling a monitor's assertions once (JSONPath expressions parsed, expected
+values pre-cast) leaves only the evaluation step for every check. Plans are
+kept in a worker-local LRU keyed by (monitor_id, assertions_version);
+save_assertions bumps Monitor.assertions_version, so an edited monitor simply
+misses the cache and gets a fresh plan.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+PLAN_CACHE_SIZE = 10000
+
+
+def _field(assertion, name: str, default=None):
+    if isinstance(assertion, dict):
+        return assertion.get(name, default)
+    return getattr(assertion, name, default)
+
+
+class CompiledAssertion:
+    """One active assertion with its JSONPath parsed and expected value pre-cast."""
+
+    __slots__ = ("atype", "path", "operator", "value", "expr", "error", "_casts")
+
+    def __init__(self, assertion):
+        self.atype = _field(assertion, "assertion_type", "jsonpath")
+        self.path = _field(assertion, "path")
+        self.operator = _field(assertion, "operator")
+        self.value = _field(assertion, "value")
+        self.expr = None
+        self.error = None
+
+        if self.atype == "jsonpath":
+            from jsonpath_ng import parse
+            from jsonpath_ng.exceptions import JsonPathParserError
+            try:
+                self.expr = parse(self.path)
+            except JsonPathParserError as e:
+                self.error = f"Invalid JSON path: {str(e)}"
+            except Exception as e:
+                self.error = str(e)
+
+        # String expectations are compared against numbers/booleans found in the
+        # response — cast them once per type instead of on every check
+        self._casts = {}
+        if isinstance(self.value, str):
+            for cast in (int, float, bool):
+                try:
+                    self._casts[cast] = cast(self.value)
+                except (ValueError, TypeError):
+                    pass
+
+    def expected_for(self, actual):
+        if self.value is not None and isinstance(actual, (int, float)) and isinstance(self.value, str):
+            return self._casts.get(type(actual), self.value)
+        return self.value
+
+    def compare(self, actual_values: list) -> bool:
+        """Compare the values extracted for this assertion against the expected value."""
+        operator = self.operator
+        if operator == "exists":
+            return len(actual_values) > 0
+
+        if operator == "is_null":
+            return all(v is None for v in actual_values) if actual_values else True
+
+        if operator == "is_not_null":
+            return all(v is not None for v in actual_values) if actual_values else False
+
+        if not actual_values:
+            return False
+
+        actual = actual_values[0]
+        expected = self.expected_for(actual)
+
+        if operator == "==":
+            return actual == expected
+        elif operator == "!=":
+            return actual != expected
+        elif operator == ">":
+            return actual > expected
+        elif operator == ">=":
+            return actual >= expected
+        elif operator == "<":
+            return actual < expected
+        elif operator == "<=":
+            return actual <= expected
+        elif operator == "contains":
+            return str(expected) in str(actual)
+        elif operator == "not_contains":
+            return str(expected) not in str(actual)
+        return False
+
+
+class AssertionPlan:
+    """All active assertions of one monitor, ready to evaluate."""
+
+    def __init__(self, assertions: list):
+        active = [a for a in assertions if _field(a, "is_active", True)]
+        self.logic = (_field(assertions[0], "logic", "AND") or "AND") if assertions else "AND"
+        self.items: List[CompiledAssertion] = [CompiledAssertion(a) for a in active]
+
+        self.needs_json = any(c.atype == "jsonpath" for c in self.items)
+        # Checks that need the complete body text (everything else is a substring search)
+        self.needs_full_body = self.needs_json or any(
+            c.atype == "keyword" and c.operator == "==" for c in self.items
+        )
+        self.needles = {
+            c.path for c in self.items
+            if c.atype == "keyword" and c.operator != "==" and c.path
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def run(self, response_body: str, response_headers: dict = None, keyword_hits: dict = None) -> dict:
+        """
+        Evaluate the plan. Returns the same dict as run_assertions.
+        keyword_hits: keyword -> found, precomputed by the streaming body scanner;
+        keywords missing from it are searched in response_body.
+        """
+        if not self.items:
+            return {"passed": True, "results": [], "error": None}
+
+        response_json = None
+        if self.needs_json:
+            try:
+                response_json = json.loads(response_body)
+            except Exception:
+                response_json = None
+
+        results = []
+        for c in self.items:
+            path = c.path
+            passed = False
+            actual_display = None
+            error = None
+
+            try:
+                if c.atype == "keyword":
+                    # Simple keyword check
+                    if keyword_hits is not None and path in keyword_hits:
+                        present = keyword_hits[path]
+                    else:
+                        present = path in response_body
+                    if c.operator in ("exists", "is_not_null"):
+                        passed = present if path else False
+                    elif c.operator in ("is_null", "not_contains"):
+                        passed = (not present) if path else True
+                    elif c.operator == "contains":
+                        passed = present if path else False
+                    elif c.operator == "==":
+                        passed = response_body == path
+                    else:
+                        passed = present if path else False
+                    actual_display = "present" if present else "absent"
+
+                elif c.atype == "header":
+                    headers = response_headers or {}
+                    # Case-insensitive header lookup
+                    header_val = next(
+                        (v for k, v in headers.items() if k.lower() == (path or '').lower()),
+                        None
+                    )
+                    actual_display = header_val
+                    passed = c.compare([header_val] if header_val is not None else [])
+
+                elif c.atype == "jsonpath":
+                    if response_json is None:
+                        passed = False
+                        error = "Response is not valid JSON"
+                    elif c.error:
+                        passed = False
+                        error = c.error
+                    else:
+                        matches = [m.value for m in c.expr.find(response_json)]
+                        actual_display = matches[0] if matches else None
+                        passed = c.compare(matches)
+
+            except Exception as e:
+                passed = False
+                error = str(e)
+
+            results.append({
+                "path": path,
+                "operator": c.operator,
+                "expected": c.value,
+                "actual": actual_display,
+                "passed": passed,
+                "error": error,
+            })
+
+        if self.logic == "OR":
+            overall = any(r["passed"] for r in results)
+        else:  # AND
+            overall = all(r["passed"] for r in results)
+
+        return {"passed": overall, "results": results, "error": None}
+
+
+EMPTY_PLAN = AssertionPlan([])
+
+_plans: "OrderedDict[tuple, AssertionPlan]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def cached_plan(monitor_id: str, version: int) -> Optional[AssertionPlan]:
+    key = (str(monitor_id), version or 0)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+        return plan
+
+
+def cache_plan(monitor_id: str, version: int, plan: AssertionPlan) -> None:
+    key = (str(monitor_id), version or 0)
+    with _plans_lock:
+        _plans[key] = plan
+        _plans.move_to_end(key)
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+
+
+def load_plans(db, specs: List[dict]) -> Dict[str, AssertionPlan]:
+    """
+    Assertion plans for the given probe specs, keyed by monitor id.
+    Only monitors missing from the cache (new or edited since) hit the database.
+    """
+    from app.models import MonitorAssertion
+
+    plans = {}
+    missing = {}
+    for spec in specs:
+        plan = cached_plan(spec["id"], spec["assertions_version"])
+        if plan is None:
+            missing[spec["id"]] = spec["assertions_version"]
+        else:
+            plans[spec["id"]] = plan
+
+    if missing:
+        rows = db.query(MonitorAssertion).filter(
+            MonitorAssertion.monitor_id.in_(list(missing)),
+            MonitorAssertion.is_active == True
+        ).order_by(MonitorAssertion.monitor_id, MonitorAssertion.order).all()
+
+        grouped = {}
+        for a in rows:
+            grouped.setdefault(str(a.monitor_id), []).append(a)
+
+        for monitor_id, version in missing.items():
+            plan = AssertionPlan(grouped.get(monitor_id, []))
+            cache_plan(monitor_id, version, plan)
+            plans[monitor_id] = plan
+
+    return plans
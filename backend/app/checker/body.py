@@ -0,0 +1,151 @@
+"""
+Streaming response body scanner.
+
+The probe feeds body chunks in as they arrive instead of loading the whole
+response into memory:
+  - plain keywords (legacy keyword and keyword assertions) are searched
+    chunk by chunk, keeping only a short overlap between chunks
+  - the decoded text is only kept when something needs the whole body
+    (jsonpath assertions, keyword "==" assertions, legacy regex)
+  - reading stops at the monitor's byte cap (max_response_bytes, and at most
+    CHECK_REGEX_MAX_SCAN_BYTES for regex keywords), or as soon as every body
+    check is decided
+"""
+
+import codecs
+import re
+from typing import Optional
+
+from app.checker.assertion_plan import AssertionPlan
+from app.checker.patterns import compiled_pattern
+from app.config import get_settings
+
+settings = get_settings()
+
+# Bytes still drained after every check is decided, so small responses finish
+# cleanly and their keep-alive connection goes back to the pool.
+DRAIN_BYTES = 64 * 1024
+
+# Characters of already-scanned text a legacy regex is re-run over, so matches
+# spanning two chunks are still found without searching the whole prefix again.
+REGEX_OVERLAP = 4096
+
+
+class BodyScanner:
+    """
+    Consumes one response body for a probe spec and its assertion plan.
+
+    Usage:
+        scanner = BodyScanner(spec, plan)
+        scanner.start(response.encoding)
+        for chunk in response.iter_bytes():
+            if not scanner.feed(chunk):
+                break
+        scanner.finish()
+    """
+
+    def __init__(self, spec: dict, plan: AssertionPlan):
+        self.max_bytes = spec.get("max_response_bytes") or settings.CHECK_MAX_RESPONSE_BYTES
+        self.bytes_read = 0
+        self.truncated = False
+
+        self.needs_full_body = plan.needs_full_body
+        needles = set(plan.needles)
+
+        # Legacy keyword check only runs when the monitor has no assertions
+        self.regex: Optional[re.Pattern] = None
+        keyword = spec.get("keyword")
+        if keyword and not plan:
+            if spec.get("use_regex"):
+                try:
+                    self.regex = compiled_pattern(keyword)
+                except re.error:
+                    pass  # reported as an invalid regex by evaluate_response
+                # Length guard: re has no timeout, so bound the text a regex runs over
+                self.max_bytes = min(self.max_bytes, settings.CHECK_REGEX_MAX_SCAN_BYTES)
+            else:
+                needles.add(keyword)
+
+        self.hits = {needle: False for needle in needles}
+        self._overlap = max((len(n) for n in needles), default=1) - 1
+        self._tail = ""
+        self._keep_text = self.needs_full_body or self.regex is not None
+        self._parts = []
+        self._regex_tail = ""
+        self._regex_found = False
+        self._decoder = None
+
+    def start(self, encoding: Optional[str]) -> None:
+        try:
+            decoder_cls = codecs.getincrementaldecoder(encoding or "utf-8")
+        except LookupError:
+            decoder_cls = codecs.getincrementaldecoder("utf-8")
+        self._decoder = decoder_cls(errors="replace")
+
+    @property
+    def decided(self) -> bool:
+        """True once the rest of the body cannot change any check outcome."""
+        if self.needs_full_body:
+            return False
+        if self.regex is not None and not self._regex_found:
+            return False
+        return all(self.hits.values())
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume one chunk. Returns False when the caller should stop reading."""
+        if self.decided:
+            self.bytes_read += len(chunk)
+            return self.bytes_read < DRAIN_BYTES
+
+        remaining = self.max_bytes - self.bytes_read
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        self._scan(self._decode(chunk, final=False))
+        return not self.truncated
+
+    def finish(self) -> None:
+        """Flush the decoder once the body is fully read (or abandoned)."""
+        if self._decoder is not None:
+            self._scan(self._decode(b"", final=True))
+            self._decoder = None
+
+    def _decode(self, chunk: bytes, final: bool) -> str:
+        if self._decoder is None:
+            self.start(None)
+        return self._decoder.decode(chunk, final)
+
+    def _scan(self, text: str) -> None:
+        if not text:
+            return
+
+        pending = [n for n, found in self.hits.items() if not found]
+        if pending:
+            window = self._tail + text
+            for needle in pending:
+                if needle in window:
+                    self.hits[needle] = True
+            if self._overlap:
+                self._tail = window[-self._overlap:]
+
+        if self._keep_text:
+            self._parts.append(text)
+
+        if self.regex is not None and not self._regex_found:
+            window = self._regex_tail + text
+            # Window hits are confirmed against the kept prefix, which is what
+            # evaluate_response will search (anchors can match differently in a window)
+            if self.regex.search(window) and self.regex.search(self.text):
+                self._regex_found = True
+            self._regex_tail = window[-REGEX_OVERLAP:]
+
+    @property
+    def text(self) -> str:
+        """Decoded body as far as it was kept ("" when only keywords were scanned)."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def truncation_note(self) -> str:
+        return f" (body truncated at {self.max_bytes} bytes)" if self.truncated else ""
@@ -0,0 +1,61 @@
+"""
+Asyncio batch executor — probes a chunk of monitors concurrently instead of
+one blocking request per Celery task.
+
+The event loop is kept for the lifetime of the worker process so the
+per-host keep-alive pools in http_pool survive between batches.
+"""
+
+import asyncio
+from typing import Dict, List
+
+from app.checker.assertion_plan import AssertionPlan, EMPTY_PLAN
+from app.checker.body import BodyScanner
+from app.checker.http_pool import asend
+from app.checker.probe import response_result, failure_result
+from app.config import get_settings
+
+settings = get_settings()
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+async def _probe(semaphore: asyncio.Semaphore, spec: dict, plan: AssertionPlan) -> dict:
+    async with semaphore:
+        try:
+            body = BodyScanner(spec, plan)
+            response, response_time_ms, timer = await asend(spec, body)
+            result = response_result(
+                spec, response.status_code, response_time_ms,
+                body, dict(response.headers), plan,
+            )
+            result["timings"] = timer.timings()
+            if timer.cert_expires_at:
+                result["ssl_expires_at"] = timer.cert_expires_at
+            return result
+        except Exception as e:
+            return failure_result(spec, e)
+
+
+async def run_probes(specs: List[dict], plans: Dict[str, AssertionPlan],
+                     concurrency: int = None) -> List[dict]:
+    """Probe every spec concurrently, at most `concurrency` requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency or settings.CHECK_CONCURRENCY)
+    return await asyncio.gather(*[
+        _probe(semaphore, spec, plans.get(spec["id"], EMPTY_PLAN))
+        for spec in specs
+    ])
+
+
+def probe_batch(specs: List[dict], plans: Dict[str, AssertionPlan]) -> List[dict]:
+    """Blocking entry point for Celery tasks. Results are in the same order as specs."""
+    if not specs:
+        return []
+    return _get_loop().run_until_complete(run_probes(specs, plans))
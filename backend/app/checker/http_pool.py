@@ -0,0 +1,345 @@
+"""
+Worker-scoped HTTP connection pools for probes, with per-phase timing.
+
+One httpx client per origin (scheme, host, port), so every host gets its own
+bounded set of keep-alive connections (HTTP_POOL_MAX_PER_HOST). Idle
+connections expire after HTTP_POOL_IDLE_SECONDS, and clients whose origin
+has not been probed for that long are closed. Monitors with
+reuse_connections=False get a throwaway client, so every probe pays the
+full DNS + TCP + TLS cost.
+
+New TLS connections to the monitored host also record the certificate expiry
+(cert_expires_at), which spares the daily SSL sweep a handshake for hosts
+probed recently. Handshakes with redirect targets (a CDN, login or www. host)
+are ignored: their certificate says nothing about the monitored one.
+
+Timings come from httpcore's "trace" extension plus a network backend that
+resolves DNS itself, so the DNS lookup is measured apart from the TCP connect:
+    dns_ms      getaddrinfo
+    connect_ms  TCP connect
+    tls_ms      TLS handshake
+    ttfb_ms     request sent → response headers received
+    download_ms response body read (until the body scanner stopped reading)
+dns/connect/tls are None when a pooled connection was reused.
+"""
+
+import contextlib
+import contextvars
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+import anyio
+import httpcore
+import httpx
+
+from app.checker.ssl_certs import host_port, parse_cert_expiry
+from app.config import get_settings
+
+settings = get_settings()
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("probe_phase_timer", default=None)
+
+
+class PhaseTimer:
+    """Collects phase durations for one probe (summed over redirect hops)."""
+
+    def __init__(self, origin: Optional[Tuple[str, int]] = None):
+        self.phases = {}
+        self.last_dns = 0.0
+        self.origin = origin  # (host, port) whose certificate expiry is recorded
+        self.cert_expires_at = None  # set when a new TLS connection to origin was opened
+        self._started = {}
+        self._connecting = None  # (host, port) of the connection being opened
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def _on_event(self, event_name: str, info: dict) -> None:
+        now = time.perf_counter()
+        if event_name.endswith(".started"):
+            self._started[event_name[:-8]] = now
+            if event_name == "connection.connect_tcp.started":
+                self._connecting = (str(info.get("host", "")).lower(), info.get("port"))
+        elif event_name.endswith(".complete"):
+            name = event_name[:-9]
+            started = self._started.pop(name, None)
+            if started is None:
+                return
+            if name == "connection.connect_tcp":
+                # The backend's connect_tcp includes our own DNS lookup
+                self.add("connect", now - started - self.last_dns)
+            elif name == "connection.start_tls":
+                self.add("tls", now - started)
+                if self.origin is not None and self._connecting == self.origin:
+                    self._record_cert(info.get("return_value"))
+            elif name.endswith(".receive_response_headers"):
+                request_start = self._started.pop("request", started)
+                self.add("ttfb", now - request_start)
+        if event_name.endswith(".send_request_headers.started"):
+            self._started["request"] = now
+
+    def _record_cert(self, stream) -> None:
+        try:
+            ssl_object = stream.get_extra_info("ssl_object")
+            self.cert_expires_at = parse_cert_expiry(ssl_object.getpeercert()) or self.cert_expires_at
+        except Exception:
+            pass  # expiry is a by-product; the daily sweep covers anything missed
+
+    def trace(self, event_name: str, info: dict) -> None:
+        self._on_event(event_name, info)
+
+    async def atrace(self, event_name: str, info: dict) -> None:
+        self._on_event(event_name, info)
+
+    def timings(self) -> dict:
+        def ms(phase):
+            value = self.phases.get(phase)
+            return int(value * 1000) if value is not None else None
+
+        return {
+            "dns_ms": ms("dns"),
+            "connect_ms": ms("connect"),
+            "tls_ms": ms("tls"),
+            "ttfb_ms": ms("ttfb"),
+            "download_ms": ms("download"),
+            "connection_reused": "connect" not in self.phases,
+        }
+
+
+def _record_dns(seconds: float) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add("dns", seconds)
+        timer.last_dns = seconds
+
+
+class _TimedBackend(httpcore.SyncBackend):
+    """Resolves the host before connecting so DNS time is measured on its own."""
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        start = time.perf_counter()
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        _record_dns(time.perf_counter() - start)
+
+        last_exc = None
+        for info in infos:
+            try:
+                return super().connect_tcp(info[4][0], port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                last_exc = e
+        raise last_exc or httpcore.ConnectError(f"No addresses for {host}")
+
+
+class _AsyncTimedBackend(httpcore.AnyIOBackend):
+    """Async counterpart of _TimedBackend."""
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        start = time.perf_counter()
+        infos = await anyio.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        _record_dns(time.perf_counter() - start)
+
+        last_exc = None
+        for info in infos:
+            try:
+                return await super().connect_tcp(info[4][0], port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                last_exc = e
+        raise last_exc or httpcore.ConnectError(f"No addresses for {host}")
+
+
+def _pool_kwargs(limits: httpx.Limits) -> dict:
+    return {
+        "ssl_context": httpx.create_ssl_context(),
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+    }
+
+
+class _TimedTransport(httpx.HTTPTransport):
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits)
+        # httpx does not expose network_backend, so swap in our own connection pool
+        self._pool = httpcore.ConnectionPool(network_backend=_TimedBackend(), **_pool_kwargs(limits))
+
+
+class _AsyncTimedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits)
+        self._pool = httpcore.AsyncConnectionPool(network_backend=_AsyncTimedBackend(), **_pool_kwargs(limits))
+
+
+def _origin(url: str) -> tuple:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return scheme, (parts.hostname or "").lower(), port
+
+
+def _pooled_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_PER_HOST,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_PER_HOST,
+        keepalive_expiry=settings.HTTP_POOL_IDLE_SECONDS,
+    )
+
+
+# Cold probes: a single connection that is never kept alive
+_COLD_LIMITS = httpx.Limits(max_connections=1, max_keepalive_connections=0)
+
+
+class ClientPool:
+    """Per-origin httpx clients with idle eviction (sync or async flavour)."""
+
+    def __init__(self, is_async: bool = False):
+        self.is_async = is_async
+        self._clients: "OrderedDict[tuple, list]" = OrderedDict()  # origin -> [client, last_used]
+        self._lock = threading.Lock()
+
+    def _new_client(self, limits: httpx.Limits):
+        if self.is_async:
+            return httpx.AsyncClient(transport=_AsyncTimedTransport(limits), follow_redirects=True)
+        return httpx.Client(transport=_TimedTransport(limits), follow_redirects=True)
+
+    def cold_client(self):
+        """Throwaway client for monitors that opted out of connection reuse. Caller closes it."""
+        return self._new_client(_COLD_LIMITS)
+
+    def get(self, url: str):
+        origin = _origin(url)
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            entry = self._clients.get(origin)
+            if entry is None:
+                entry = [self._new_client(_pooled_limits()), now]
+                self._clients[origin] = entry
+            entry[1] = now
+            self._clients.move_to_end(origin)
+
+            # Oldest first: evict clients idle for too long or beyond the host cap
+            for key, (client, last_used) in list(self._clients.items()):
+                if key == origin:
+                    continue
+                if (len(self._clients) > settings.HTTP_POOL_MAX_HOSTS
+                        or now - last_used > settings.HTTP_POOL_IDLE_SECONDS):
+                    stale.append(client)
+                    del self._clients[key]
+                else:
+                    break
+        return entry[0], stale
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+_sync_pool: Optional[ClientPool] = None
+_async_pool: Optional[ClientPool] = None
+
+
+def get_sync_pool() -> ClientPool:
+    global _sync_pool
+    if _sync_pool is None:
+        _sync_pool = ClientPool()
+    return _sync_pool
+
+
+def get_async_pool() -> ClientPool:
+    """Async pool — only valid on the worker's persistent event loop (see executor.py)."""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = ClientPool(is_async=True)
+    return _async_pool
+
+
+def send(spec: dict, body) -> tuple:
+    """
+    Perform the probe request for `spec` on a pooled (or cold) client and
+    stream the response body into `body` (a BodyScanner), which decides how
+    much of it is read. Returns (response, elapsed_ms, PhaseTimer).
+    """
+    pool = get_sync_pool()
+    timer = PhaseTimer(host_port(spec["url"]))
+    if spec.get("reuse_connections", True):
+        client, stale = pool.get(spec["url"])
+        for old in stale:
+            old.close()
+    else:
+        client = pool.cold_client()
+
+    token = _current_timer.set(timer)
+    try:
+        start_time = time.time()
+        request = client.build_request(
+            spec["method"],
+            spec["url"],
+            headers=spec["headers"],
+            content=spec["body"],
+            timeout=spec["timeout"],
+            extensions={"trace": timer.trace},
+        )
+        response = client.send(request, stream=True)
+        try:
+            download_start = time.perf_counter()
+            body.start(response.encoding)
+            for chunk in response.iter_bytes():
+                if not body.feed(chunk):
+                    break
+            body.finish()
+            timer.add("download", time.perf_counter() - download_start)
+        finally:
+            response.close()
+        elapsed_ms = int((time.time() - start_time) * 1000)
+    finally:
+        _current_timer.reset(token)
+        if not spec.get("reuse_connections", True):
+            client.close()
+
+    return response, elapsed_ms, timer
+
+
+async def asend(spec: dict, body) -> tuple:
+    """Async counterpart of send()."""
+    pool = get_async_pool()
+    timer = PhaseTimer(host_port(spec["url"]))
+    if spec.get("reuse_connections", True):
+        client, stale = pool.get(spec["url"])
+        for old in stale:
+            await old.aclose()
+    else:
+        client = pool.cold_client()
+
+    token = _current_timer.set(timer)
+    try:
+        start_time = time.time()
+        request = client.build_request(
+            spec["method"],
+            spec["url"],
+            headers=spec["headers"],
+            content=spec["body"],
+            timeout=spec["timeout"],
+            extensions={"trace": timer.atrace},
+        )
+        response = await client.send(request, stream=True)
+        try:
+            download_start = time.perf_counter()
+            body.start(response.encoding)
+            async with contextlib.aclosing(response.aiter_bytes()) as chunks:
+                async for chunk in chunks:
+                    if not body.feed(chunk):
+                        break
+            body.finish()
+            timer.add("download", time.perf_counter() - download_start)
+        finally:
+            await response.aclose()
+        elapsed_ms = int((time.time() - start_time) * 1000)
+    finally:
+        _current_timer.reset(token)
+        if not spec.get("reuse_connections", True):
+            await client.aclose()
+
+    return response, elapsed_ms, timer
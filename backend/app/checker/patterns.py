@@ -0,0 +1,86 @@
+"""
+Compiled regex patterns for legacy keyword checks (use_regex=True).
+
+Workers keep their own bounded LRU of compiled patterns instead of relying on
+the small shared `re` cache, which thrashes once a worker probes thousands of
+distinct patterns.
+
+Python's re has no match timeout, so runaway backtracking is contained two ways:
+  - validate_pattern() rejects, at save time, patterns with an unbounded
+    quantifier around another unbounded quantifier (the classic (a+)+ shape)
+  - probes only run the regex over the first CHECK_REGEX_MAX_SCAN_BYTES of the body
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+PATTERN_CACHE_SIZE = 5000
+MAX_PATTERN_LENGTH = 500  # same as Monitor.keyword
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_UNBOUNDED = sre_parse.MAXREPEAT
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compiled_pattern(pattern: str) -> re.Pattern:
+    """Compile (or fetch) a keyword regex. Raises re.error for invalid patterns."""
+    return re.compile(pattern)
+
+
+def _has_unbounded_repeat(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS:
+            if av[1] == _UNBOUNDED or _has_unbounded_repeat(av[2]):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _has_unbounded_repeat(av[-1]):
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_has_unbounded_repeat(branch) for branch in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _has_unbounded_repeat(av[1]):
+                return True
+    return False
+
+
+def _has_nested_repeat(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS:
+            _, max_count, body = av
+            if max_count == _UNBOUNDED and _has_unbounded_repeat(body):
+                return True
+            if _has_nested_repeat(body):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _has_nested_repeat(av[-1]):
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_has_nested_repeat(branch) for branch in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _has_nested_repeat(av[1]):
+                return True
+    return False
+
+
+def validate_pattern(pattern: str) -> Optional[str]:
+    """Return an error message if the pattern can't be used as a keyword regex, else None."""
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"Regex is too long (max {MAX_PATTERN_LENGTH} characters)"
+    try:
+        compiled_pattern(pattern)
+        parsed = sre_parse.parse(pattern)
+    except re.error as e:
+        return f"Invalid regex: {e}"
+    except RecursionError:
+        return "Regex is too deeply nested"
+    if _has_nested_repeat(parsed):
+        return "Regex has nested repetition like (a+)+ which can take exponential time; simplify the pattern"
+    return None
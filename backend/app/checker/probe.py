@@ -0,0 +1,149 @@
+"""
+Probe helpers shared by the single-check task and the batch executor.
+
+Everything here works on plain dicts so the async executor never touches
+ORM objects from inside the event loop.
+"""
+
+import re
+from datetime import datetime
+
+import httpx
+
+from app.checker.assertion_plan import AssertionPlan
+from app.checker.body import BodyScanner
+from app.checker.patterns import compiled_pattern
+
+
+def probe_spec(monitor) -> dict:
+    """Snapshot the fields of a Monitor that are needed to probe it and record the result."""
+    method = monitor.method or "GET"
+    return {
+        "id": str(monitor.id),
+        "name": monitor.name,
+        "url": monitor.url,
+        "method": method,
+        "headers": monitor.headers or {},
+        "body": monitor.body if method in ["POST", "PUT", "PATCH"] else None,
+        "timeout": monitor.timeout or 30,
+        "expected_status": monitor.expected_status,
+        "keyword": monitor.keyword,
+        "keyword_present": monitor.keyword_present,
+        "use_regex": getattr(monitor, "use_regex", False),
+        "reuse_connections": monitor.reuse_connections is not False,
+        "max_response_bytes": monitor.max_response_bytes,
+        "assertions_version": monitor.assertions_version or 0,
+        "interval": monitor.interval,
+        "alert_threshold": monitor.alert_threshold,
+        "last_status": monitor.last_status,
+        "consecutive_failures": monitor.consecutive_failures,
+        "alert_sent": monitor.alert_sent,
+    }
+
+
+def evaluate_response(spec: dict, status_code: int, body: BodyScanner,
+                      headers: dict, plan: AssertionPlan) -> tuple:
+    """
+    Decide the check status for a received response, whose body was
+    consumed by `body`. Returns (status, error_message).
+    """
+    # Step 1: status code check
+    if status_code == spec["expected_status"]:
+        status = "up"
+        error_message = None
+    else:
+        status = "degraded"
+        error_message = f"Expected status {spec['expected_status']}, got {status_code}"
+
+    # Step 2: assertions check (keyword/regex/jsonpath)
+    if status == "up" and plan:
+        try:
+            result = plan.run(body.text, headers, keyword_hits=body.hits)
+            if not result["passed"]:
+                status = "degraded"
+                failed = [r for r in result["results"] if not r["passed"]]
+                if failed:
+                    f = failed[0]
+                    error_message = f"Assertion failed: {f['path']} {f['operator']} {f['expected']} (got: {f['actual']})"
+                else:
+                    error_message = "Assertion failed"
+                error_message += body.truncation_note()
+        except Exception as e:
+            print(f"Assertion check error: {e}")
+
+    # Step 2b: legacy keyword/regex check (only if no assertions defined)
+    keyword = spec["keyword"]
+    if status == "up" and keyword and not plan:
+        try:
+            if spec["use_regex"]:
+                try:
+                    keyword_found = bool(compiled_pattern(keyword).search(body.text))
+                    pattern_label = f"Pattern '{keyword}'"
+                except re.error:
+                    keyword_found = False
+                    pattern_label = f"Invalid regex '{keyword}'"
+            else:
+                keyword_found = body.hits[keyword]
+                pattern_label = f"Keyword '{keyword}'"
+            if spec["keyword_present"] and not keyword_found:
+                status = "degraded"
+                error_message = f"{pattern_label} not found in response body{body.truncation_note()}"
+            elif not spec["keyword_present"] and keyword_found:
+                status = "degraded"
+                error_message = f"{pattern_label} found in response body (expected absent)"
+        except Exception as e:
+            print(f"Keyword check error: {e}")
+
+    return status, error_message
+
+
+def response_result(spec: dict, status_code: int, response_time_ms: int,
+                    body: BodyScanner, headers: dict, plan: AssertionPlan) -> dict:
+    """Build the result dict for a probe that received a response."""
+    status, error_message = evaluate_response(spec, status_code, body, headers, plan)
+    return {
+        "monitor_id": spec["id"],
+        "status": status,
+        "status_code": status_code,
+        "response_time": response_time_ms,
+        "error_message": error_message,
+        "checked_at": datetime.utcnow(),
+    }
+
+
+def failure_result(spec: dict, exc: Exception) -> dict:
+    """Build the result dict for a probe that never got a response."""
+    if isinstance(exc, httpx.TimeoutException):
+        error_message = f"Request timed out after {spec['timeout']} seconds"
+    elif isinstance(exc, (httpx.NetworkError, OSError)):
+        error_message = f"Connection error: {str(exc)[:200]}"
+    else:
+        error_message = f"Error: {str(exc)[:200]}"
+
+    return {
+        "monitor_id": spec["id"],
+        "status": "down",
+        "status_code": None,
+        "response_time": None,
+        "error_message": error_message,
+        "checked_at": datetime.utcnow(),
+    }
+
+
+def run_probe(spec: dict, plan: AssertionPlan) -> dict:
+    """Blocking probe on the worker's per-host connection pool."""
+    from app.checker.http_pool import send
+
+    try:
+        body = BodyScanner(spec, plan)
+        response, response_time_ms, timer = send(spec, body)
+        result = response_result(
+            spec, response.status_code, response_time_ms,
+            body, dict(response.headers), plan,
+        )
+        result["timings"] = timer.timings()
+        if timer.cert_expires_at:
+            result["ssl_expires_at"] = timer.cert_expires_at
+        return result
+    except Exception as e:
+        return failure_result(spec, e)
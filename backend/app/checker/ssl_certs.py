@@ -0,0 +1,77 @@
+"""
+SSL certificate expiry lookups.
+
+The daily sweep (check_ssl_certificates) handshakes each distinct host:port
+once, concurrently, instead of once per monitor in a serial loop. Regular
+HTTPS probes also record the certificate expiry whenever they open a new TLS
+connection (see http_pool.PhaseTimer), so the sweep only has to cover hosts
+that no probe has seen recently.
+"""
+
+import asyncio
+import ssl
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def host_port(url: str) -> Optional[Tuple[str, int]]:
+    """(hostname, port) for an HTTPS URL, None for anything else."""
+    parsed = urlparse(url)
+    if parsed.scheme != "https" or not parsed.hostname:
+        return None
+    return parsed.hostname.lower(), parsed.port or 443
+
+
+def parse_cert_expiry(cert: Optional[dict]) -> Optional[datetime]:
+    """notAfter of a getpeercert() dict as a naive UTC datetime."""
+    if not cert or "notAfter" not in cert:
+        return None
+    # Strip trailing timezone label (e.g. " GMT") before parsing — %Z is unreliable
+    expiry_no_tz = cert["notAfter"].rsplit(" ", 1)[0]
+    return datetime.strptime(expiry_no_tz, "%b %d %H:%M:%S %Y")
+
+
+async def fetch_cert_expiry(host: str, port: int, timeout: float = 10) -> Optional[datetime]:
+    """Handshake with host:port and return the certificate expiry. None on any error."""
+    ctx = ssl.create_default_context()
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ctx, server_hostname=host),
+            timeout=timeout,
+        )
+        return parse_cert_expiry(writer.get_extra_info("peercert"))
+    except Exception as e:
+        print(f"[SSL] check error for {host}:{port}: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=timeout)
+            except Exception:
+                pass
+
+
+async def _fetch_all(targets: Iterable[Tuple[str, int]], concurrency: int,
+                     timeout: float) -> Dict[Tuple[str, int], Optional[datetime]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    unique = list(dict.fromkeys(targets))  # one handshake per host:port for the whole run
+
+    async def fetch(target):
+        async with semaphore:
+            return await fetch_cert_expiry(target[0], target[1], timeout)
+
+    results = await asyncio.gather(*[fetch(t) for t in unique])
+    return dict(zip(unique, results))
+
+
+def fetch_cert_expiries(targets: Iterable[Tuple[str, int]], concurrency: int = None,
+                        timeout: float = 10) -> Dict[Tuple[str, int], Optional[datetime]]:
+    """Blocking entry point: expiry per (host, port), None where the handshake failed."""
+    return asyncio.run(_fetch_all(targets, concurrency or settings.SSL_SWEEP_CONCURRENCY, timeout))
@@ -0,0 +1,261 @@
+"""
+Buffered result writer — collects check outcomes and writes them in batches.
+
+Each flush is one transaction:
+  - checks:   multi-row INSERT on Postgres, executemany on SQLite
+  - rollups:  the same checks folded into hour / day buckets (app/rollups.py)
+  - incidents opened / closed on status transitions (app/incidents.py)
+  - monitors: one UPDATE ... FROM (VALUES ...) on Postgres, executemany on SQLite
+Alerts are dispatched only after the flush has committed.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import Boolean, DateTime, Integer, String, bindparam, column, insert, values
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import is_postgres
+from app.models import Check, Monitor, generate_uuid
+from app.incidents import record_incidents
+from app.rollups import record_rollups
+
+settings = get_settings()
+
+# Keep a single statement well below Postgres' 65535 bind parameter limit
+MAX_ROWS_PER_STATEMENT = 1000
+
+# Probe timing key -> Check column
+TIMING_COLUMNS = {
+    "dns_ms": "dns_time",
+    "connect_ms": "connect_time",
+    "tls_ms": "tls_time",
+    "ttfb_ms": "ttfb_time",
+    "download_ms": "download_time",
+    "connection_reused": "connection_reused",
+}
+
+# Monitor columns written back after checks (ssl_* only when a probe saw a certificate,
+# last_ping_at by the heartbeat flush)
+MONITOR_STATE_COLUMNS = {
+    "last_status": String,
+    "last_checked_at": DateTime,
+    "next_check_at": DateTime,
+    "consecutive_failures": Integer,
+    "alert_sent": Boolean,
+    "ssl_expires_at": DateTime,
+    "ssl_last_checked": DateTime,
+    "last_ping_at": DateTime,
+}
+
+
+def _chunks(rows: list, size: int = MAX_ROWS_PER_STATEMENT):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def bulk_insert_checks(db: Session, rows: List[dict]) -> None:
+    """
+    Insert check rows (dicts keyed by Check column names) without going through
+    the ORM, and add them to the rollup buckets and incidents in the same transaction.
+    """
+    table = Check.__table__
+
+    # JSON columns turn an explicit None into JSON 'null' — group rows by the keys
+    # they actually carry so unset columns stay SQL NULL.
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    for group in groups.values():
+        for chunk in _chunks(group):
+            if is_postgres:
+                db.execute(insert(table).values(chunk))
+            else:
+                db.execute(insert(table), chunk)
+
+    record_rollups(db, rows)
+    record_incidents(db, rows)
+
+
+def bulk_update_monitors(db: Session, rows: List[dict]) -> None:
+    """
+    Update monitor state columns for many monitors at once.
+    Every row carries "id" plus any subset of MONITOR_STATE_COLUMNS.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(c for c in MONITOR_STATE_COLUMNS if c in row), []).append(row)
+
+    for cols, group in groups.items():
+        _update_monitor_group(db, list(cols), group)
+
+
+def _update_monitor_group(db: Session, cols: List[str], rows: List[dict]) -> None:
+    table = Monitor.__table__
+
+    for chunk in _chunks(rows):
+        if is_postgres:
+            v = values(
+                column("id", String),
+                *[column(c, MONITOR_STATE_COLUMNS[c]) for c in cols],
+                name="v",
+            ).data([tuple(r[k] for k in ["id"] + cols) for r in chunk])
+            db.execute(
+                table.update()
+                .where(table.c.id == v.c.id)
+                .values({c: v.c[c] for c in cols})
+            )
+        else:
+            stmt = (
+                table.update()
+                .where(table.c.id == bindparam("_id"))
+                .values({c: bindparam(f"_{c}") for c in cols})
+            )
+            db.execute(stmt, [{f"_{k}": v for k, v in r.items()} for r in chunk])
+
+
+class CheckResultWriter:
+    """
+    Collects probe results and flushes them once batch_size results are
+    buffered or flush_interval seconds have passed since the last flush.
+
+    Usage:
+        writer = CheckResultWriter(db)
+        for spec, result in zip(specs, results):
+            writer.add(spec, result)
+        writer.flush()
+    """
+
+    def __init__(self, db: Session, batch_size: int = None, flush_interval: float = None):
+        self.db = db
+        self.batch_size = batch_size or settings.CHECK_WRITE_BATCH_SIZE
+        self.flush_interval = settings.CHECK_WRITE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._checks: List[dict] = []
+        self._monitors: dict = {}  # monitor_id -> state row (latest wins)
+        self._alerts: List[tuple] = []
+        self._changed: set = set()  # monitors whose status changed (status page cache)
+        self._last_flush = time.monotonic()
+
+    def _state(self, spec: dict) -> dict:
+        """Current monitor state — buffered value if this monitor was already checked in this batch."""
+        buffered = self._monitors.get(spec["id"])
+        if buffered:
+            return buffered
+        return {
+            "last_status": spec["last_status"],
+            "consecutive_failures": spec["consecutive_failures"] or 0,
+            "alert_sent": bool(spec["alert_sent"]),
+        }
+
+    def add(self, spec: dict, result: dict) -> dict:
+        """
+        Buffer one probe result (spec from probe_spec, result from the probe).
+        Returns the check row that will be written.
+        """
+        status = result["status"]
+        state = self._state(spec)
+        previous_status = state["last_status"]
+        now = datetime.utcnow()
+
+        check = {
+            "id": generate_uuid(),
+            "monitor_id": spec["id"],
+            "status": status,
+            "status_code": result["status_code"],
+            "response_time": result["response_time"],
+            "error_message": result["error_message"],
+            "checked_at": result["checked_at"],
+        }
+        timings = result.get("timings")
+        if timings:
+            for key, col in TIMING_COLUMNS.items():
+                check[col] = timings.get(key)
+
+        # Track consecutive failures for alert threshold
+        threshold = spec["alert_threshold"] or 1
+        if status in ("down", "degraded"):
+            consecutive_failures = state["consecutive_failures"] + 1
+        else:
+            consecutive_failures = 0
+        alert_sent = state["alert_sent"]
+
+        # Alert logic:
+        # - Recovery (any → up): always alert immediately, reset alert_sent flag
+        # - Failure: alert only when threshold is first reached AND no alert sent yet for this incident
+        if status == "up" and previous_status and previous_status != "up":
+            print(f"Recovery: {spec['name']} {previous_status} -> up")
+            alert_sent = False
+            self._alerts.append((spec["id"], status, previous_status, None))
+        elif status != "up" and consecutive_failures >= threshold and not alert_sent:
+            print(f"Threshold reached ({threshold}): {spec['name']} {previous_status} -> {status}")
+            # AI analysis only at alert time (not every failed check)
+            from app.ai.analyzer import analyze_incident
+            ai_analysis = analyze_incident(
+                monitor_name=spec["name"],
+                monitor_url=spec["url"],
+                status=status,
+                status_code=check["status_code"],
+                response_time=check["response_time"],
+                error_message=check["error_message"],
+            )
+            if ai_analysis:
+                check["ai_analysis"] = ai_analysis
+            alert_sent = True
+            self._alerts.append((spec["id"], status, previous_status or status, ai_analysis))
+
+        if status != previous_status:
+            self._changed.add(spec["id"])
+
+        self._checks.append(check)
+        monitor_row = {
+            "id": spec["id"],
+            "last_status": status,
+            "last_checked_at": now,
+            "next_check_at": now + timedelta(seconds=spec["interval"]),
+            "consecutive_failures": consecutive_failures,
+            "alert_sent": alert_sent,
+        }
+        if result.get("ssl_expires_at"):
+            monitor_row["ssl_expires_at"] = result["ssl_expires_at"]
+            monitor_row["ssl_last_checked"] = now
+        elif "ssl_expires_at" in state:
+            # Keep a certificate seen earlier in this batch
+            monitor_row["ssl_expires_at"] = state["ssl_expires_at"]
+            monitor_row["ssl_last_checked"] = state["ssl_last_checked"]
+        self._monitors[spec["id"]] = monitor_row
+
+        if (len(self._checks) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+        return check
+
+    def flush(self) -> int:
+        """Write everything buffered in one transaction, then dispatch alerts. Returns checks written."""
+        self._last_flush = time.monotonic()
+        if not self._checks:
+            return 0
+
+        checks, monitors, alerts = self._checks, list(self._monitors.values()), self._alerts
+        changed = self._changed
+        self._checks, self._monitors, self._alerts, self._changed = [], {}, [], set()
+
+        try:
+            bulk_insert_checks(self.db, checks)
+            bulk_update_monitors(self.db, monitors)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        from app.tasks import send_alerts
+        for monitor_id, new_status, old_status, ai_analysis in alerts:
+            send_alerts.delay(monitor_id, new_status, old_status, ai_analysis)
+
+        from app.status_cache import invalidate
+        invalidate(changed)
+
+        return len(checks)
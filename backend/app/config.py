@@ -39,6 +39,62 @@ class Settings(BaseSettings):
     # AI
     AI_MODEL: str = "claude-haiku-4-5-20251001"
 
+    # Check engine
+    CHECK_EXECUTOR: str = "single"  # single (one task per monitor) | batch (asyncio executor)
+    CHECK_BATCH_SIZE: int = 200  # monitors claimed per batch task
+    CHECK_CONCURRENCY: int = 100  # concurrent HTTP probes per batch task
+    CHECK_WRITE_BATCH_SIZE: int = 500  # check results buffered before a bulk write
+    CHECK_WRITE_FLUSH_INTERVAL: float = 5.0  # seconds before a partial buffer is flushed anyway
+    CHECK_MAX_RESPONSE_BYTES: int = 1048576  # response body bytes read per probe unless the monitor overrides it
+    CHECK_REGEX_MAX_SCAN_BYTES: int = 262144  # body bytes a legacy keyword regex is run over
+
+    # Probe connection pools (per scheme/host/port, per worker process)
+    HTTP_POOL_MAX_PER_HOST: int = 10  # max open connections to one origin
+    HTTP_POOL_IDLE_SECONDS: float = 60.0  # idle keep-alive connections / clients are closed after this
+    HTTP_POOL_MAX_HOSTS: int = 2000  # least recently used origins are evicted beyond this
+
+    # SSL certificate sweep
+    SSL_SWEEP_CONCURRENCY: int = 50  # concurrent TLS handshakes in the daily sweep
+    SSL_SWEEP_STALE_HOURS: int = 20  # certificates seen by probes more recently than this are not re-checked
+
+    # Heartbeat ingestion
+    HEARTBEAT_FLUSH_INTERVAL: float = 5.0  # seconds between flushes of coalesced pings to the DB
+    HEARTBEAT_TOKEN_CACHE_SECONDS: int = 30  # token -> monitor lookups cached per API process
+    HEARTBEAT_CHECK_SAMPLE_SECONDS: int = 300  # at most one "up" check row per monitor per window
+
+    # Scheduler (python -m app.scheduler)
+    SCHEDULER_JITTER_SECONDS: float = 2.0  # random delay added to each dispatch
+    SCHEDULER_RESYNC_INTERVAL: int = 300  # full reload from the monitors table
+    SCHEDULER_HEARTBEAT_TTL: int = 30  # beat fallback kicks in once this expires
+
+    # Check rollups (app/rollups.py)
+    ROLLUP_SKETCH_INTERVAL: int = 300  # seconds between latency sketch refreshes (percentiles lag writes by up to this)
+
+    # Alert digests (app/alert_buffer.py)
+    ALERT_DIGEST_WINDOW: int = 30  # seconds changes are buffered per channel before sending (0 = send immediately)
+    ALERT_DIGEST_THRESHOLD: int = 3  # up to this many monitors changed in a window still get individual alerts
+
+    # Alert delivery (app/alert_transport.py)
+    ALERT_HTTP_POOL_SIZE: int = 10  # keep-alive connections per destination host per worker process
+    ALERT_MAX_RATE_WAIT: int = 30  # seconds a send may wait on rate limits / Retry-After before the task retry takes over
+
+    # Public status page cache
+    STATUS_CACHE_TTL: int = 60  # seconds a precomputed payload is served before one reader rebuilds it
+    STATUS_CACHE_MAX_AGE: int = 30  # Cache-Control max-age for browsers / CDNs
+    BADGE_CACHE_TTL: int = 300  # seconds a rendered badge is served before it is rebuilt (status changes: earlier)
+    BADGE_CACHE_MAX_AGE: int = 300  # Cache-Control max-age for README image proxies
+
+    # Check history archive (Parquet, needs pyarrow)
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_URI: str = "file:///var/lib/checkapi/archive"  # or s3://bucket/prefix?endpoint_override=host:port
+    ARCHIVE_AFTER_DAYS: int = 30  # months that ended this long ago move out of the checks table
+
+    # Checks table partitions (Postgres, see app/partitions.py)
+    CHECK_PARTITION_PREMAKE_DAYS: int = 7  # daily partitions created ahead of time
+
+    # Monthly SLA report emails
+    SLA_REPORT_SHARDS: int = 16  # user shards, one Celery task each
+
     # Frontend
     FRONTEND_URL: str = "http://localhost:3000"
     
@@ -0,0 +1,203 @@
+"""
+Heartbeat ingestion with write coalescing.
+
+A ping used to cost a monitor lookup, an UPDATE, a Check INSERT and a commit,
+all blocking the event loop. Now:
+  - tokens resolve from a per-process cache (HEARTBEAT_TOKEN_CACHE_SECONDS)
+  - a ping is one HSET into PINGS_KEY (monitor_id -> latest ping timestamp),
+    so repeated pings from one job collapse into a single field
+  - flush_pings() (Celery beat, every HEARTBEAT_FLUSH_INTERVAL seconds) writes
+    last_ping_at for every pinged monitor in bulk, and records a Check row only
+    when the monitor changes state or once per HEARTBEAT_CHECK_SAMPLE_SECONDS
+
+If Redis is unavailable the ping is written straight to the database as before.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import Monitor, Check
+from app.incidents import record_incidents
+from app.rollups import record_rollups
+
+settings = get_settings()
+
+PINGS_KEY = "checkapi:heartbeat:pings"
+SAMPLED_KEY = "checkapi:heartbeat:sampled:{}"
+
+TOKEN_CACHE_SIZE = 100000
+# Unknown tokens are remembered briefly so a misconfigured job can't hammer the DB
+NEGATIVE_CACHE_SECONDS = 5
+
+_tokens: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (expires_at, info or None)
+_tokens_lock = threading.Lock()
+
+
+def cached_token(token: str):
+    """(hit, info) from the token cache — no I/O, safe to call on the event loop."""
+    with _tokens_lock:
+        entry = _tokens.get(token)
+        if entry is None:
+            return False, None
+        if entry[0] < time.monotonic():
+            del _tokens[token]
+            return False, None
+        _tokens.move_to_end(token)
+        return True, entry[1]
+
+
+def _cache_token(token: str, info: Optional[dict]) -> None:
+    ttl = settings.HEARTBEAT_TOKEN_CACHE_SECONDS if info else NEGATIVE_CACHE_SECONDS
+    with _tokens_lock:
+        _tokens[token] = (time.monotonic() + ttl, info)
+        _tokens.move_to_end(token)
+        while len(_tokens) > TOKEN_CACHE_SIZE:
+            _tokens.popitem(last=False)
+
+
+def resolve_token(db: Session, token: str) -> Optional[dict]:
+    """Active heartbeat monitor for a token as {"id", "name", "heartbeat_interval"}, or None."""
+    hit, info = cached_token(token)
+    if hit:
+        return info
+
+    row = db.query(Monitor.id, Monitor.name, Monitor.heartbeat_interval).filter(
+        Monitor.heartbeat_token == token,
+        Monitor.monitor_type == "heartbeat",
+        Monitor.is_active == True
+    ).first()
+    info = {"id": str(row.id), "name": row.name, "heartbeat_interval": row.heartbeat_interval} if row else None
+    _cache_token(token, info)
+    return info
+
+
+async def record_ping(monitor_id: str, now: datetime) -> None:
+    """Queue a ping for the next flush. Raises if Redis is unavailable."""
+    from app.redis_client import get_async_redis
+    # Naive UTC → epoch seconds (datetime.timestamp() would read `now` as local time)
+    await get_async_redis().hset(PINGS_KEY, monitor_id, (now - datetime(1970, 1, 1)).total_seconds())
+
+
+def write_ping(db: Session, monitor_id: str, now: datetime) -> None:
+    """Direct database write — the path used when Redis is down."""
+    monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
+    if not monitor:
+        return
+
+    previous_status = monitor.last_status
+
+    # Update last ping time
+    monitor.last_ping_at = now
+    monitor.last_status = "up"
+    monitor.last_checked_at = now
+    monitor.updated_at = now
+
+    # Record check
+    check = Check(
+        monitor_id=str(monitor.id),
+        status="up",
+        status_code=200,
+        response_time=0,
+        error_message=None,
+        checked_at=now,
+    )
+    db.add(check)
+    check_row = {"monitor_id": check.monitor_id, "status": "up", "response_time": 0, "checked_at": now}
+    record_rollups(db, [check_row])
+    record_incidents(db, [check_row])
+    db.commit()
+
+    if previous_status != "up":
+        from app.status_cache import invalidate
+        invalidate([monitor.id])
+
+    # Send recovery alert if was down
+    if previous_status == "down":
+        from app.tasks import send_alerts
+        send_alerts.delay(str(monitor.id), "up", "down")
+
+
+def flush_pings(db: Session) -> int:
+    """Write every coalesced ping to the database. Returns the number of monitors updated."""
+    from app.checker.writer import bulk_insert_checks, bulk_update_monitors
+    from app.models import generate_uuid
+    from app.redis_client import get_redis
+
+    r = get_redis()
+    pipe = r.pipeline(transaction=True)
+    pipe.hgetall(PINGS_KEY)
+    pipe.delete(PINGS_KEY)
+    pings, _ = pipe.execute()
+    if not pings:
+        return 0
+
+    try:
+        rows = db.query(Monitor.id, Monitor.last_status, Monitor.last_ping_at).filter(
+            Monitor.id.in_(list(pings)),
+            Monitor.monitor_type == "heartbeat",
+            Monitor.is_active == True
+        ).all()
+
+        now = datetime.utcnow()
+        updates, checks, recovered, changed = [], [], [], []
+        sampling = r.pipeline(transaction=False)
+        for row in rows:
+            monitor_id = str(row.id)
+            pinged_at = datetime.utcfromtimestamp(float(pings[monitor_id]))
+            if row.last_ping_at and row.last_ping_at > pinged_at:
+                pinged_at = row.last_ping_at
+            updates.append({
+                "id": monitor_id,
+                "last_ping_at": pinged_at,
+                "last_status": "up",
+                "last_checked_at": now,
+            })
+            sampling.set(SAMPLED_KEY.format(monitor_id), 1, nx=True,
+                         ex=settings.HEARTBEAT_CHECK_SAMPLE_SECONDS)
+        sampled = sampling.execute() if updates else []
+
+        for row, sample_due in zip(rows, sampled):
+            state_changed = row.last_status != "up"
+            if not (state_changed or sample_due):
+                continue
+            checks.append({
+                "id": generate_uuid(),
+                "monitor_id": str(row.id),
+                "status": "up",
+                "status_code": 200,
+                "response_time": 0,
+                "error_message": None,
+                "checked_at": now,
+            })
+            if state_changed:
+                changed.append(str(row.id))
+            if row.last_status == "down":
+                recovered.append([str(row.id), "up", "down"])
+
+        bulk_update_monitors(db, updates)
+        bulk_insert_checks(db, checks)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the pings back unless a newer one has arrived meanwhile
+        restore = r.pipeline(transaction=False)
+        for monitor_id, ts in pings.items():
+            restore.hsetnx(PINGS_KEY, monitor_id, ts)
+        restore.execute()
+        raise
+
+    if changed:
+        from app.status_cache import invalidate
+        invalidate(changed)
+
+    if recovered:
+        from app.tasks import send_alerts_batch
+        send_alerts_batch.delay(recovered)
+
+    return len(updates)
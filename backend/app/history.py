@@ -0,0 +1,191 @@
+"""
+Downsampled check history for charts.
+
+A chart never needs more points than it has pixels, so history over a window
+is returned as at most max_points time buckets: check count, uptime, worst
+status and min / avg / max latency per bucket. The bucket size is derived from
+the window (window / max_points, rounded up to a step in STEPS):
+
+  - steps of an hour or more are read from the hour rollup buckets
+    (app/rollups.py), merged into the step — cost O(hours), and they cover
+    months that moved to the Parquet archive
+  - shorter steps are one grouped query over the monitor's checks, served by
+    the (monitor_id, checked_at) covering index
+
+When a bucket would not hold more than one check (window short compared to
+the monitor's interval) the raw checks are returned instead.
+
+Every iterator here yields while the database cursor is being consumed, so
+responses can be streamed without materializing the window.
+"""
+
+import math
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.orm import Session
+
+from app import archive
+from app.database import is_postgres
+from app.models import Check, CheckRollup
+
+# Bucket sizes (seconds) charts are drawn with; beyond the last, whole days
+STEPS = (60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+HOUR = 3600
+
+# Rows fetched per round trip while streaming
+FETCH_SIZE = 1000
+
+SEVERITY = {"up": 0, "degraded": 1, "down": 2}
+WORST = {v: k for k, v in SEVERITY.items()}
+
+
+def bucket_seconds(hours: int, max_points: int) -> int:
+    """Smallest step that fits `hours` into at most max_points buckets."""
+    needed = math.ceil(hours * HOUR / max_points)
+    for step in STEPS:
+        if step >= needed:
+            return step
+    return math.ceil(needed / 86400) * 86400
+
+
+def _bucket(start: datetime, total: int, up: int, worst: str,
+            lat_min, lat_sum, lat_count, lat_max) -> dict:
+    return {
+        "timestamp": start.isoformat(),
+        "status": worst,
+        "response_time": int(lat_sum / lat_count) if lat_count else None,
+        "min_response_time": lat_min,
+        "max_response_time": lat_max,
+        "checks": total,
+        "uptime": round(up / total * 100, 2) if total else None,
+    }
+
+
+def iter_raw(db: Session, monitor_id: str, since: datetime) -> Iterator[dict]:
+    """Every check since `since`, oldest first (archived months included)."""
+    rows = db.query(
+        Check.checked_at, Check.status, Check.response_time, Check.status_code
+    ).filter(
+        Check.monitor_id == monitor_id,
+        Check.checked_at >= since
+    ).order_by(Check.checked_at).yield_per(FETCH_SIZE)
+
+    rows = iter(rows)
+    first = next(rows, None)
+
+    # Months past the archive horizon are read from the Parquet archive
+    if archive.is_enabled() and since < archive.archive_horizon():
+        end = archive.archive_horizon()
+        if first is not None:
+            end = min(end, first.checked_at)
+        for check in archive.read_archived_checks(
+            monitor_id, since, end, columns=["checked_at", "status", "response_time", "status_code"]
+        ):
+            yield _raw_point(check)
+
+    if first is not None:
+        yield _raw_point(first._mapping)
+    for row in rows:
+        yield _raw_point(row._mapping)
+
+
+def _raw_point(check) -> dict:
+    return {
+        "timestamp": check["checked_at"].isoformat(),
+        "status": check["status"],
+        "response_time": check["response_time"],
+        "status_code": check["status_code"],
+    }
+
+
+def iter_check_buckets(db: Session, monitor_id: str, since: datetime, step: int) -> Iterator[dict]:
+    """Buckets of `step` seconds (aligned to the epoch) aggregated from raw checks."""
+    if is_postgres:
+        bucket = func.floor(func.extract("epoch", Check.checked_at) / step)
+    else:
+        bucket = cast(func.strftime("%s", Check.checked_at), Integer) // step
+    bucket = bucket.label("bucket")
+
+    severity = case(
+        (Check.status == "down", SEVERITY["down"]),
+        (Check.status == "degraded", SEVERITY["degraded"]),
+        else_=SEVERITY["up"],
+    )
+    rows = db.query(
+        bucket,
+        func.count(),
+        func.sum(case((Check.status == "up", 1), else_=0)),
+        func.max(severity),
+        func.min(Check.response_time),
+        func.sum(Check.response_time),
+        func.count(Check.response_time),
+        func.max(Check.response_time),
+    ).filter(
+        Check.monitor_id == monitor_id,
+        Check.checked_at >= since,
+    ).group_by(bucket).order_by(bucket).yield_per(FETCH_SIZE)
+
+    for b, total, up, worst, lat_min, lat_sum, lat_count, lat_max in rows:
+        yield _bucket(
+            datetime.utcfromtimestamp(int(b) * step), total, up or 0, WORST[worst],
+            lat_min, lat_sum, lat_count, lat_max,
+        )
+
+
+def iter_rollup_buckets(db: Session, monitor_id: str, since: datetime, step: int) -> Iterator[dict]:
+    """Buckets of `step` seconds (a multiple of an hour) merged from hour rollups."""
+    rows = db.query(
+        CheckRollup.bucket_start, CheckRollup.total, CheckRollup.up, CheckRollup.degraded,
+        CheckRollup.down, CheckRollup.latency_sum, CheckRollup.latency_count,
+        CheckRollup.latency_min, CheckRollup.latency_max,
+    ).filter(
+        CheckRollup.monitor_id == monitor_id,
+        CheckRollup.period == "hour",
+        CheckRollup.bucket_start >= since.replace(minute=0, second=0, microsecond=0),
+    ).order_by(CheckRollup.bucket_start).yield_per(FETCH_SIZE)
+
+    current, acc = None, None
+    for row in rows:
+        start = datetime.utcfromtimestamp(_epoch(row.bucket_start) // step * step)
+        if start != current:
+            if acc is not None:
+                yield _bucket(current, *acc)
+            current = start
+            acc = [0, 0, "up", None, 0, 0, None]
+        acc[0] += row.total
+        acc[1] += row.up
+        if row.down:
+            acc[2] = "down"
+        elif row.degraded and acc[2] == "up":
+            acc[2] = "degraded"
+        if row.latency_min is not None:
+            acc[3] = row.latency_min if acc[3] is None else min(acc[3], row.latency_min)
+            acc[6] = row.latency_max if acc[6] is None else max(acc[6], row.latency_max)
+        acc[4] += row.latency_sum or 0
+        acc[5] += row.latency_count or 0
+    if acc is not None:
+        yield _bucket(current, *acc)
+
+
+def _epoch(dt: datetime) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+def iter_history(db: Session, monitor_id: str, since: datetime, hours: int,
+                 max_points: int, interval: Optional[int]) -> tuple:
+    """
+    (bucket seconds or None for raw checks, iterator of points) for a
+    monitor's history since `since`.
+    """
+    step = bucket_seconds(hours, max_points)
+    if interval and step <= interval:
+        return None, iter_raw(db, monitor_id, since)
+
+    # Archived months only exist as rollups — read those whole-hour buckets
+    archived = archive.is_enabled() and since < archive.archive_horizon()
+    if step >= HOUR or archived:
+        step = max(step, HOUR)
+        return step, iter_rollup_buckets(db, monitor_id, since, step)
+    return step, iter_check_buckets(db, monitor_id, since, step)
@@ -0,0 +1,224 @@
+"""
+Incidents maintained by the check pipeline.
+
+An incident opens on the first down/degraded check of a monitor that has no
+open incident and closes on its next up check — the same rule the analytics
+and status pages used to apply by scanning ordered checks. bulk_insert_checks
+calls record_incidents() for every batch it writes, so the table is kept
+current in the same transaction as the checks; readers get a monitor's
+incidents in O(incidents) instead of O(checks).
+
+rebuild_incidents() re-derives the table from raw checks (backfill / repair).
+It only reads status transitions: a LAG() window over each monitor's checks
+drops every check whose status equals the previous one, which can't change
+an incident.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, or_
+from sqlalchemy.orm import Session
+
+from app.models import Check, Incident, generate_uuid
+
+FAILING = ("down", "degraded")
+SEVERITY = {"degraded": 1, "down": 2}
+
+# Bound the monitor_id IN (...) lists
+MAX_IDS_PER_QUERY = 1000
+
+
+def _advance(incident: Optional[dict], status: str, checked_at: datetime,
+             error: Optional[str]) -> Tuple[Optional[dict], Optional[dict]]:
+    """
+    Apply one check to a monitor's open incident (None if there is none).
+    Returns (open incident afterwards, incident closed by this check).
+    Incidents are dicts keyed by Incident column names.
+    """
+    if status in FAILING:
+        if incident is None:
+            return {
+                "id": generate_uuid(),
+                "status": status,
+                "peak_status": status,
+                "started_at": checked_at,
+                "resolved_at": None,
+                "duration_seconds": None,
+                "first_error": error,
+            }, None
+        if SEVERITY[status] > SEVERITY.get(incident["peak_status"], 0):
+            incident["peak_status"] = status
+        return incident, None
+
+    if status == "up" and incident is not None:
+        incident["resolved_at"] = checked_at
+        incident["duration_seconds"] = int((checked_at - incident["started_at"]).total_seconds())
+        return None, incident
+
+    return incident, None
+
+
+def record_incidents(db: Session, checks: List[dict]) -> None:
+    """
+    Open, escalate and close incidents for freshly written checks (dicts with
+    monitor_id, status, checked_at, error_message). Runs in the caller's transaction.
+    """
+    by_monitor: Dict[str, list] = {}
+    for check in checks:
+        by_monitor.setdefault(str(check["monitor_id"]), []).append(check)
+    if not by_monitor:
+        return
+
+    current: Dict[str, dict] = {}
+    ids = list(by_monitor)
+    for i in range(0, len(ids), MAX_IDS_PER_QUERY):
+        rows = db.query(
+            Incident.id, Incident.monitor_id, Incident.status, Incident.peak_status,
+            Incident.started_at, Incident.first_error,
+        ).filter(
+            Incident.monitor_id.in_(ids[i:i + MAX_IDS_PER_QUERY]),
+            Incident.resolved_at.is_(None),
+        ).order_by(Incident.started_at)
+        for row in rows:
+            current[str(row.monitor_id)] = {
+                "id": row.id, "status": row.status, "peak_status": row.peak_status,
+                "started_at": row.started_at, "first_error": row.first_error,
+            }
+
+    opened, changed = [], []
+    for monitor_id, monitor_checks in by_monitor.items():
+        incident = current.get(monitor_id)
+        stored_id = incident["id"] if incident else None
+        peak_before = incident["peak_status"] if incident else None
+        for check in sorted(monitor_checks, key=lambda c: c["checked_at"]):
+            incident, closed = _advance(
+                incident, check["status"], check["checked_at"], check.get("error_message")
+            )
+            if closed is not None:
+                (changed if closed["id"] == stored_id else opened).append({**closed, "monitor_id": monitor_id})
+        if incident is not None:
+            if incident["id"] != stored_id:
+                opened.append({**incident, "monitor_id": monitor_id})
+            elif incident["peak_status"] != peak_before:
+                changed.append(incident)
+
+    now = datetime.utcnow()
+    if opened:
+        db.execute(insert(Incident.__table__), [
+            {**{k: inc[k] for k in ("id", "monitor_id", "status", "peak_status", "started_at",
+                                    "resolved_at", "duration_seconds", "first_error")},
+             "updated_at": now}
+            for inc in opened
+        ])
+    if changed:
+        table = Incident.__table__
+        db.execute(
+            table.update().where(table.c.id == bindparam("_id")).values(
+                peak_status=bindparam("_peak_status"),
+                resolved_at=bindparam("_resolved_at"),
+                duration_seconds=bindparam("_duration_seconds"),
+                updated_at=now,
+            ),
+            [{
+                "_id": inc["id"],
+                "_peak_status": inc["peak_status"],
+                "_resolved_at": inc.get("resolved_at"),
+                "_duration_seconds": inc.get("duration_seconds"),
+            } for inc in changed],
+        )
+
+
+def rebuild_incidents(db: Session, monitor_ids: List[str]) -> int:
+    """
+    Re-derive the incidents of the given monitors from their raw checks,
+    replacing whatever is stored. Returns the number of incidents written.
+    Does not commit.
+    """
+    if not monitor_ids:
+        return 0
+
+    incidents = []
+    incident, last_monitor = None, None
+    for monitor_id, checked_at, status, error in status_transitions(db, monitor_ids):
+        monitor_id = str(monitor_id)
+        if monitor_id != last_monitor:
+            if incident is not None:
+                incidents.append({**incident, "monitor_id": last_monitor})
+            incident, last_monitor = None, monitor_id
+        incident, closed = _advance(incident, status, checked_at, error)
+        if closed is not None:
+            incidents.append({**closed, "monitor_id": monitor_id})
+    if incident is not None:
+        incidents.append({**incident, "monitor_id": last_monitor})
+
+    db.query(Incident).filter(Incident.monitor_id.in_(monitor_ids)).delete(synchronize_session=False)
+    for i in range(0, len(incidents), MAX_IDS_PER_QUERY):
+        db.execute(insert(Incident.__table__), incidents[i:i + MAX_IDS_PER_QUERY])
+    return len(incidents)
+
+
+def status_transitions(db: Session, monitor_ids: List[str]):
+    """
+    (monitor_id, checked_at, status, error_message) for each monitor's first
+    check and every check whose status differs from the one before it, in
+    monitor / time order — one windowed pass in the database.
+    """
+    previous = func.lag(Check.status).over(
+        partition_by=Check.monitor_id, order_by=Check.checked_at
+    ).label("previous_status")
+    checks = db.query(
+        Check.monitor_id, Check.checked_at, Check.status, Check.error_message, previous
+    ).filter(Check.monitor_id.in_(monitor_ids)).subquery()
+
+    return db.query(
+        checks.c.monitor_id, checks.c.checked_at, checks.c.status, checks.c.error_message
+    ).filter(
+        or_(checks.c.previous_status.is_(None), checks.c.previous_status != checks.c.status)
+    ).order_by(checks.c.monitor_id, checks.c.checked_at).yield_per(10000)
+
+
+def incidents_between(db: Session, monitor_ids: Iterable[str], start: datetime,
+                      end: Optional[datetime] = None, latest: Optional[int] = None) -> List[Incident]:
+    """
+    Incidents of the given monitors overlapping [start, end), oldest first.
+    latest: only the N most recent ones.
+    """
+    q = db.query(Incident).filter(
+        Incident.monitor_id.in_(list(monitor_ids)),
+        or_(Incident.resolved_at.is_(None), Incident.resolved_at > start),
+    )
+    if end is not None:
+        q = q.filter(Incident.started_at < end)
+    if latest is not None:
+        return q.order_by(Incident.started_at.desc()).limit(latest).all()[::-1]
+    return q.order_by(Incident.started_at).all()
+
+
+def downtime_seconds(incidents: Iterable[Incident], start: datetime, end: datetime) -> float:
+    """Total incident time within [start, end); ongoing incidents run until `end`."""
+    total = 0.0
+    for incident in incidents:
+        began = max(incident.started_at, start)
+        finished = min(incident.resolved_at or end, end)
+        if finished > began:
+            total += (finished - began).total_seconds()
+    return total
+
+
+def incident_dict(incident: Incident, now: Optional[datetime] = None) -> dict:
+    """API shape shared by the status page and analytics."""
+    ongoing = incident.resolved_at is None
+    duration = incident.duration_seconds
+    if ongoing:
+        duration = int(((now or datetime.utcnow()) - incident.started_at).total_seconds())
+    return {
+        "id": str(incident.id),
+        "status": incident.status,
+        "peak_status": incident.peak_status,
+        "started_at": incident.started_at.isoformat(),
+        "resolved_at": incident.resolved_at.isoformat() if incident.resolved_at else None,
+        "duration_seconds": duration,
+        "error_message": incident.first_error,
+        "ongoing": ongoing,
+    }
@@ -2,9 +2,10 @@
 SQLAlchemy Database Models
 """
 
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, JSON, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import random
 import uuid
 
 from app.database import Base
@@ -14,6 +15,14 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+# Users are spread over SHARD_KEY_RANGE shard keys; batch jobs take key ranges
+SHARD_KEY_RANGE = 1 << 16
+
+
+def generate_shard_key():
+    return random.randrange(SHARD_KEY_RANGE)
+
+
 class User(Base):
     """User model"""
     __tablename__ = "users"
@@ -26,6 +35,7 @@ class User(Base):
     stripe_customer_id = Column(String(100))
     is_active = Column(Boolean, default=True)
     onboarding_completed = Column(Boolean, default=False, nullable=False)
+    shard_key = Column(Integer, default=generate_shard_key, nullable=False, index=True)  # 0..SHARD_KEY_RANGE-1
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -67,6 +77,12 @@ class Monitor(Base):
     keyword = Column(String(500))
     keyword_present = Column(Boolean, default=True)
     use_regex = Column(Boolean, default=False)
+    # Keep-alive connection reuse between probes (False = cold connection timings every check)
+    reuse_connections = Column(Boolean, default=True, nullable=False)
+    # Response body bytes read for keyword/assertion checks (null = CHECK_MAX_RESPONSE_BYTES)
+    max_response_bytes = Column(Integer, nullable=True)
+    # Bumped whenever assertions are saved (workers cache compiled assertion plans per version)
+    assertions_version = Column(Integer, default=0, nullable=False)
     # SSL monitoring
     ssl_check = Column(Boolean, default=True)
     ssl_expiry_days = Column(Integer, default=14)
@@ -89,27 +105,121 @@ class Monitor(Base):
     # Relationships
     user = relationship("User", back_populates="monitors")
     checks = relationship("Check", back_populates="monitor", cascade="all, delete-orphan")
+    rollups = relationship("CheckRollup", back_populates="monitor", cascade="all, delete-orphan")
+    incidents = relationship("Incident", back_populates="monitor", cascade="all, delete-orphan")
     alert_channels = relationship("AlertChannel", secondary="monitor_alert_channels", back_populates="monitors")
     maintenance_windows = relationship("MaintenanceWindow", secondary="maintenance_window_monitors", back_populates="monitors")
     assertions = relationship("MonitorAssertion", back_populates="monitor", cascade="all, delete-orphan", order_by="MonitorAssertion.order")
 
+    __table_args__ = (
+        # Missed-heartbeat sweep (tasks.check_heartbeat_monitors) only scans active heartbeat monitors
+        Index(
+            "ix_monitors_heartbeat_last_ping", "last_ping_at",
+            postgresql_where=text("monitor_type = 'heartbeat' AND is_active"),
+            sqlite_where=text("monitor_type = 'heartbeat' AND is_active"),
+        ),
+        # Scheduler's due scan: active monitors by next_check_at
+        Index(
+            "ix_monitors_due", "next_check_at",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+    )
+
 
 class Check(Base):
     """Check model - represents a single health check result"""
     __tablename__ = "checks"
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
-    monitor_id = Column(String(36), ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False, index=True)
+    monitor_id = Column(String(36), ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False)
     status = Column(String(20), nullable=False)  # up, down, degraded
     status_code = Column(Integer)
     response_time = Column(Integer)  # milliseconds
+    # Phase breakdown of response_time (milliseconds); dns/connect/tls are null on a reused connection
+    dns_time = Column(Integer)
+    connect_time = Column(Integer)
+    tls_time = Column(Integer)
+    ttfb_time = Column(Integer)
+    download_time = Column(Integer)
+    connection_reused = Column(Boolean)
     error_message = Column(Text)
+    # Partition key on Postgres (migration 0019, app/partitions.py) — the primary key there is (id, checked_at)
     checked_at = Column(DateTime, default=datetime.utcnow, index=True)
     ai_analysis = Column(JSON, nullable=True)
 
     # Relationships
     monitor = relationship("Monitor", back_populates="checks")
 
+    __table_args__ = (
+        # "One monitor since T, by time" (check list keyset pages, history, uptime);
+        # covering on Postgres so those reads are index-only scans
+        Index(
+            "ix_checks_monitor_checked", "monitor_id", "checked_at",
+            postgresql_include=["status", "response_time", "status_code"],
+        ),
+    )
+
+
+class CheckRollup(Base):
+    """Per-monitor check counts and latency aggregated into hour / day buckets (see app/rollups.py)"""
+    __tablename__ = "check_rollups"
+
+    monitor_id = Column(String(36), ForeignKey("monitors.id", ondelete="CASCADE"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # hour, day
+    bucket_start = Column(DateTime, primary_key=True)  # UTC, truncated to the period
+    total = Column(Integer, nullable=False, default=0)
+    up = Column(Integer, nullable=False, default=0)
+    degraded = Column(Integer, nullable=False, default=0)
+    down = Column(Integer, nullable=False, default=0)
+    # Latency over checks that have a response_time (milliseconds)
+    latency_sum = Column(BigInteger, nullable=False, default=0)
+    latency_count = Column(Integer, nullable=False, default=0)
+    latency_min = Column(Integer)
+    latency_max = Column(Integer)
+    # Latency sketches of up checks, per field: {"response": {...}, "dns": {...}, ...} (see app/sketch.py)
+    sketches = Column(JSON, nullable=True)
+
+    monitor = relationship("Monitor", back_populates="rollups")
+
+
+class Incident(Base):
+    """A down/degraded stretch of a monitor, opened and closed by the check pipeline (see app/incidents.py)"""
+    __tablename__ = "incidents"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    monitor_id = Column(String(36), ForeignKey("monitors.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), nullable=False)  # status of the first failing check: down, degraded
+    peak_status = Column(String(20), nullable=False)  # worst status seen during the incident
+    started_at = Column(DateTime, nullable=False)  # first failing check
+    resolved_at = Column(DateTime, nullable=True)  # first up check after it; null while ongoing
+    duration_seconds = Column(Integer, nullable=True)  # set when resolved
+    first_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # opened, escalated or resolved
+
+    monitor = relationship("Monitor", back_populates="incidents")
+
+    __table_args__ = (
+        Index("ix_incidents_monitor_started", "monitor_id", "started_at"),
+        Index("ix_incidents_monitor_updated", "monitor_id", "updated_at"),
+        # The pipeline looks up each monitor's open incident on every write batch
+        Index(
+            "ix_incidents_open", "monitor_id",
+            postgresql_where=text("resolved_at IS NULL"),
+            sqlite_where=text("resolved_at IS NULL"),
+        ),
+    )
+
+
+class SlaReportDelivery(Base):
+    """Monthly SLA report e-mail already sent to a user — lets the monthly job resume without re-sending"""
+    __tablename__ = "sla_report_deliveries"
+
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    sent_at = Column(DateTime, default=datetime.utcnow)
+
 
 class AlertChannel(Base):
     """Alert Channel model - email, slack, telegram, etc."""
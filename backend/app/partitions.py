@@ -0,0 +1,98 @@
+"""
+Daily range partitions of the checks table (Postgres).
+
+Migration 0019 turns `checks` into a table partitioned by checked_at with one
+partition per UTC day, named checks_pYYYYMMDD, plus a checks_default
+partition that catches anything outside them (it should stay empty).
+
+maintain_check_partitions (Celery beat) keeps CHECK_PARTITION_PREMAKE_DAYS of
+future partitions created, and cleanup_old_checks drops whole partitions that
+every plan's retention has passed — DETACH + DROP instead of a DELETE, so no
+WAL per row, no bloat, no vacuum.
+
+On SQLite, or a Postgres database where the migration hasn't run (create_all),
+is_partitioned() is False and callers fall back to plain DELETEs.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import is_postgres
+
+settings = get_settings()
+
+PARENT = "checks"
+DEFAULT_PARTITION = "checks_default"
+_NAME = re.compile(r"^checks_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    return f"checks_p{day:%Y%m%d}"
+
+
+def is_partitioned(db: Session) -> bool:
+    if not is_postgres:
+        return False
+    return db.execute(text(
+        "SELECT c.relkind = 'p' FROM pg_class c "
+        "WHERE c.oid = to_regclass(:parent)"
+    ), {"parent": PARENT}).scalar() or False
+
+
+def list_partitions(db: Session) -> List[Tuple[str, date]]:
+    """(name, day) of every daily partition, oldest first. Skips checks_default."""
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent)"
+    ), {"parent": PARENT}).scalars()
+
+    partitions = []
+    for name in rows:
+        match = _NAME.match(name)
+        if match:
+            partitions.append((name, datetime.strptime(match.group(1), "%Y%m%d").date()))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partitions(db: Session, start: date, days: int) -> List[str]:
+    """Create the daily partitions for [start, start + days) that don't exist yet. Does not commit."""
+    existing = {name for name, _ in list_partitions(db)}
+    created = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        name = partition_name(day)
+        if name in existing:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+
+def drop_partitions_before(db: Session, cutoff: datetime) -> List[str]:
+    """
+    Detach and drop every daily partition whose whole day is older than
+    cutoff. Does not commit.
+    """
+    dropped = []
+    for name, day in list_partitions(db):
+        if datetime.combine(day + timedelta(days=1), datetime.min.time()) > cutoff:
+            break
+        db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def ensure_partitions(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """Today's partition and CHECK_PARTITION_PREMAKE_DAYS after it. Does not commit."""
+    today = (now or datetime.utcnow()).date()
+    return create_partitions(db, today, settings.CHECK_PARTITION_PREMAKE_DAYS + 1)
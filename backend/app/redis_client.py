@@ -0,0 +1,39 @@
+"""
+Shared Redis connection (lazy, one client per process)
+"""
+
+import redis
+import redis.asyncio
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_client: redis.Redis | None = None
+_async_client: redis.asyncio.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """Get the process-wide Redis client (string responses, short socket timeouts)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+        )
+    return _client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """asyncio flavour of get_redis() for async request handlers (API process only)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+        )
+    return _async_client
@@ -0,0 +1,475 @@
+"""
+Pre-aggregated check rollups.
+
+Every batch of checks written by the pipeline (result writer, heartbeat sweep,
+heartbeat flush) is also folded into per-monitor hour and day buckets in
+check_rollups: total / up / degraded / down counts plus latency sum, count,
+min and max. Uptime, average response time and percentiles over any range
+are then a handful of bucket rows instead of a scan over raw checks.
+
+Buckets also carry a mergeable latency sketch (app/sketch.py) per timing
+field of the up checks. Those are several KB of JSON each, too large to
+rewrite on every check, so they are kept off the write path:
+refresh_sketches() (the refresh_rollup_sketches beat task) rebuilds the
+sketches of recent hour buckets from raw checks every ROLLUP_SKETCH_INTERVAL
+seconds, and the sketches of their days from the hour buckets.
+
+A range is read as day buckets for the whole days it covers and hour buckets
+for the partial days at either end, so the result is exact to the hour.
+
+rebuild_rollups() recomputes buckets from raw checks — used to backfill
+history that predates the table.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, literal_column
+from sqlalchemy.orm import Session
+
+from app.database import is_postgres
+from app.models import Check, CheckRollup
+from app.sketch import LatencySketch, merge_sketches
+
+PERIODS = ("hour", "day")
+
+STATUS_COLUMNS = ("up", "degraded", "down")
+
+# Sketch field -> Check column. Sketches only cover up checks, like the percentile endpoint.
+SKETCH_FIELDS = {
+    "response": "response_time",
+    "dns": "dns_time",
+    "connect": "connect_time",
+    "tls": "tls_time",
+    "ttfb": "ttfb_time",
+    "download": "download_time",
+}
+
+# Rows per upsert statement (11 columns each, well below the bind parameter limits)
+MAX_ROWS_PER_STATEMENT = 500
+
+
+def bucket_start(dt: datetime, period: str) -> datetime:
+    """Start of the hour / day bucket containing dt."""
+    if period == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _empty_bucket() -> dict:
+    return {
+        "total": 0, "up": 0, "degraded": 0, "down": 0,
+        "latency_sum": 0, "latency_count": 0, "latency_min": None, "latency_max": None,
+    }
+
+
+def _add_to_sketches(sketches: Dict[str, LatencySketch], check) -> None:
+    """Add one up check's timings (dict or row with the SKETCH_FIELDS columns) to a bucket's sketches."""
+    get = check.get if isinstance(check, dict) else check._mapping.get
+    for field, col in SKETCH_FIELDS.items():
+        value = get(col)
+        if value is not None:
+            sketch = sketches.get(field)
+            if sketch is None:
+                sketch = sketches[field] = LatencySketch()
+            sketch.add(value)
+
+
+def aggregate_checks(checks: Iterable[dict]) -> List[dict]:
+    """
+    Fold check rows (dicts with monitor_id, status, response_time, checked_at
+    into bucket rows (counts and latency sum / min / max, no sketches).
+    """
+    buckets: Dict[tuple, dict] = {}
+    for check in checks:
+        status = check.get("status")
+        latency = check.get("response_time")
+        for period in PERIODS:
+            key = (str(check["monitor_id"]), period, bucket_start(check["checked_at"], period))
+            b = buckets.get(key)
+            if b is None:
+                b = buckets[key] = _empty_bucket()
+            b["total"] += 1
+            if status in STATUS_COLUMNS:
+                b[status] += 1
+            if latency is not None:
+                b["latency_sum"] += latency
+                b["latency_count"] += 1
+                b["latency_min"] = latency if b["latency_min"] is None else min(b["latency_min"], latency)
+                b["latency_max"] = latency if b["latency_max"] is None else max(b["latency_max"], latency)
+
+    # Sorted so concurrent writers lock bucket rows in the same order
+    return [
+        {"monitor_id": k[0], "period": k[1], "bucket_start": k[2], **b}
+        for k, b in sorted(buckets.items())
+    ]
+
+
+def _insert(table):
+    if is_postgres:
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def _upsert(db: Session, rows: List[dict], replace: bool = False) -> None:
+    """
+    INSERT ... ON CONFLICT for bucket rows. By default the row is merged into
+    the existing bucket (counts added, min/max widened; sketches are left to
+    refresh_sketches); replace=True overwrites it (backfill).
+    """
+    if not rows:
+        return
+    table = CheckRollup.__table__
+    stmt = _insert(table)
+    new = stmt.excluded
+
+    if replace:
+        updates = {c: new[c] for c in rows[0] if c not in ("monitor_id", "period", "bucket_start")}
+        rows = [{**r, "sketches": _serialize(r["sketches"])} for r in rows]
+    else:
+        current = table.c
+        updates = {c: current[c] + new[c] for c in ("total", *STATUS_COLUMNS, "latency_sum", "latency_count")}
+        if is_postgres:
+            # LEAST / GREATEST ignore NULLs
+            updates["latency_min"] = func.least(current.latency_min, new.latency_min)
+            updates["latency_max"] = func.greatest(current.latency_max, new.latency_max)
+        else:
+            # SQLite's scalar min()/max() return NULL if any argument is NULL
+            updates["latency_min"] = func.min(
+                func.coalesce(current.latency_min, new.latency_min),
+                func.coalesce(new.latency_min, current.latency_min),
+            )
+            updates["latency_max"] = func.max(
+                func.coalesce(current.latency_max, new.latency_max),
+                func.coalesce(new.latency_max, current.latency_max),
+            )
+
+    _execute_upsert(db, stmt.on_conflict_do_update(
+        index_elements=["monitor_id", "period", "bucket_start"],
+        set_=updates,
+    ), rows)
+
+
+def _execute_upsert(db: Session, stmt, rows: List[dict]) -> None:
+    for i in range(0, len(rows), MAX_ROWS_PER_STATEMENT):
+        chunk = rows[i:i + MAX_ROWS_PER_STATEMENT]
+        if is_postgres:
+            db.execute(stmt.values(chunk))
+        else:
+            db.execute(stmt, chunk)
+
+
+def _serialize(sketches: Dict[str, LatencySketch]) -> Optional[dict]:
+    return {field: s.to_dict() for field, s in sketches.items()} or None
+
+
+def _write_sketches(db: Session, rows: List[dict]) -> None:
+    """Overwrite the sketches of existing bucket rows ({monitor_id, period, bucket_start, sketches})."""
+    # Every bucket exists (its counts were upserted with its checks), so this
+    # only ever takes the UPDATE branch — one multi-row statement on Postgres
+    stmt = _insert(CheckRollup.__table__)
+    _execute_upsert(db, stmt.on_conflict_do_update(
+        index_elements=["monitor_id", "period", "bucket_start"],
+        set_={"sketches": stmt.excluded.sketches},
+    ), rows)
+
+
+def refresh_sketches(db: Session, monitor_ids: List[str], since: datetime) -> int:
+    """
+    Rebuild the sketches of the monitors' hour buckets from the hour containing
+    `since` from raw checks, then the sketches of the days those hours fall in
+    from their hour buckets. Returns the number of buckets written. Does not commit.
+    """
+    since = bucket_start(since, "hour")
+    hours = _raw_sketches(db, monitor_ids, since, periods=("hour",))
+    if not hours:
+        return 0
+    rows = [
+        {"monitor_id": k[0], "period": k[1], "bucket_start": k[2], "sketches": _serialize(v)}
+        for k, v in sorted(hours.items())
+    ]
+    _write_sketches(db, rows)
+
+    days = {(k[0], bucket_start(k[2], "day")) for k in hours}
+    per_day: Dict[tuple, Dict[str, list]] = {}
+    for monitor_id, start, sketches in db.query(
+        CheckRollup.monitor_id, CheckRollup.bucket_start, CheckRollup.sketches
+    ).filter(
+        CheckRollup.monitor_id.in_({d[0] for d in days}),
+        CheckRollup.period == "hour",
+        CheckRollup.bucket_start >= min(d[1] for d in days),
+    ):
+        key = (str(monitor_id), bucket_start(start, "day"))
+        if key not in days:
+            continue
+        fields = per_day.setdefault(key, {})
+        for field, data in (sketches or {}).items():
+            fields.setdefault(field, []).append(LatencySketch.from_dict(data))
+
+    day_rows = [
+        {"monitor_id": k[0], "period": "day", "bucket_start": k[1],
+         "sketches": {field: merge_sketches(s).to_dict() for field, s in fields.items()} or None}
+        for k, fields in sorted(per_day.items())
+    ]
+    _write_sketches(db, day_rows)
+    return len(rows) + len(day_rows)
+
+
+def record_rollups(db: Session, checks: List[dict]) -> None:
+    """Add freshly written checks to their buckets. Runs in the caller's transaction."""
+    _upsert(db, aggregate_checks(checks))
+
+
+def _bucket_expr(period: str):
+    if is_postgres:
+        # Inline literal so the SELECT and GROUP BY expressions are identical
+        return func.date_trunc(literal_column(f"'{period}'"), Check.checked_at)
+    fmt = "%Y-%m-%d %H:00:00" if period == "hour" else "%Y-%m-%d 00:00:00"
+    return func.strftime(fmt, Check.checked_at)
+
+
+def rebuild_rollups(db: Session, monitor_ids: Optional[List[str]] = None,
+                    since: Optional[datetime] = None) -> int:
+    """
+    Recompute buckets from raw checks (GROUP BY in the database) and overwrite
+    the stored ones. Buckets are recomputed whole, so `since` is rounded down
+    to the start of its day. Returns the number of bucket rows written.
+    Does not commit.
+
+    Sketches need the individual values, so up checks are streamed once as
+    well — call it for a limited set of monitors at a time.
+    """
+    sketches = _raw_sketches(db, monitor_ids, bucket_start(since, "day") if since else None)
+    written = 0
+    for period in PERIODS:
+        bucket = _bucket_expr(period).label("bucket")
+        q = db.query(
+            Check.monitor_id,
+            bucket,
+            func.count(Check.id),
+            *[func.sum(case((Check.status == s, 1), else_=0)) for s in STATUS_COLUMNS],
+            func.coalesce(func.sum(Check.response_time), 0),
+            func.count(Check.response_time),
+            func.min(Check.response_time),
+            func.max(Check.response_time),
+        )
+        if monitor_ids is not None:
+            q = q.filter(Check.monitor_id.in_(monitor_ids))
+        if since is not None:
+            q = q.filter(Check.checked_at >= bucket_start(since, "day"))
+        q = q.group_by(Check.monitor_id, bucket)
+
+        rows = []
+        for monitor_id, start, total, up, degraded, down, lat_sum, lat_count, lat_min, lat_max in q:
+            if isinstance(start, str):
+                start = datetime.fromisoformat(start)
+            key = (str(monitor_id), period, start)
+            rows.append({
+                "monitor_id": key[0], "period": period, "bucket_start": start,
+                "total": total, "up": up or 0, "degraded": degraded or 0, "down": down or 0,
+                "latency_sum": int(lat_sum), "latency_count": lat_count,
+                "latency_min": lat_min, "latency_max": lat_max,
+                "sketches": sketches.get(key, {}),
+            })
+        rows.sort(key=lambda r: (r["monitor_id"], r["bucket_start"]))
+        _upsert(db, rows, replace=True)
+        written += len(rows)
+    return written
+
+
+def _raw_sketches(db: Session, monitor_ids: Optional[List[str]], since: Optional[datetime],
+                  periods: Tuple[str, ...] = PERIODS) -> Dict[tuple, Dict[str, LatencySketch]]:
+    """Sketches per (monitor_id, period, bucket_start) from the up checks since `since`."""
+    q = db.query(
+        Check.monitor_id, Check.checked_at,
+        *[getattr(Check, col) for col in SKETCH_FIELDS.values()],
+    ).filter(Check.status == "up")
+    if monitor_ids is not None:
+        q = q.filter(Check.monitor_id.in_(monitor_ids))
+    if since is not None:
+        q = q.filter(Check.checked_at >= since)
+
+    sketches: Dict[tuple, Dict[str, LatencySketch]] = {}
+    for row in q.yield_per(10000):
+        for period in periods:
+            key = (str(row.monitor_id), period, bucket_start(row.checked_at, period))
+            _add_to_sketches(sketches.setdefault(key, {}), row)
+    return sketches
+
+
+def _segments(since: datetime, until: datetime):
+    """(period, start, end) ranges covering [since, until): hours at the ragged ends, days in between."""
+    start_hour = bucket_start(since, "hour")
+    first_day = bucket_start(since, "day")
+    if first_day < start_hour:
+        first_day += timedelta(days=1)
+    last_day = bucket_start(until, "day")
+
+    if first_day >= last_day:
+        return [("hour", start_hour, until)]
+    segments = []
+    if start_hour < first_day:
+        segments.append(("hour", start_hour, first_day))
+    segments.append(("day", first_day, last_day))
+    if last_day < until:
+        segments.append(("hour", last_day, until))
+    return segments
+
+
+def rollup_totals(db: Session, monitor_ids: List[str], since: datetime,
+                  until: Optional[datetime] = None) -> Dict[str, dict]:
+    """
+    Counts and latency per monitor over [since, until), from rollup buckets.
+    Monitors without any check in the range are missing from the result.
+    """
+    if not monitor_ids:
+        return {}
+    until = until or datetime.utcnow() + timedelta(hours=1)
+    totals: Dict[str, dict] = {}
+    for period, start, end in _segments(since, until):
+        rows = db.query(
+            CheckRollup.monitor_id,
+            func.sum(CheckRollup.total),
+            *[func.sum(CheckRollup.__table__.c[s]) for s in STATUS_COLUMNS],
+            func.sum(CheckRollup.latency_sum),
+            func.sum(CheckRollup.latency_count),
+            func.min(CheckRollup.latency_min),
+            func.max(CheckRollup.latency_max),
+        ).filter(
+            CheckRollup.monitor_id.in_(monitor_ids),
+            CheckRollup.period == period,
+            CheckRollup.bucket_start >= start,
+            CheckRollup.bucket_start < end,
+        ).group_by(CheckRollup.monitor_id).all()
+
+        for monitor_id, total, up, degraded, down, lat_sum, lat_count, lat_min, lat_max in rows:
+            t = totals.setdefault(str(monitor_id), _empty_bucket())
+            _merge(t, {
+                "total": total, "up": up, "degraded": degraded, "down": down,
+                "latency_sum": lat_sum, "latency_count": lat_count,
+                "latency_min": lat_min, "latency_max": lat_max,
+            })
+    return totals
+
+
+def monthly_totals(db: Session, monitor_ids: List[str], start: datetime,
+                   end: datetime) -> Dict[tuple, dict]:
+    """
+    Counts and latency per (monitor_id, "YYYY-MM") for day buckets in
+    [start, end) — one grouped query. Day buckets are updated live, so the
+    current month is included up to the latest check.
+    """
+    if not monitor_ids:
+        return {}
+    if is_postgres:
+        month = func.to_char(CheckRollup.bucket_start, literal_column("'YYYY-MM'"))
+    else:
+        month = func.strftime("%Y-%m", CheckRollup.bucket_start)
+    month = month.label("month")
+
+    rows = db.query(
+        CheckRollup.monitor_id,
+        month,
+        func.sum(CheckRollup.total),
+        *[func.sum(CheckRollup.__table__.c[s]) for s in STATUS_COLUMNS],
+        func.sum(CheckRollup.latency_sum),
+        func.sum(CheckRollup.latency_count),
+        func.min(CheckRollup.latency_min),
+        func.max(CheckRollup.latency_max),
+    ).filter(
+        CheckRollup.monitor_id.in_(monitor_ids),
+        CheckRollup.period == "day",
+        CheckRollup.bucket_start >= start,
+        CheckRollup.bucket_start < end,
+    ).group_by(CheckRollup.monitor_id, month).all()
+
+    totals = {}
+    for monitor_id, month_key, total, up, degraded, down, lat_sum, lat_count, lat_min, lat_max in rows:
+        t = totals[(str(monitor_id), month_key)] = _empty_bucket()
+        _merge(t, {
+            "total": total, "up": up, "degraded": degraded, "down": down,
+            "latency_sum": lat_sum, "latency_count": lat_count,
+            "latency_min": lat_min, "latency_max": lat_max,
+        })
+    return totals
+
+
+def _merge(into: dict, b: dict) -> None:
+    for c in ("total", *STATUS_COLUMNS, "latency_sum", "latency_count"):
+        into[c] += int(b[c] or 0)
+    for c, pick in (("latency_min", min), ("latency_max", max)):
+        if b[c] is not None:
+            into[c] = b[c] if into[c] is None else pick(into[c], b[c])
+
+
+def rollup_sketches(db: Session, monitor_id: str, since: datetime,
+                    until: Optional[datetime] = None) -> Dict[str, LatencySketch]:
+    """Latency sketches of one monitor's up checks over [since, until), merged per field."""
+    until = until or datetime.utcnow() + timedelta(hours=1)
+    per_field: Dict[str, list] = {}
+    for period, start, end in _segments(since, until):
+        rows = db.query(CheckRollup.sketches).filter(
+            CheckRollup.monitor_id == monitor_id,
+            CheckRollup.period == period,
+            CheckRollup.bucket_start >= start,
+            CheckRollup.bucket_start < end,
+        )
+        for (sketches,) in rows:
+            for field, data in (sketches or {}).items():
+                per_field.setdefault(field, []).append(LatencySketch.from_dict(data))
+    return {field: merge_sketches(s) for field, s in per_field.items()}
+
+
+def daily_rollups(db: Session, monitor_id: str, since: datetime) -> Dict[str, dict]:
+    """Day buckets for one monitor from the day containing `since`, keyed by "YYYY-MM-DD"."""
+    columns = ("total", *STATUS_COLUMNS, "latency_sum", "latency_count", "latency_min", "latency_max")
+    table = CheckRollup.__table__
+    rows = db.query(CheckRollup.bucket_start, *[table.c[c] for c in columns]).filter(
+        CheckRollup.monitor_id == monitor_id,
+        CheckRollup.period == "day",
+        CheckRollup.bucket_start >= bucket_start(since, "day"),
+    ).all()
+    return {
+        r[0].strftime("%Y-%m-%d"): dict(zip(columns, r[1:]))
+        for r in rows
+    }
+
+
+def daily_uptime(db: Session, monitor_id: str, days: int,
+                 now: Optional[datetime] = None) -> Tuple[List[dict], dict]:
+    """
+    Uptime per UTC day for the last `days` days through today, oldest first,
+    and the totals over those days — one query over day buckets. Shared by
+    the status page chart, the badge and the analytics daily breakdown.
+    """
+    first = bucket_start(now or datetime.utcnow(), "day") - timedelta(days=days - 1)
+    by_date = daily_rollups(db, monitor_id, first)
+
+    daily, totals = [], _empty_bucket()
+    for offset in range(days):
+        key = (first + timedelta(days=offset)).strftime("%Y-%m-%d")
+        day_bucket = by_date.get(key)
+        if day_bucket:
+            _merge(totals, day_bucket)
+        daily.append({
+            "date": key,
+            "uptime": uptime_pct(day_bucket, 1),
+            "avg_response_time": avg_latency(day_bucket) if day_bucket else None,
+            "checks": day_bucket["total"] if day_bucket else 0,
+        })
+    return daily, totals
+
+
+def uptime_pct(bucket: Optional[dict], digits: int = 2) -> Optional[float]:
+    """Share of up checks in a bucket (or rollup_totals entry), None if it has no checks."""
+    if not bucket or not bucket["total"]:
+        return None
+    return round(bucket["up"] / bucket["total"] * 100, digits)
+
+
+def avg_latency(bucket: Optional[dict]) -> int:
+    if not bucket or not bucket["latency_count"]:
+        return 0
+    return int(bucket["latency_sum"] / bucket["latency_count"])
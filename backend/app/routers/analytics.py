@@ -4,15 +4,19 @@ Analytics routes for monitors
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import and_, case, func, or_
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from uuid import UUID
 
 from app.database import get_db
-from app.models import User, Monitor, Check
+from app.models import User, Monitor, Incident
 from app.auth import get_current_user
 from app.routers.teams import get_effective_user_id
+from app.incidents import downtime_seconds, incident_dict, incidents_between
+from app.rollups import avg_latency, daily_uptime, rollup_sketches, rollup_totals, uptime_pct
+from app.sketch import ALPHA
+from app.sla import month_ranges, monthly_sla
 
 # Max data retention days per plan (must match tasks.py RETENTION_DAYS)
 PLAN_RETENTION_DAYS = {
@@ -22,6 +26,13 @@ PLAN_RETENTION_DAYS = {
     "business": 365,
 }
 
+# synced_at is set this far back so incidents written by a batch that was still
+# in flight during the request are returned again on the next sync (clients dedupe by id)
+INCIDENT_SYNC_OVERLAP_SECONDS = 60
+
+# Max percentiles per request on the percentiles endpoint
+MAX_PERCENTILES = 10
+
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 
@@ -62,15 +73,13 @@ def get_overview(
     # Get checks from last 24 hours
     since = datetime.utcnow() - timedelta(hours=24)
     
-    checks_24h = db.query(Check).filter(
-        Check.monitor_id.in_(monitor_ids),
-        Check.checked_at >= since
-    ).all()
-    
+    totals = rollup_totals(db, [str(m) for m in monitor_ids], since).values()
+    checks_24h = sum(t["total"] for t in totals)
+    up_24h = sum(t["up"] for t in totals)
+
     # Calculate overall uptime
     if checks_24h:
-        up_count = sum(1 for c in checks_24h if c.status == "up")
-        overall_uptime = round((up_count / len(checks_24h)) * 100, 2)
+        overall_uptime = round((up_24h / checks_24h) * 100, 2)
     else:
         overall_uptime = 100.0
     
@@ -78,7 +87,7 @@ def get_overview(
         "total_monitors": len(monitors),
         "active_monitors": active_count,
         "overall_uptime": overall_uptime,
-        "total_checks_24h": len(checks_24h),
+        "total_checks_24h": checks_24h,
         "monitors_up": status_counts["up"],
         "monitors_down": status_counts["down"],
         "monitors_degraded": status_counts["degraded"]
@@ -113,13 +122,10 @@ def get_monitor_analytics(
     
     since = datetime.utcnow() - timedelta(days=days)
     
-    # Get all checks in period
-    checks = db.query(Check).filter(
-        Check.monitor_id == monitor.id,
-        Check.checked_at >= since
-    ).all()
+    # Counts and latency from rollup buckets
+    totals = rollup_totals(db, [str(monitor.id)], since).get(str(monitor.id))
     
-    if not checks:
+    if not totals:
         return {
             "monitor_id": str(monitor.id),
             "period_days": days,
@@ -133,73 +139,22 @@ def get_monitor_analytics(
         }
     
     # Calculate metrics
-    total_checks = len(checks)
-    up_checks = sum(1 for c in checks if c.status == "up")
-    uptime = round((up_checks / total_checks) * 100, 2)
-    
-    # Response time stats (only successful checks)
-    response_times = [c.response_time for c in checks if c.response_time is not None]
-    
-    if response_times:
-        avg_response = int(sum(response_times) / len(response_times))
-        min_response = min(response_times)
-        max_response = max(response_times)
-    else:
-        avg_response = min_response = max_response = 0
-    
-    # Count incidents (consecutive down/degraded checks)
-    incidents = 0
-    in_incident = False
-    total_downtime = 0
-    incident_start = None
+    total_checks = totals["total"]
+    uptime = uptime_pct(totals)
     
-    sorted_checks = sorted(checks, key=lambda c: c.checked_at)
+    # Response time stats
+    avg_response = avg_latency(totals)
+    min_response = totals["latency_min"] or 0
+    max_response = totals["latency_max"] or 0
     
-    for i, check in enumerate(sorted_checks):
-        if check.status in ["down", "degraded"] and not in_incident:
-            in_incident = True
-            incident_start = check.checked_at
-            incidents += 1
-        elif check.status == "up" and in_incident:
-            in_incident = False
-            if incident_start:
-                downtime = (check.checked_at - incident_start).total_seconds()
-                total_downtime += downtime
-            incident_start = None
-    
-    # If still in incident
-    if in_incident and incident_start:
-        downtime = (datetime.utcnow() - incident_start).total_seconds()
-        total_downtime += downtime
-    
-    # Daily breakdown
-    daily_stats = []
-    for day_offset in range(days):
-        day = datetime.utcnow() - timedelta(days=day_offset)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_checks = [c for c in checks if day_start <= c.checked_at < day_end]
-        
-        if day_checks:
-            day_up = sum(1 for c in day_checks if c.status == "up")
-            day_uptime = round((day_up / len(day_checks)) * 100, 1)
-            
-            day_response_times = [c.response_time for c in day_checks if c.response_time]
-            day_avg_response = int(sum(day_response_times) / len(day_response_times)) if day_response_times else 0
-        else:
-            day_uptime = None
-            day_avg_response = None
-        
-        daily_stats.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "uptime": day_uptime,
-            "avg_response_time": day_avg_response,
-            "checks": len(day_checks)
-        })
-    
-    daily_stats.reverse()  # Oldest to newest
+    # Incidents overlapping the period (ongoing ones count until now)
+    monitor_incidents = incidents_between(db, [str(monitor.id)], since)
+    incidents = len(monitor_incidents)
+    total_downtime = downtime_seconds(monitor_incidents, since, datetime.utcnow())
     
+    # Daily breakdown (day rollup buckets), oldest to newest
+    daily_stats, _ = daily_uptime(db, str(monitor.id), days)
+
     return {
         "monitor_id": str(monitor.id),
         "monitor_name": monitor.name,
@@ -218,86 +173,76 @@ def get_monitor_analytics(
 @router.get("/incidents")
 def get_all_incidents(
     days: int = Query(7, ge=1, le=30),
+    page_size: int = Query(50, ge=1, le=500),
+    cursor: str = Query(None, description="next_cursor of the previous page"),
+    since: str = Query(None, description="ISO datetime — only incidents opened, escalated or resolved after it (pass the previous synced_at)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get all incidents across all user's monitors
+    Get all incidents across all user's monitors, newest first.
+    One query joins incidents to the account's monitors; pages are keyset-paginated.
     """
     owner_id = get_effective_user_id(current_user, db)
-    monitor_ids = [m.id for m in db.query(Monitor).filter(Monitor.user_id == owner_id).all()]
-    
-    if not monitor_ids:
-        return {"incidents": []}
-    
-    since = datetime.utcnow() - timedelta(days=days)
-    
-    # Get all checks
-    checks = db.query(Check).filter(
-        Check.monitor_id.in_(monitor_ids),
-        Check.checked_at >= since
-    ).order_by(Check.monitor_id, Check.checked_at).all()
-    
-    # Group by monitor
-    monitors_checks = {}
-    for check in checks:
-        if check.monitor_id not in monitors_checks:
-            monitors_checks[check.monitor_id] = []
-        monitors_checks[check.monitor_id].append(check)
-    
-    # Find incidents for each monitor
-    all_incidents = []
-    
-    for monitor_id, monitor_checks in monitors_checks.items():
-        monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
-        
-        in_incident = False
-        incident_start = None
-        incident_status = None
-        
-        for check in monitor_checks:
-            if check.status in ["down", "degraded"] and not in_incident:
-                in_incident = True
-                incident_start = check.checked_at
-                incident_status = check.status
-            elif check.status == "up" and in_incident:
-                in_incident = False
-                duration = int((check.checked_at - incident_start).total_seconds())
-                
-                all_incidents.append({
-                    "monitor_id": str(monitor.id),
-                    "monitor_name": monitor.name,
-                    "status": incident_status,
-                    "started_at": incident_start.isoformat(),
-                    "resolved_at": check.checked_at.isoformat(),
-                    "duration_seconds": duration,
-                    "ongoing": False
-                })
-                
-                incident_start = None
-                incident_status = None
-        
-        # If still in incident
-        if in_incident and incident_start:
-            duration = int((datetime.utcnow() - incident_start).total_seconds())
-            all_incidents.append({
-                "monitor_id": str(monitor.id),
-                "monitor_name": monitor.name,
-                "status": incident_status,
-                "started_at": incident_start.isoformat(),
-                "resolved_at": None,
-                "duration_seconds": duration,
-                "ongoing": True
-            })
-    
-    # Sort by start time (newest first)
-    all_incidents.sort(key=lambda x: x["started_at"], reverse=True)
-    
+    now = datetime.utcnow()
+    window_start = now - timedelta(days=days)
+
+    base_filter = [
+        Monitor.user_id == owner_id,
+        or_(Incident.resolved_at.is_(None), Incident.resolved_at > window_start),
+    ]
+    if since:
+        try:
+            base_filter.append(Incident.updated_at > datetime.fromisoformat(since))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be an ISO datetime")
+
+    counts = db.query(
+        func.count(Incident.id),
+        func.sum(case((Incident.resolved_at.is_(None), 1), else_=0)),
+    ).join(Monitor, Monitor.id == Incident.monitor_id).filter(*base_filter).one()
+
+    # Keyset pagination on (started_at, id) — many incidents can share a start time
+    page_filter = list(base_filter)
+    if cursor:
+        try:
+            cursor_at, cursor_id = cursor.split("_", 1)
+            cursor_dt = datetime.fromisoformat(cursor_at)
+            page_filter.append(or_(
+                Incident.started_at < cursor_dt,
+                and_(Incident.started_at == cursor_dt, Incident.id < cursor_id),
+            ))
+        except ValueError:
+            pass  # Invalid cursor — ignore, fall back to first page
+
+    rows = (
+        db.query(Incident, Monitor.name)
+        .join(Monitor, Monitor.id == Incident.monitor_id)
+        .filter(*page_filter)
+        .order_by(Incident.started_at.desc(), Incident.id.desc())
+        .limit(page_size)
+        .all()
+    )
+
+    all_incidents = [{
+        "monitor_id": str(incident.monitor_id),
+        "monitor_name": monitor_name,
+        **incident_dict(incident, now),
+    } for incident, monitor_name in rows]
+
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1][0]
+        next_cursor = f"{last.started_at.isoformat()}_{last.id}"
+
     return {
         "period_days": days,
-        "total_incidents": len(all_incidents),
-        "ongoing_incidents": sum(1 for i in all_incidents if i["ongoing"]),
-        "incidents": all_incidents
+        "total_incidents": counts[0],
+        "ongoing_incidents": int(counts[1] or 0),
+        "incidents": all_incidents,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "synced_at": (now - timedelta(seconds=INCIDENT_SYNC_OVERLAP_SECONDS)).isoformat(),
     }
 
 @router.get("/sla")
@@ -317,80 +262,17 @@ def get_sla_report(
         )
 
     owner_id = get_effective_user_id(current_user, db)
-    monitors = db.query(Monitor).filter(
+    monitors = db.query(Monitor.id, Monitor.name, Monitor.url).filter(
         Monitor.user_id == owner_id,
         Monitor.is_active == True
     ).all()
 
-    report = []
+    # 월별 집계 + 인시던트를 계정 단위로 한 번에 계산 (app/sla.py)
+    sla = monthly_sla(db, [str(m.id) for m in monitors], month_ranges(months))
 
+    report = []
     for monitor in monitors:
-        monthly_stats = []
-
-        for month_offset in range(months - 1, -1, -1):
-            now = datetime.utcnow()
-            year = now.year
-            month = now.month - month_offset
-            while month <= 0:
-                month += 12
-                year -= 1
-            first_of_month = datetime(year, month, 1, 0, 0, 0)
-            if month == 12:
-                last_of_month = datetime(year + 1, 1, 1) - timedelta(seconds=1)
-            else:
-                last_of_month = datetime(year, month + 1, 1) - timedelta(seconds=1)
-
-            checks = db.query(Check).filter(
-                Check.monitor_id == monitor.id,
-                Check.checked_at >= first_of_month,
-                Check.checked_at <= last_of_month
-            ).all()
-
-            if not checks:
-                monthly_stats.append({
-                    "month": first_of_month.strftime("%Y-%m"),
-                    "uptime_percentage": None,
-                    "total_checks": 0,
-                    "downtime_minutes": 0,
-                    "incidents": 0,
-                    "avg_response_time": 0,
-                })
-                continue
-
-            total = len(checks)
-            up_count = sum(1 for c in checks if c.status == "up")
-            uptime_pct = round((up_count / total) * 100, 3)
-
-            # 다운타임 계산
-            downtime_seconds = 0
-            in_incident = False
-            incident_start = None
-            incidents = 0
-
-            for c in sorted(checks, key=lambda x: x.checked_at):
-                if c.status in ["down", "degraded"] and not in_incident:
-                    in_incident = True
-                    incident_start = c.checked_at
-                    incidents += 1
-                elif c.status == "up" and in_incident:
-                    in_incident = False
-                    if incident_start:
-                        downtime_seconds += (c.checked_at - incident_start).total_seconds()
-
-            if in_incident and incident_start:
-                downtime_seconds += (last_of_month - incident_start).total_seconds()
-
-            response_times = [c.response_time for c in checks if c.response_time]
-            avg_response = int(sum(response_times) / len(response_times)) if response_times else 0
-
-            monthly_stats.append({
-                "month": first_of_month.strftime("%Y-%m"),
-                "uptime_percentage": uptime_pct,
-                "total_checks": total,
-                "downtime_minutes": round(downtime_seconds / 60, 1),
-                "incidents": incidents,
-                "avg_response_time": avg_response,
-            })
+        monthly_stats = sla.get(str(monitor.id), [])
 
         # 전체 평균
         valid_months = [m for m in monthly_stats if m["uptime_percentage"] is not None]
@@ -413,18 +295,35 @@ def get_sla_report(
     }
 
 
+def parse_percentiles(raw: str) -> List[float]:
+    """"50,95,99.9" -> [50.0, 95.0, 99.9]; 400 on anything outside (0, 100)."""
+    try:
+        values = sorted({float(p) for p in raw.split(",") if p.strip()})
+    except ValueError:
+        values = []
+    if not values or len(values) > MAX_PERCENTILES or not all(0 < p < 100 for p in values):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"percentiles must be 1-{MAX_PERCENTILES} comma-separated numbers between 0 and 100"
+        )
+    return values
+
+
 @router.get("/monitors/{monitor_id}/percentiles")
 def get_response_time_percentiles(
     monitor_id: str,
     hours: int = Query(24, ge=1, le=720),
+    percentiles: str = Query("50,95,99", description="Comma-separated, e.g. 50,90,99,99.9"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get response time percentiles (p50, p95, p99) for a monitor"""
-    from app.models import Check, Monitor
-    from datetime import timedelta
-    import statistics
+    """
+    Get response time percentiles for a monitor, overall and per phase.
 
+    Read from the latency sketches of the hour/day rollup buckets (up checks
+    only), so the window starts at the top of the hour. Percentiles are within
+    sketch.ALPHA relative error; min, max, avg and sample_size are exact.
+    """
     owner_id = get_effective_user_id(current_user, db)
     monitor = db.query(Monitor).filter(
         Monitor.id == monitor_id,
@@ -433,31 +332,43 @@ def get_response_time_percentiles(
     if not monitor:
         raise HTTPException(status_code=404, detail="Monitor not found")
 
+    requested = parse_percentiles(percentiles)
     since = datetime.utcnow() - timedelta(hours=hours)
-    checks = db.query(Check).filter(
-        Check.monitor_id == monitor_id,
-        Check.checked_at >= since,
-        Check.response_time.isnot(None),
-        Check.status == "up"
-    ).all()
+    sketches = rollup_sketches(db, str(monitor.id), since)
+    response = sketches.pop("response", None)
 
-    if not checks:
-        return {"p50": None, "p95": None, "p99": None, "sample_size": 0}
+    def quantiles(sketch):
+        return {f"p{p:g}": round(sketch.quantile(p / 100)) for p in requested}
 
-    times = sorted([c.response_time for c in checks])
-    n = len(times)
+    accuracy = {
+        "percentiles": requested,
+        "relative_error": ALPHA,
+        "error_bound": f"each percentile is within {ALPHA:.0%} of the exact value at that rank",
+    }
 
-    def percentile(data, p):
-        idx = int(len(data) * p / 100)
-        return data[min(idx, len(data) - 1)]
+    if not response:
+        return {**{f"p{p:g}": None for p in requested}, "sample_size": 0, "phases": {}, **accuracy}
+
+    # dns/connect/tls are only recorded when a new connection was opened,
+    # so each phase has its own sample size.
+    phases = {}
+    for phase in ("dns", "connect", "tls", "ttfb", "download"):
+        sketch = sketches.get(phase)
+        if not sketch:
+            continue
+        phases[phase] = {
+            **quantiles(sketch),
+            "avg": round(sketch.total / sketch.count),
+            "sample_size": sketch.count,
+        }
 
     return {
-        "p50": percentile(times, 50),
-        "p95": percentile(times, 95),
-        "p99": percentile(times, 99),
-        "min": times[0],
-        "max": times[-1],
-        "avg": round(sum(times) / n),
-        "sample_size": n,
+        **quantiles(response),
+        "min": response.min,
+        "max": response.max,
+        "avg": round(response.total / response.count),
+        "sample_size": response.count,
+        "phases": phases,
         "hours": hours,
+        **accuracy,
     }
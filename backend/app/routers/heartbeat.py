@@ -1,62 +1,60 @@
 """
 Heartbeat / Cron Job monitoring endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 
-from app.database import get_db
-from app.models import Monitor, Check
+from app.database import SessionLocal
+from app.heartbeats import cached_token, resolve_token, record_ping, write_ping
 
 router = APIRouter(prefix="/api/v1/heartbeat", tags=["Heartbeat"])
 
 
+def _resolve(token: str):
+    db = SessionLocal()
+    try:
+        return resolve_token(db, token)
+    finally:
+        db.close()
+
+
+def _write(monitor_id: str, now: datetime):
+    db = SessionLocal()
+    try:
+        write_ping(db, monitor_id, now)
+    finally:
+        db.close()
+
+
 @router.get("/{token}")
 @router.post("/{token}")
-async def receive_heartbeat(token: str, request: Request, db: Session = Depends(get_db)):
+async def receive_heartbeat(token: str, request: Request):
     """
     Receive a heartbeat ping from a cron job or scheduled task.
     Accepts both GET and POST requests.
     No authentication required — token IS the authentication.
+
+    Pings are queued in Redis and flushed to the database in bulk
+    (see app/heartbeats.py); database work never runs on the event loop.
     """
-    monitor = db.query(Monitor).filter(
-        Monitor.heartbeat_token == token,
-        Monitor.monitor_type == "heartbeat",
-        Monitor.is_active == True
-    ).first()
+    hit, monitor = cached_token(token)
+    if not hit:
+        monitor = await run_in_threadpool(_resolve, token)
 
     if not monitor:
         raise HTTPException(status_code=404, detail="Heartbeat monitor not found")
 
     now = datetime.utcnow()
-    previous_status = monitor.last_status
-
-    # Update last ping time
-    monitor.last_ping_at = now
-    monitor.last_status = "up"
-    monitor.last_checked_at = now
-    monitor.updated_at = now
-
-    # Record check
-    check = Check(
-        monitor_id=str(monitor.id),
-        status="up",
-        status_code=200,
-        response_time=0,
-        error_message=None,
-        checked_at=now,
-    )
-    db.add(check)
-    db.commit()
-
-    # Send recovery alert if was down
-    if previous_status == "down":
-        from app.tasks import send_alerts
-        send_alerts.delay(str(monitor.id), "up", "down")
+    try:
+        await record_ping(monitor["id"], now)
+    except Exception as e:
+        print(f"⚠️  heartbeat queue error, writing directly: {e}")
+        await run_in_threadpool(_write, monitor["id"], now)
 
     return {
         "ok": True,
-        "monitor": monitor.name,
+        "monitor": monitor["name"],
         "received_at": now.isoformat(),
-        "next_expected_in": f"{monitor.heartbeat_interval}m" if monitor.heartbeat_interval else None,
+        "next_expected_in": f"{monitor['heartbeat_interval']}m" if monitor["heartbeat_interval"] else None,
     }
@@ -22,6 +22,9 @@ from app.schemas import (
 )
 from app.auth import get_current_user, _get_user_by_api_key as get_user_by_api_key
 from app.audit import log_action
+from app.checker.patterns import validate_pattern
+from app.scheduler import notify_monitor_changed
+from app import archive
 
 def get_current_user_flexible(
     request: Request,
@@ -110,6 +113,18 @@ def validate_interval(user: User, interval: int) -> None:
         )
 
 
+def validate_keyword(keyword: str, use_regex: bool) -> None:
+    """Compile regex keywords up front so a bad or runaway pattern never reaches the workers"""
+    if not keyword or not use_regex:
+        return
+    error = validate_pattern(keyword)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
+        )
+
+
 @router.get("/", response_model=List[MonitorResponse])
 def list_monitors(
     current_user: User = Depends(get_current_user_flexible),
@@ -153,6 +168,7 @@ def create_monitor(
 
     # Validate interval
     validate_interval(locked_user, monitor_data.interval)
+    validate_keyword(monitor_data.keyword, monitor_data.use_regex)
 
     # Create monitor (always under owner's ID so team members' monitors are visible)
     new_monitor = Monitor(
@@ -165,12 +181,15 @@ def create_monitor(
         headers=monitor_data.headers,
         body=monitor_data.body,
         expected_status=monitor_data.expected_status,
+        reuse_connections=monitor_data.reuse_connections,
+        max_response_bytes=monitor_data.max_response_bytes,
         next_check_at=datetime.utcnow()  # Check immediately
     )
     
     db.add(new_monitor)
     db.commit()
     db.refresh(new_monitor)
+    notify_monitor_changed(new_monitor.id)
 
     log_action(db, str(current_user.id), "monitor.create", "monitor", str(new_monitor.id),
                {"name": new_monitor.name, "url": str(monitor_data.url), "interval": new_monitor.interval})
@@ -230,6 +249,12 @@ def update_monitor(
     # Validate interval if being updated
     if "interval" in update_data:
         validate_interval(owner, update_data["interval"])
+
+    if "keyword" in update_data or "use_regex" in update_data:
+        validate_keyword(
+            update_data.get("keyword", monitor.keyword),
+            update_data.get("use_regex", monitor.use_regex),
+        )
     
     # Convert URL to string if present
     if "url" in update_data:
@@ -242,6 +267,7 @@ def update_monitor(
     
     db.commit()
     db.refresh(monitor)
+    notify_monitor_changed(monitor.id)
 
     log_action(db, str(current_user.id), "monitor.update", "monitor", str(monitor.id),
                {k: v for k, v in update_data.items() if k in ("name", "url", "interval", "is_active")})
@@ -274,6 +300,7 @@ def delete_monitor(
     monitor_url = monitor.url
     db.delete(monitor)
     db.commit()
+    notify_monitor_changed(monitor_id)
 
     log_action(db, str(current_user.id), "monitor.delete", "monitor", monitor_id,
                {"name": monitor_name, "url": monitor_url})
@@ -321,6 +348,7 @@ def get_monitor_checks(
     ]
 
     # Keyset pagination: if cursor provided, skip offset scan
+    cursor_dt = None
     if cursor:
         try:
             cursor_dt = datetime.fromisoformat(cursor)
@@ -340,6 +368,22 @@ def get_monitor_checks(
 
     next_cursor = checks[-1].checked_at.isoformat() if len(checks) == page_size else None
 
+    # Older months may have moved to the Parquet archive: count them, and keep
+    # paging into them once the checks table runs out
+    if archive.is_enabled():
+        horizon = archive.archive_horizon()
+        archive_end = min(horizon, cursor_dt or horizon)
+        total += archive.count_archived_checks(monitor_id, since, archive_end)
+        if len(checks) < page_size:
+            if checks:
+                archive_end = min(archive_end, checks[-1].checked_at)
+            older = archive.read_archived_checks(
+                monitor_id, since, archive_end, newest_first=True, limit=page_size - len(checks)
+            )
+            checks = list(checks) + older
+            if older and len(checks) == page_size:
+                next_cursor = older[-1]["checked_at"].isoformat()
+
     return {
         "checks": checks,
         "total": total,
@@ -372,6 +416,7 @@ def toggle_monitor(
         monitor.next_check_at = datetime.utcnow()
 
     db.commit()
+    notify_monitor_changed(monitor.id)
     return {"message": "Monitor updated", "is_active": enabled}
 
 
@@ -400,6 +445,7 @@ def pause_monitor(
     monitor.updated_at = datetime.utcnow()
     
     db.commit()
+    notify_monitor_changed(monitor.id)
     
     return {"message": "Monitor paused"}
 
@@ -430,6 +476,7 @@ def resume_monitor(
     monitor.updated_at = datetime.utcnow()
 
     db.commit()
+    notify_monitor_changed(monitor.id)
 
     return {"message": "Monitor resumed"}
 
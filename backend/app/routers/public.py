@@ -2,98 +2,25 @@
 Public routes (no authentication required)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy import desc
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from uuid import UUID
 
-from app.database import get_db
+from app import history, status_cache
+from app.config import get_settings
+from app.database import SessionLocal, get_db
 from app.limiter import limiter
-from app.models import Monitor, Check, User
-
-router = APIRouter(prefix="/public", tags=["Public"])
-
-
-def calculate_uptime(monitor_id: str, hours: int, db: Session) -> float:
-    """Calculate uptime percentage for a monitor"""
-    since = datetime.utcnow() - timedelta(hours=hours)
-    
-    # Get all checks in time period
-    checks = db.query(Check).filter(
-        Check.monitor_id == monitor_id,
-        Check.checked_at >= since
-    ).all()
-    
-    if not checks:
-        return 100.0
-    
-    # Count up checks
-    up_count = sum(1 for check in checks if check.status == "up")
-    total_count = len(checks)
-    
-    return round((up_count / total_count) * 100, 2)
+from app.models import Monitor, User
+from app.routers.monitors import PLAN_LIMITS
 
+settings = get_settings()
 
-def get_average_response_time(monitor_id: str, hours: int, db: Session) -> int:
-    """Get average response time for a monitor (in milliseconds)"""
-    since = datetime.utcnow() - timedelta(hours=hours)
-    
-    avg = db.query(func.avg(Check.response_time)).filter(
-        Check.monitor_id == monitor_id,
-        Check.checked_at >= since,
-        Check.response_time.isnot(None)
-    ).scalar()
-    
-    return int(avg) if avg else 0
-
-
-def get_incidents(monitor_id: str, hours: int, db: Session) -> List[Dict[str, Any]]:
-    """Get recent incidents (status changes to down/degraded)"""
-    since = datetime.utcnow() - timedelta(hours=hours)
-    
-    # Load at most 5000 checks — enough to find 10 incidents even at 30s intervals
-    checks = db.query(Check).filter(
-        Check.monitor_id == monitor_id,
-        Check.checked_at >= since
-    ).order_by(Check.checked_at).limit(5000).all()
-    
-    incidents = []
-    in_incident = False
-    current_incident = None
-    
-    for i, check in enumerate(checks):
-        if check.status in ["down", "degraded"] and not in_incident:
-            # Start of incident
-            in_incident = True
-            current_incident = {
-                "started_at": check.checked_at,
-                "status": check.status,
-                "error_message": check.error_message
-            }
-        
-        elif check.status == "up" and in_incident:
-            # End of incident
-            in_incident = False
-            if current_incident:
-                current_incident["resolved_at"] = check.checked_at
-                current_incident["duration_seconds"] = int(
-                    (check.checked_at - current_incident["started_at"]).total_seconds()
-                )
-                incidents.append(current_incident)
-                current_incident = None
-    
-    # If still in incident
-    if in_incident and current_incident:
-        current_incident["resolved_at"] = None
-        current_incident["duration_seconds"] = int(
-            (datetime.utcnow() - current_incident["started_at"]).total_seconds()
-        )
-        current_incident["ongoing"] = True
-        incidents.append(current_incident)
-    
-    return incidents[:10]  # Last 10 incidents
+router = APIRouter(prefix="/public", tags=["Public"])
 
 
 @router.get("/stats")
@@ -118,116 +45,93 @@ def get_public_stats(db: Session = Depends(get_db)):
         "total_monitors": total_monitors,
     }
 
+def cached_response(request: Request, body: str, etag: str, generated_at: datetime,
+                    max_age: int, media_type: str = "application/json") -> Response:
+    """
+    Serve a cached body with validators; 304 when the client's copy is current.
+    stale-while-revalidate lets a CDN keep serving while it refetches.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(generated_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age * 2}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+            if since.replace(tzinfo=None) >= generated_at:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @router.get("/status/{monitor_id}")
 @limiter.limit("30/minute")
 def get_public_status(request: Request, monitor_id: str, db: Session = Depends(get_db)):
     """
     Get public status page data for a monitor
     No authentication required - anyone can view
+    Served from the status page cache (app/status_cache.py) with ETag/Last-Modified
     """
-    monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
-    
-    if not monitor:
+    entry = status_cache.get_entry(db, monitor_id)
+
+    if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Monitor not found"
         )
-    
-    # Calculate uptime for different periods
-    uptime_24h = calculate_uptime(monitor.id, 24, db)
-    uptime_7d = calculate_uptime(monitor.id, 24 * 7, db)
-    uptime_30d = calculate_uptime(monitor.id, 24 * 30, db)
-    
-    # Get average response time
-    avg_response_time = get_average_response_time(monitor.id, 24, db)
-    
-    # Get recent incidents
-    incidents = get_incidents(monitor.id, 24 * 7, db)  # Last 7 days
-    
-    # Get current status
-    current_status = monitor.last_status or "unknown"
-    
-    # Get last 90 days of daily uptime (for chart) — single query
-    window_start = (datetime.utcnow() - timedelta(days=90)).replace(hour=0, minute=0, second=0, microsecond=0)
-    all_checks = db.query(Check.checked_at, Check.status).filter(
-        Check.monitor_id == monitor.id,
-        Check.checked_at >= window_start,
-    ).all()
 
-    # Group by date string
-    by_date: Dict[str, list] = {}
-    for checked_at, s in all_checks:
-        key = checked_at.strftime("%Y-%m-%d")
-        by_date.setdefault(key, []).append(s)
-
-    daily_stats = []
-    for days_ago in range(90, -1, -1):
-        date_start = (datetime.utcnow() - timedelta(days=days_ago)).replace(hour=0, minute=0, second=0, microsecond=0)
-        key = date_start.strftime("%Y-%m-%d")
-        day_statuses = by_date.get(key, [])
-        if day_statuses:
-            uptime = round((sum(1 for s in day_statuses if s == "up") / len(day_statuses)) * 100, 1)
-        else:
-            uptime = None
-        daily_stats.append({"date": key, "uptime": uptime})
-    
-    return {
-        "monitor": {
-            "id": str(monitor.id),
-            "name": monitor.name,
-            "url": monitor.url
-        },
-        "status": {
-            "current": current_status,
-            "last_checked": monitor.last_checked_at.isoformat() if monitor.last_checked_at else None
-        },
-        "uptime": {
-            "24h": uptime_24h,
-            "7d": uptime_7d,
-            "30d": uptime_30d
-        },
-        "performance": {
-            "avg_response_time_ms": avg_response_time
-        },
-        "incidents": incidents,
-        "history": {
-            "daily": daily_stats
-        }
-    }
+    return cached_response(
+        request, entry["body"], entry["etag"],
+        datetime.fromisoformat(entry["generated_at"]), settings.STATUS_CACHE_MAX_AGE,
+    )
 
 
 @router.get("/status/{monitor_id}/badge")
-def get_status_badge(monitor_id: str, db: Session = Depends(get_db)):
+def get_status_badge(request: Request, monitor_id: str, db: Session = Depends(get_db)):
     """
     Get status badge data (for embedding in README, etc.)
-    Returns simple data for badge generation
+    Returns shields.io endpoint JSON, served from the badge cache
     """
-    monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
-    
-    if not monitor:
+    badge = status_cache.get_badge(db, monitor_id)
+    if not badge:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Monitor not found"
         )
-    
-    uptime = calculate_uptime(monitor.id, 24 * 30, db)  # 30 days
-    status = monitor.last_status or "unknown"
-    
-    # Badge colors
-    color_map = {
-        "up": "brightgreen",
-        "degraded": "yellow",
-        "down": "red",
-        "unknown": "lightgrey"
-    }
-    
-    return {
-        "schemaVersion": 1,
-        "label": monitor.name,
-        "message": f"{uptime}% uptime",
-        "color": color_map.get(status, "lightgrey"),
-        "status": status
-    }
+
+    return cached_response(
+        request, badge["json"], badge["json_etag"],
+        datetime.fromisoformat(badge["generated_at"]), settings.BADGE_CACHE_MAX_AGE,
+    )
+
+
+@router.get("/status/{monitor_id}/badge.svg")
+def get_status_badge_svg(request: Request, monitor_id: str, db: Session = Depends(get_db)):
+    """
+    Pre-rendered SVG status badge — embed directly:
+    ![status](https://api.example.com/api/v1/public/status/<id>/badge.svg)
+    """
+    badge = status_cache.get_badge(db, monitor_id)
+    if not badge:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Monitor not found"
+        )
+
+    return cached_response(
+        request, badge["svg"], badge["svg_etag"],
+        datetime.fromisoformat(badge["generated_at"]), settings.BADGE_CACHE_MAX_AGE,
+        media_type="image/svg+xml",
+    )
 
 
 @router.get("/by-domain")
@@ -244,14 +148,19 @@ def get_monitor_by_domain(request: Request, domain: str, db: Session = Depends(g
 
 
 @router.get("/status/{monitor_id}/history")
+@limiter.limit("30/minute")
 def get_check_history(
+    request: Request,
     monitor_id: str,
-    hours: int = 24,
+    hours: int = Query(24, ge=1),
+    max_points: int = Query(500, ge=10, le=2000),
     db: Session = Depends(get_db)
 ):
     """
     Get check history for charting
-    Returns time-series data of response times and status
+    Returns time-series data of response times and status — at most max_points
+    points: raw checks for short windows, time buckets (worst status,
+    min/avg/max latency) otherwise. Streamed as rows are read.
     """
     monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
     
@@ -260,24 +169,29 @@ def get_check_history(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Monitor not found"
         )
-    
+
+    # Never more history than the owner's plan keeps
+    owner_plan = db.query(User.plan).filter(User.id == monitor.user_id).scalar()
+    max_hours = PLAN_LIMITS.get(owner_plan, PLAN_LIMITS["free"])["history_hours"]
+    hours = min(hours, max_hours)
     since = datetime.utcnow() - timedelta(hours=hours)
-    
-    checks = db.query(Check).filter(
-        Check.monitor_id == monitor.id,
-        Check.checked_at >= since
-    ).order_by(Check.checked_at).all()
-    
-    history = [{
-        "timestamp": check.checked_at.isoformat(),
-        "status": check.status,
-        "response_time": check.response_time,
-        "status_code": check.status_code
-    } for check in checks]
-    
-    return {
-        "monitor_id": str(monitor.id),
-        "period_hours": hours,
-        "data_points": len(history),
-        "history": history
-    }# redeploy
+    monitor_id, interval = str(monitor.id), monitor.interval
+
+    def stream():
+        # The request session is closed once this function returns — stream from our own
+        stream_db = SessionLocal()
+        try:
+            step, points = history.iter_history(stream_db, monitor_id, since, hours, max_points, interval)
+            yield (
+                f'{{"monitor_id":{json.dumps(monitor_id)},"period_hours":{hours},'
+                f'"bucket_seconds":{json.dumps(step)},"history":['
+            )
+            count = 0
+            for point in points:
+                yield ("," if count else "") + json.dumps(point, separators=(",", ":"))
+                count += 1
+            yield f'],"data_points":{count}}}'
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(stream(), media_type="application/json")
@@ -15,6 +15,7 @@ from app.auth import get_current_user
 from app.lemonsqueezy import LemonSqueezyAPI, get_variant_id_for_plan
 from app.config import get_settings
 from app.routers.monitors import PLAN_LIMITS
+from app.scheduler import notify_monitor_changed
 
 settings = get_settings()
 router = APIRouter(prefix="/subscription", tags=["Subscription"])
@@ -27,10 +28,14 @@ def enforce_plan_constraints(user: User, db: Session) -> None:
     """Enforce free plan constraints: monitor limit + minimum interval."""
     # Clamp intervals to free plan minimum
     monitors = db.query(Monitor).filter(Monitor.user_id == user.id).all()
+    clamped = []
     for m in monitors:
         if m.interval < FREE_MIN_INTERVAL:
             m.interval = FREE_MIN_INTERVAL
+            clamped.append(str(m.id))
     db.commit()
+    for monitor_id in clamped:
+        notify_monitor_changed(monitor_id)
     enforce_monitor_limit(user, db)
 
 
@@ -55,6 +60,8 @@ def enforce_monitor_limit(user: User, db: Session) -> int:
         monitor.is_active = False
 
     db.commit()
+    for monitor in active_monitors[:excess]:
+        notify_monitor_changed(monitor.id)
     print(f"⬇️  Deactivated {excess} excess monitors for {user.email} (free plan limit)")
     return excess
 
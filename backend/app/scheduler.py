@@ -0,0 +1,280 @@
+"""
+Dedicated check scheduler.
+
+Keeps every active monitor in an in-memory min-heap keyed by its next due
+time and dispatches each one when it is actually due, so 10s/30s intervals
+are honored and checks are spread across the minute instead of firing in
+one burst from the 60s beat poll.
+
+The heap is loaded from the monitors table, kept in sync through a Redis
+pub/sub channel (the monitors API publishes on create/update/pause/resume/
+delete) and fully reconciled every SCHEDULER_RESYNC_INTERVAL seconds.
+While the scheduler is alive it refreshes HEARTBEAT_KEY; the beat task
+check_monitors stays as a fallback and only runs when that key is missing.
+
+Every replica may start one (run_celery.sh), but only the holder of
+LEADER_KEY (SET NX, renewed with the heartbeat) dispatches; the others
+wait on standby and take over once it expires. A leader that cannot renew
+the lock stops dispatching before the lock can have passed to another one.
+
+Usage:
+    python -m app.scheduler
+"""
+
+import heapq
+import itertools
+import os
+import random
+import socket
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import Monitor
+from app.redis_client import get_redis
+
+settings = get_settings()
+
+SCHEDULE_CHANNEL = "checkapi:scheduler:monitors"
+HEARTBEAT_KEY = "checkapi:scheduler:heartbeat"
+LEADER_KEY = "checkapi:scheduler:leader"
+
+# Extend the lock only if we still hold it
+RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def notify_monitor_changed(monitor_id: str) -> None:
+    """Ask a running scheduler to reload one monitor. Fire-and-forget, never raises."""
+    try:
+        get_redis().publish(SCHEDULE_CHANNEL, str(monitor_id))
+    except Exception as e:
+        print(f"⚠️  scheduler notify error (non-fatal): {e}")
+
+
+def scheduler_is_running() -> bool:
+    """True while a scheduler process has refreshed its heartbeat recently."""
+    try:
+        return bool(get_redis().exists(HEARTBEAT_KEY))
+    except Exception:
+        return False
+
+
+def _to_ts(dt: Optional[datetime]) -> Optional[float]:
+    """Naive UTC datetime → epoch seconds"""
+    if dt is None:
+        return None
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+def _phase(monitor_id: str, interval: int) -> float:
+    """Stable per-monitor offset within its interval, used to spread overdue monitors."""
+    return zlib.crc32(monitor_id.encode()) % max(interval, 1)
+
+
+class MonitorScheduler:
+    """
+    Min-heap of (due_ts, seq, monitor_id).
+    Rescheduling or removing a monitor bumps its seq; stale heap entries are
+    skipped lazily when popped.
+    """
+
+    def __init__(self, jitter: float = None):
+        self.jitter = settings.SCHEDULER_JITTER_SECONDS if jitter is None else jitter
+        self._heap: List[tuple] = []
+        self._entries: Dict[str, tuple] = {}  # monitor_id -> (seq, due_ts, interval)
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, monitor_id: str, interval: int, due_ts: float) -> None:
+        seq = next(self._seq)
+        self._entries[monitor_id] = (seq, due_ts, interval)
+        jitter = random.uniform(0, self.jitter) if self.jitter else 0
+        heapq.heappush(self._heap, (due_ts + jitter, seq, monitor_id))
+
+    def remove(self, monitor_id: str) -> None:
+        self._entries.pop(monitor_id, None)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due_ts, seq, monitor_id = self._heap[0]
+            entry = self._entries.get(monitor_id)
+            if entry and entry[0] == seq:
+                return due_ts
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> List[str]:
+        """Pop every monitor due at `now` and reschedule it one interval later."""
+        due = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, _, monitor_id = heapq.heappop(self._heap)
+            _, due_ts, interval = self._entries[monitor_id]
+            due.append(monitor_id)
+            # Fixed-rate schedule; if we fell more than an interval behind, restart from now
+            next_ts = due_ts + interval
+            if next_ts <= now:
+                next_ts = now + interval
+            self.schedule(monitor_id, interval, next_ts)
+        return due
+
+    def _place(self, monitor: Monitor, now: float) -> None:
+        monitor_id = str(monitor.id)
+        interval = monitor.interval or 300
+        due_ts = _to_ts(monitor.next_check_at)
+        if due_ts is None or due_ts < now:
+            # Never checked / overdue: spread over the next interval instead of all at once
+            due_ts = now + _phase(monitor_id, min(interval, 60))
+        self.schedule(monitor_id, interval, due_ts)
+
+    def load(self, db: Session) -> None:
+        """Reconcile with the monitors table. Keeps due times of unchanged monitors."""
+        now = time.time()
+        rows = db.query(Monitor).filter(Monitor.is_active == True).all()
+
+        seen = set()
+        for monitor in rows:
+            monitor_id = str(monitor.id)
+            seen.add(monitor_id)
+            entry = self._entries.get(monitor_id)
+            if entry and entry[2] == monitor.interval:
+                continue
+            self._place(monitor, now)
+
+        for monitor_id in list(self._entries):
+            if monitor_id not in seen:
+                self.remove(monitor_id)
+
+    def refresh(self, db: Session, monitor_id: str) -> None:
+        """Reload a single monitor after it was created, updated, paused, resumed or deleted."""
+        monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
+        if not monitor or not monitor.is_active:
+            self.remove(monitor_id)
+            return
+
+        now = time.time()
+        entry = self._entries.get(monitor_id)
+        due_ts = _to_ts(monitor.next_check_at)
+        if entry and entry[2] == monitor.interval and (due_ts is None or due_ts >= entry[1]):
+            return  # nothing relevant changed
+        interval = monitor.interval or 300
+        self.schedule(monitor_id, interval, max(due_ts or now, now))
+
+
+def dispatch(monitor_ids: List[str]) -> None:
+    """Send due monitors to the Celery workers."""
+    from app.tasks import check_single_monitor, check_monitor_batch
+
+    if settings.CHECK_EXECUTOR == "batch":
+        batch_size = max(settings.CHECK_BATCH_SIZE, 1)
+        for i in range(0, len(monitor_ids), batch_size):
+            check_monitor_batch.delay(monitor_ids[i:i + batch_size])
+    else:
+        for monitor_id in monitor_ids:
+            check_single_monitor.delay(monitor_id)
+
+
+def _renew(r, token: str) -> bool:
+    """Take or extend the leader lock. True while this process is the leader."""
+    ttl = settings.SCHEDULER_HEARTBEAT_TTL
+    if r.set(LEADER_KEY, token, nx=True, ex=ttl):
+        return True
+    return bool(r.eval(RENEW_LUA, 1, LEADER_KEY, token, ttl))
+
+
+def _lead(r, token: str) -> None:
+    """Schedule and dispatch checks until leadership is lost."""
+    ttl = settings.SCHEDULER_HEARTBEAT_TTL
+    scheduler = MonitorScheduler()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(SCHEDULE_CHANNEL)
+
+    try:
+        db = SessionLocal()
+        try:
+            scheduler.load(db)
+        finally:
+            db.close()
+        print(f"🗓️  Scheduler leading with {len(scheduler)} monitors")
+
+        last_resync = last_renewed = time.time()
+        r.set(HEARTBEAT_KEY, int(last_renewed), ex=ttl)
+
+        while True:
+            try:
+                now = time.time()
+                if now - last_renewed >= ttl / 3:
+                    if not _renew(r, token):
+                        print("🗓️  Scheduler lost leadership, back to standby")
+                        return
+                    r.set(HEARTBEAT_KEY, int(now), ex=ttl)
+                    last_renewed = now
+
+                due = scheduler.pop_due(now)
+                if due:
+                    dispatch(due)
+
+                # Collect change notifications until the next monitor is due
+                next_due = scheduler.next_due()
+                timeout = 1.0 if next_due is None else min(max(next_due - time.time(), 0.01), 1.0)
+                changed = set()
+                message = pubsub.get_message(timeout=timeout)
+                while message:
+                    changed.add(message["data"])
+                    message = pubsub.get_message()
+
+                resync = time.time() - last_resync >= settings.SCHEDULER_RESYNC_INTERVAL
+                if changed or resync:
+                    db = SessionLocal()
+                    try:
+                        if resync:
+                            scheduler.load(db)
+                            last_resync = time.time()
+                        else:
+                            for monitor_id in changed:
+                                scheduler.refresh(db, monitor_id)
+                    finally:
+                        db.close()
+
+            except Exception as e:
+                print(f"⚠️  Scheduler loop error: {e}")
+                # Unrenewed, the lock may pass to another replica — stop before it can
+                if time.time() - last_renewed >= ttl * 2 / 3:
+                    print("🗓️  Scheduler could not renew leadership, back to standby")
+                    return
+                time.sleep(1)
+    finally:
+        try:
+            pubsub.close()
+        except Exception:
+            pass
+
+
+def run() -> None:
+    token = f"{socket.gethostname()}:{os.getpid()}"
+    r = get_redis()
+    print(f"🗓️  Scheduler {token} started")
+
+    while True:
+        try:
+            if _renew(r, token):
+                _lead(r, token)
+                continue
+        except Exception as e:
+            print(f"⚠️  Scheduler error: {e}")
+        time.sleep(settings.SCHEDULER_HEARTBEAT_TTL / 3)
+
+
+if __name__ == "__main__":
+    run()
@@ -2,7 +2,7 @@
 Pydantic schemas for request/response validation
 """
 
-from pydantic import BaseModel, EmailStr, Field, HttpUrl
+from pydantic import BaseModel, EmailStr, Field, HttpUrl, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -67,6 +67,8 @@ class MonitorCreate(BaseModel):
     keyword: Optional[str] = Field(None, max_length=500)
     keyword_present: bool = Field(default=True)
     use_regex: bool = Field(default=False)
+    reuse_connections: bool = Field(default=True)
+    max_response_bytes: Optional[int] = Field(None, ge=1024, le=10485760)  # 1 KB to 10 MB
     alert_threshold: int = Field(default=1, ge=1, le=10)
 
 
@@ -85,9 +87,19 @@ class MonitorUpdate(BaseModel):
     keyword: Optional[str] = Field(None, max_length=500)
     keyword_present: Optional[bool] = None
     use_regex: Optional[bool] = None
+    reuse_connections: Optional[bool] = None
+    max_response_bytes: Optional[int] = Field(None, ge=1024, le=10485760)
     alert_threshold: Optional[int] = Field(None, ge=1, le=10)
     is_active: Optional[bool] = None
 
+    @field_validator("reuse_connections")
+    @classmethod
+    def reuse_connections_not_null(cls, v):
+        # Omit the field to leave it unchanged; the column is NOT NULL
+        if v is None:
+            raise ValueError("reuse_connections must be true or false")
+        return v
+
 
 class AlertChannelBrief(BaseModel):
     """Brief alert channel info for monitor response"""
@@ -119,6 +131,8 @@ class MonitorResponse(BaseModel):
     keyword: Optional[str]
     keyword_present: bool
     use_regex: bool = False
+    reuse_connections: bool = True
+    max_response_bytes: Optional[int] = None
     alert_threshold: int = 1
     consecutive_failures: int = 0
     is_active: bool
@@ -142,6 +156,12 @@ class CheckResponse(BaseModel):
     status: str
     status_code: Optional[int]
     response_time: Optional[int]
+    dns_time: Optional[int] = None
+    connect_time: Optional[int] = None
+    tls_time: Optional[int] = None
+    ttfb_time: Optional[int] = None
+    download_time: Optional[int] = None
+    connection_reused: Optional[bool] = None
     error_message: Optional[str]
     checked_at: datetime
     ai_analysis: Optional[dict] = None
@@ -0,0 +1,113 @@
+"""
+Mergeable latency sketch (DDSketch-style, logarithmic buckets).
+
+A value v > 0 lands in bucket i = ceil(log_gamma(v)) with
+gamma = (1 + ALPHA) / (1 - ALPHA), and every bucket is reported by the value
+within ALPHA of both of its edges. Any quantile read from a sketch is
+therefore within ALPHA (1%) relative error of the true value at that rank,
+however many sketches were merged to build it. Merging is adding bucket
+counts, so an hour or day rollup bucket can carry one sketch and any window
+is the merge of the buckets it covers.
+
+Latencies are whole milliseconds bounded by the request timeout, so a sketch
+never holds more than a few hundred buckets (~550 for 1 ms .. 60 s).
+
+ALPHA is part of the stored format: sketches built with different values
+cannot be merged.
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(GAMMA)
+
+
+class LatencySketch:
+    """Quantile sketch over non-negative values, with exact count / sum / min / max."""
+
+    __slots__ = ("bins", "zero", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.zero = 0  # values <= 0 (heartbeat pings record 0 ms)
+        self.count = 0
+        self.total = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def add(self, value: float) -> None:
+        if value <= 0:
+            self.zero += 1
+        else:
+            i = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.bins[i] = self.bins.get(i, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Value at rank int(count * q), the same rank the raw-check percentile
+        used (q in 0..1). None for an empty sketch.
+        """
+        if not self.count:
+            return None
+        rank = min(int(self.count * q), self.count - 1)
+        if rank < self.zero:
+            return 0
+        seen = self.zero
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                value = 2 * GAMMA ** i / (GAMMA + 1)
+                # Exact extremes are known — never report outside them
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "zero": self.zero,
+            "bins": {str(i): n for i, n in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "LatencySketch":
+        sketch = cls()
+        if not data:
+            return sketch
+        sketch.count = data.get("n", 0)
+        sketch.total = data.get("sum", 0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch.zero = data.get("zero", 0)
+        sketch.bins = {int(i): n for i, n in (data.get("bins") or {}).items()}
+        return sketch
+
+
+def merge_sketches(sketches: Iterable[LatencySketch]) -> LatencySketch:
+    merged = LatencySketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
@@ -0,0 +1,81 @@
+"""
+SLA engine — per-monitor, per-month uptime, downtime, incidents and latency.
+
+Used by the SLA report endpoint and the monthly SLA emails. For a set of
+monitors and a run of months it costs two queries regardless of how many
+monitors or months are asked for:
+  - one grouped query over day rollup buckets (counts and latency per month)
+  - one query for the incidents overlapping the whole range
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.incidents import downtime_seconds, incidents_between
+from app.rollups import avg_latency, monthly_totals, uptime_pct
+
+
+def add_months(first_of_month: datetime, months: int) -> datetime:
+    month = first_of_month.month - 1 + months
+    return first_of_month.replace(year=first_of_month.year + month // 12, month=month % 12 + 1)
+
+
+def month_ranges(months: int, now: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+    """(first_of_month, first_of_next_month) for the last `months` months including the current one, oldest first."""
+    now = now or datetime.utcnow()
+    current = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return [(add_months(current, -offset), add_months(current, 1 - offset)) for offset in range(months - 1, -1, -1)]
+
+
+def monthly_sla(db: Session, monitor_ids: List[str], months: List[Tuple[datetime, datetime]],
+                now: Optional[datetime] = None) -> Dict[str, List[dict]]:
+    """
+    monitor_id -> one stats dict per month range (same order as `months`):
+    month, uptime_percentage (None without checks), total_checks,
+    downtime_minutes, incidents, avg_response_time.
+    Incidents still open count until `now` (or the end of the month, if earlier).
+    """
+    if not monitor_ids or not months:
+        return {}
+    now = now or datetime.utcnow()
+    start, end = months[0][0], months[-1][1]
+
+    totals = monthly_totals(db, monitor_ids, start, end)
+    incidents = {}
+    for incident in incidents_between(db, monitor_ids, start, end):
+        incidents.setdefault(str(incident.monitor_id), []).append(incident)
+
+    report = {}
+    for monitor_id in monitor_ids:
+        stats = []
+        for month_start, month_end in months:
+            key = month_start.strftime("%Y-%m")
+            month = totals.get((monitor_id, key))
+            if not month:
+                stats.append({
+                    "month": key,
+                    "uptime_percentage": None,
+                    "total_checks": 0,
+                    "downtime_minutes": 0,
+                    "incidents": 0,
+                    "avg_response_time": 0,
+                })
+                continue
+
+            until = min(month_end, now)
+            month_incidents = [
+                i for i in incidents.get(monitor_id, [])
+                if i.started_at < until and (i.resolved_at is None or i.resolved_at > month_start)
+            ]
+            stats.append({
+                "month": key,
+                "uptime_percentage": uptime_pct(month, 3),
+                "total_checks": month["total"],
+                "downtime_minutes": round(downtime_seconds(month_incidents, month_start, until) / 60, 1),
+                "incidents": len(month_incidents),
+                "avg_response_time": avg_latency(month),
+            })
+        report[monitor_id] = stats
+    return report
@@ -0,0 +1,298 @@
+"""
+Cached public status page payloads.
+
+GET /public/status/{id} used to recompute uptime windows, latency, incidents
+and the 90-day chart on every hit. The payload is now built once and kept in
+Redis as {body, etag, generated_at}, fresh for STATUS_CACHE_TTL seconds:
+  - readers get it with one GET and serve it with ETag / Last-Modified /
+    Cache-Control, so browsers revalidate with a 304 and a CDN in front can
+    absorb the traffic of a busy incident page
+  - entries are kept STALE_FACTOR times longer than they are fresh. Once one
+    is stale (expired, or its monitor changed state since it was built) a
+    single reader takes REBUILD_LOCK and rebuilds it; everyone else keeps
+    getting the previous entry meanwhile. Only a cold miss waits, briefly,
+    for that rebuild
+  - when a monitor changes state the pipeline calls invalidate(): it marks
+    the monitor changed (CHANGED_KEY) and, for pages that were cached
+    (someone is watching them), queues refresh_status_pages, which
+    overwrites the entries in place — nothing is deleted
+
+Status badges (README embeds, fetched through image proxies on every view)
+are cached the same way under BADGE_KEY as pre-rendered shields.io JSON and
+SVG with strong ETags — content hashes, so a badge whose status and rounded
+uptime haven't changed keeps its ETag across rebuilds and proxies keep
+getting 304s. A cached badge costs no database query.
+
+If Redis is unavailable the payload is built per request as before.
+"""
+
+import hashlib
+import json
+import time
+from html import escape
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.incidents import incident_dict, incidents_between
+from app.models import Monitor
+from app.rollups import avg_latency, daily_uptime, rollup_totals, uptime_pct
+
+settings = get_settings()
+
+STATUS_KEY = "checkapi:status:{}"
+BADGE_KEY = "checkapi:badge:{}"
+CHANGED_KEY = "checkapi:status:changed:{}"  # epoch seconds of the monitor's last state change
+REBUILD_LOCK = "{}:lock"  # per entry key, held while one reader rebuilds it
+
+# Entries live in Redis this many times their freshness, served stale while rebuilt
+STALE_FACTOR = 10
+REBUILD_LOCK_SECONDS = 10
+# How long a reader that finds no entry at all waits for another one's rebuild
+COLD_WAIT_SECONDS = 2.0
+
+# shields.io color names and the hex the SVG badge uses for them
+BADGE_COLORS = {
+    "up": ("brightgreen", "#4c1"),
+    "degraded": ("yellow", "#dfb317"),
+    "down": ("red", "#e05d44"),
+    "unknown": ("lightgrey", "#9f9f9f"),
+}
+
+
+def build_payload(db: Session, monitor: Monitor, now: Optional[datetime] = None) -> dict:
+    """The public status page body for one monitor."""
+    now = now or datetime.utcnow()
+    monitor_id = str(monitor.id)
+
+    def window(hours):
+        return rollup_totals(db, [monitor_id], now - timedelta(hours=hours)).get(monitor_id)
+
+    def uptime(totals):
+        value = uptime_pct(totals)
+        return 100.0 if value is None else value
+
+    day = window(24)
+    incidents = incidents_between(db, [monitor_id], now - timedelta(days=7), latest=10)
+
+    # Last 90 days of daily uptime (for chart) — day rollup buckets
+    daily, _ = daily_uptime(db, monitor_id, 91, now)
+    daily_stats = [{"date": d["date"], "uptime": d["uptime"]} for d in daily]
+
+    return {
+        "monitor": {
+            "id": monitor_id,
+            "name": monitor.name,
+            "url": monitor.url
+        },
+        "status": {
+            "current": monitor.last_status or "unknown",
+            "last_checked": monitor.last_checked_at.isoformat() if monitor.last_checked_at else None
+        },
+        "uptime": {
+            "24h": uptime(day),
+            "7d": uptime(window(24 * 7)),
+            "30d": uptime(window(24 * 30))
+        },
+        "performance": {
+            "avg_response_time_ms": avg_latency(day)
+        },
+        "incidents": [incident_dict(i, now) for i in incidents],
+        "history": {
+            "daily": daily_stats
+        }
+    }
+
+
+def _entry(payload: dict, now: datetime) -> dict:
+    body = json.dumps(payload, separators=(",", ":"))
+    return {
+        "body": body,
+        "etag": _etag(body),
+        # HTTP dates have second precision
+        "generated_at": now.replace(microsecond=0).isoformat(),
+    }
+
+
+def _put(r, key: str, entry: dict, ttl: int, built_at: float) -> dict:
+    entry = {**entry, "built_at": built_at, "fresh_until": built_at + ttl}
+    r.set(key, json.dumps(entry), ex=ttl * STALE_FACTOR)
+    return entry
+
+
+def _is_fresh(entry: dict, changed_at) -> bool:
+    if entry.get("fresh_until", 0) <= time.time():
+        return False
+    return changed_at is None or entry.get("built_at", 0) >= float(changed_at)
+
+
+def _cached(db: Session, monitor_id: str, key: str, ttl: int, build) -> Optional[dict]:
+    """
+    Fresh cache entry under `key`, rebuilt with build(db, monitor) when stale
+    or missing — by one reader at a time. None if the monitor doesn't exist.
+    """
+    from app.redis_client import get_redis
+
+    def rebuild():
+        monitor = db.query(Monitor).filter(Monitor.id == monitor_id).first()
+        return build(db, monitor) if monitor else None
+
+    try:
+        r = get_redis()
+        cached, changed_at = r.mget(key, CHANGED_KEY.format(monitor_id))
+    except Exception as e:
+        print(f"[status-cache] Redis unavailable, building uncached: {e}")
+        return rebuild()
+
+    entry = json.loads(cached) if cached else None
+    if entry and _is_fresh(entry, changed_at):
+        return entry
+
+    lock = REBUILD_LOCK.format(key)
+    try:
+        rebuilding = not r.set(lock, 1, nx=True, ex=REBUILD_LOCK_SECONDS)
+    except Exception:
+        rebuilding = False
+    if rebuilding:
+        if entry:
+            return entry  # stale while another reader rebuilds it
+        deadline = time.monotonic() + COLD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            try:
+                cached = r.get(key)
+            except Exception:
+                break
+            if cached:
+                return json.loads(cached)
+        return rebuild()
+
+    try:
+        built_at = time.time()
+        fresh = rebuild()
+        if fresh is None:
+            return None
+        try:
+            return _put(r, key, fresh, ttl, built_at)
+        except Exception as e:
+            print(f"[status-cache] Failed to cache {key}: {e}")
+            return fresh
+    finally:
+        try:
+            r.delete(lock)
+        except Exception:
+            pass
+
+
+def _status_entry(db: Session, monitor: Monitor) -> dict:
+    return _entry(build_payload(db, monitor), datetime.utcnow())
+
+
+def store(db: Session, monitor: Monitor) -> None:
+    """Rebuild one monitor's cached payload and badge, overwriting the previous entries."""
+    from app.redis_client import get_redis
+
+    r = get_redis()
+    built_at = time.time()
+    _put(r, STATUS_KEY.format(monitor.id), _status_entry(db, monitor), settings.STATUS_CACHE_TTL, built_at)
+    _put(r, BADGE_KEY.format(monitor.id), build_badge(db, monitor), settings.BADGE_CACHE_TTL, built_at)
+
+
+def get_entry(db: Session, monitor_id: str) -> Optional[dict]:
+    """
+    Cached {body, etag, generated_at} for a monitor, built on a miss.
+    None if the monitor doesn't exist.
+    """
+    return _cached(db, monitor_id, STATUS_KEY.format(monitor_id), settings.STATUS_CACHE_TTL, _status_entry)
+
+
+def _text_width(text: str) -> int:
+    # Verdana 11px averages ~7px per character; good enough for a badge
+    return 7 * len(text) + 10
+
+
+def render_svg(label: str, message: str, color: str) -> str:
+    """Flat shields.io-style badge."""
+    label_w, message_w = _text_width(label), _text_width(message)
+    width = label_w + message_w
+    label, message = escape(label), escape(message)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="20" role="img" '
+        f'aria-label="{label}: {message}"><title>{label}: {message}</title>'
+        f'<linearGradient id="s" x2="0" y2="100%"><stop offset="0" stop-color="#bbb" stop-opacity=".1"/>'
+        f'<stop offset="1" stop-opacity=".1"/></linearGradient>'
+        f'<clipPath id="r"><rect width="{width}" height="20" rx="3" fill="#fff"/></clipPath>'
+        f'<g clip-path="url(#r)"><rect width="{label_w}" height="20" fill="#555"/>'
+        f'<rect x="{label_w}" width="{message_w}" height="20" fill="{color}"/>'
+        f'<rect width="{width}" height="20" fill="url(#s)"/></g>'
+        f'<g fill="#fff" text-anchor="middle" font-family="Verdana,Geneva,DejaVu Sans,sans-serif" font-size="11">'
+        f'<text x="{label_w / 2}" y="14">{label}</text>'
+        f'<text x="{label_w + message_w / 2}" y="14">{message}</text></g></svg>'
+    )
+
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def build_badge(db: Session, monitor: Monitor) -> dict:
+    """Badge cache entry: {json, svg, json_etag, svg_etag, generated_at}."""
+    # 30 days of day buckets, the same days the status page chart shows
+    _, totals = daily_uptime(db, str(monitor.id), 30)
+    uptime = uptime_pct(totals)
+    uptime = 100.0 if uptime is None else uptime
+    current = monitor.last_status or "unknown"
+    color_name, color_hex = BADGE_COLORS.get(current, BADGE_COLORS["unknown"])
+    message = f"{uptime}% uptime"
+
+    body = json.dumps({
+        "schemaVersion": 1,
+        "label": monitor.name,
+        "message": message,
+        "color": color_name,
+        "status": current
+    }, separators=(",", ":"))
+    svg = render_svg(monitor.name, message, color_hex)
+    return {
+        "json": body,
+        "svg": svg,
+        "json_etag": _etag(body),
+        "svg_etag": _etag(svg),
+        "generated_at": datetime.utcnow().replace(microsecond=0).isoformat(),
+    }
+
+
+def get_badge(db: Session, monitor_id: str) -> Optional[dict]:
+    """Cached badge entry for a monitor, built on a miss. None if the monitor doesn't exist."""
+    return _cached(db, monitor_id, BADGE_KEY.format(monitor_id), settings.BADGE_CACHE_TTL, build_badge)
+
+
+def invalidate(monitor_ids: Iterable[str]) -> List[str]:
+    """
+    Mark monitors whose state changed, so their cached entries count as stale,
+    and queue a rebuild for the ones with a cached status page or badge.
+    Returns those ids. Never raises.
+    """
+    ids = [str(m) for m in monitor_ids]
+    if not ids:
+        return []
+    try:
+        from app.redis_client import get_redis
+
+        changed_at = time.time()
+        keep = max(settings.STATUS_CACHE_TTL, settings.BADGE_CACHE_TTL) * STALE_FACTOR
+        pipe = get_redis().pipeline(transaction=False)
+        for monitor_id in ids:
+            pipe.set(CHANGED_KEY.format(monitor_id), changed_at, ex=keep)
+            pipe.exists(STATUS_KEY.format(monitor_id), BADGE_KEY.format(monitor_id))
+        results = pipe.execute()
+        cached = [monitor_id for monitor_id, found in zip(ids, results[1::2]) if found]
+        if cached:
+            from app.tasks import refresh_status_pages
+            refresh_status_pages.delay(cached)
+        return cached
+    except Exception as e:
+        print(f"[status-cache] Failed to invalidate status pages: {e}")
+        return []
@@ -2,19 +2,26 @@
 Celery tasks for monitoring and alerts
 """
 
-import re
 import time
-import ssl
-import socket
-import requests
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
 
+from app import alert_buffer, archive, partitions, status_cache
 from app.celery_app import celery_app
-from app.database import SessionLocal, init_db
-from app.models import Monitor, Check, User
+from app.checker.assertion_plan import load_plans
+from app.checker.probe import probe_spec, run_probe
+from app.checker.ssl_certs import fetch_cert_expiries, host_port
+from app.checker.writer import CheckResultWriter, bulk_insert_checks, bulk_update_monitors
+from app.config import get_settings
+from app.database import SessionLocal, init_db, is_postgres
+from app.models import AlertChannel, Monitor, Check, CheckRollup, SHARD_KEY_RANGE, SlaReportDelivery, User, generate_uuid
+from app.incidents import rebuild_incidents
+from app.rollups import rebuild_rollups, refresh_sketches
+from app.sla import add_months, monthly_sla
+
+settings = get_settings()
 
 # Data retention days per plan
 RETENTION_DAYS = {
@@ -24,28 +31,12 @@ RETENTION_DAYS = {
     "business": 365,
 }
 
-def check_ssl_expiry(url: str):
-    """Returns SSL certificate expiry datetime. None if not HTTPS or error."""
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme != "https":
-            return None
-        hostname = parsed.hostname
-        port = parsed.port or 443
-        ctx = ssl.create_default_context()
-        conn = ctx.wrap_socket(
-            socket.create_connection((hostname, port), timeout=10),
-            server_hostname=hostname
-        )
-        cert = conn.getpeercert()
-        conn.close()
-        expiry_str = cert["notAfter"]
-        # Strip trailing timezone label (e.g. " GMT") before parsing — %Z is unreliable
-        expiry_no_tz = expiry_str.rsplit(" ", 1)[0]
-        return datetime.strptime(expiry_no_tz, "%b %d %H:%M:%S %Y")
-    except Exception as e:
-        print(f"[SSL] check error for {url}: {e}")
-        return None
+def _deadline_passed(column, minutes, now: datetime):
+    """SQL condition `column + minutes < now` (minutes may itself be a column expression)."""
+    if is_postgres:
+        return column + func.make_interval(0, 0, 0, 0, 0, minutes) < now
+    # SQLite stores datetimes as text; compare as julianday numbers (days)
+    return func.julianday(column) + minutes / 1440.0 < func.julianday(now.isoformat(sep=" "))
 
 
 # Initialize database tables on worker startup
@@ -59,7 +50,15 @@ def check_monitors():
     Periodic task: Find monitors that need checking and schedule individual checks.
     Uses row-level locking (SKIP LOCKED) to prevent multiple workers from picking
     up the same monitors simultaneously.
+    In batch mode (CHECK_EXECUTOR=batch) claimed monitors are handed out in chunks
+    of CHECK_BATCH_SIZE to check_monitor_batch instead of one task per monitor.
+    Fallback only: skipped while the dedicated scheduler (app.scheduler) is alive.
     """
+    from app.scheduler import scheduler_is_running
+
+    if scheduler_is_running():
+        return {"scheduled": 0, "skipped": "scheduler running"}
+
     db = SessionLocal()
 
     try:
@@ -82,8 +81,13 @@ def check_monitors():
 
         print(f"[{now}] Claimed {len(monitor_ids)} monitors to check")
 
-        for monitor_id in monitor_ids:
-            check_single_monitor.delay(monitor_id)
+        if settings.CHECK_EXECUTOR == "batch":
+            batch_size = max(settings.CHECK_BATCH_SIZE, 1)
+            for i in range(0, len(monitor_ids), batch_size):
+                check_monitor_batch.delay(monitor_ids[i:i + batch_size])
+        else:
+            for monitor_id in monitor_ids:
+                check_single_monitor.delay(monitor_id)
 
         return {"scheduled": len(monitor_ids)}
 
@@ -113,178 +117,78 @@ def check_single_monitor(monitor_id: str):
 
         print(f"Checking monitor: {monitor.name} ({monitor.url})")
         
-        # Prepare request
-        headers = monitor.headers or {}
-        
-        # Perform health check
-        try:
-            start_time = time.time()
-            
-            response = requests.request(
-                method=monitor.method,
-                url=monitor.url,
-                headers=headers,
-                data=monitor.body if monitor.method in ["POST", "PUT", "PATCH"] else None,
-                timeout=monitor.timeout,
-                allow_redirects=True
-            )
-            
-            response_time_ms = int((time.time() - start_time) * 1000)
-            
-            # Determine status - step 1: status code check
-            if response.status_code == monitor.expected_status:
-                status = "up"
-                error_message = None
-            else:
-                status = "degraded"
-                error_message = f"Expected status {monitor.expected_status}, got {response.status_code}"
-
-            # Step 2: assertions check (keyword/regex/jsonpath)
-            has_assertions = False
-            if status == "up":
-                try:
-                    from app.models import MonitorAssertion
-                    from app.routers.assertions import run_assertions
-                    assertions = db.query(MonitorAssertion).filter(
-                        MonitorAssertion.monitor_id == monitor.id,
-                        MonitorAssertion.is_active == True
-                    ).order_by(MonitorAssertion.order).all()
-
-                    if assertions:
-                        has_assertions = True
-                        result = run_assertions(response.text, assertions, dict(response.headers))
-                        if not result["passed"]:
-                            status = "degraded"
-                            failed = [r for r in result["results"] if not r["passed"]]
-                            if failed:
-                                f = failed[0]
-                                error_message = f"Assertion failed: {f['path']} {f['operator']} {f['expected']} (got: {f['actual']})"
-                            else:
-                                error_message = "Assertion failed"
-                except Exception as e:
-                    print(f"Assertion check error: {e}")
-
-            # Step 2b: legacy keyword/regex check (only if no assertions defined)
-            if status == "up" and monitor.keyword and not has_assertions:
-                try:
-                    body_text = response.text
-                    use_regex = getattr(monitor, 'use_regex', False)
-                    if use_regex:
-                        try:
-                            keyword_found = bool(re.search(monitor.keyword, body_text))
-                            pattern_label = f"Pattern '{monitor.keyword}'"
-                        except re.error as regex_err:
-                            keyword_found = False
-                            pattern_label = f"Invalid regex '{monitor.keyword}'"
-                    else:
-                        keyword_found = monitor.keyword in body_text
-                        pattern_label = f"Keyword '{monitor.keyword}'"
-                    if monitor.keyword_present and not keyword_found:
-                        status = "degraded"
-                        error_message = f"{pattern_label} not found in response body"
-                    elif not monitor.keyword_present and keyword_found:
-                        status = "degraded"
-                        error_message = f"{pattern_label} found in response body (expected absent)"
-                except Exception as e:
-                    print(f"Keyword check error: {e}")
-            
-            # Create check record
-            check = Check(
-                monitor_id=monitor.id,
-                status=status,
-                status_code=response.status_code,
-                response_time=response_time_ms,
-                error_message=error_message,
-                checked_at=datetime.utcnow()
-            )
-            
-        except requests.exceptions.Timeout:
-            # Timeout error
-            status = "down"
-            check = Check(
-                monitor_id=monitor.id,
-                status=status,
-                error_message=f"Request timed out after {monitor.timeout} seconds",
-                checked_at=datetime.utcnow()
-            )
-            
-        except requests.exceptions.ConnectionError as e:
-            # Connection error
-            status = "down"
-            check = Check(
-                monitor_id=monitor.id,
-                status=status,
-                error_message=f"Connection error: {str(e)[:200]}",
-                checked_at=datetime.utcnow()
-            )
-            
-        except Exception as e:
-            # Other errors
-            status = "down"
-            check = Check(
-                monitor_id=monitor.id,
-                status=status,
-                error_message=f"Error: {str(e)[:200]}",
-                checked_at=datetime.utcnow()
-            )
-        
-        # Save check
-        db.add(check)
-
-        # Update monitor
-        previous_status = monitor.last_status
-        monitor.last_status = status
-        monitor.last_checked_at = datetime.utcnow()
-        monitor.next_check_at = datetime.utcnow() + timedelta(seconds=monitor.interval)
-
-        # Track consecutive failures for alert threshold
-        threshold = monitor.alert_threshold or 1
-        if status in ("down", "degraded"):
-            monitor.consecutive_failures = (monitor.consecutive_failures or 0) + 1
-        else:
-            monitor.consecutive_failures = 0
+        spec = probe_spec(monitor)
+        plan = load_plans(db, [spec])[spec["id"]]
 
-        db.commit()
+        # Perform health check
+        result = run_probe(spec, plan)
 
-        # Alert logic:
-        # - Recovery (any → up): always alert immediately, reset alert_sent flag
-        # - Failure: alert only when threshold is first reached AND no alert sent yet for this incident
-        ai_analysis = None
-        if status == "up" and previous_status and previous_status != "up":
-            print(f"Recovery: {previous_status} -> up")
-            monitor.alert_sent = False
-            db.commit()
-            send_alerts.delay(str(monitor.id), status, previous_status)
-        elif status != "up" and monitor.consecutive_failures >= threshold and not monitor.alert_sent:
-            print(f"Threshold reached ({threshold}): {previous_status} -> {status}")
-            # AI analysis only at alert time (not every failed check)
-            from app.ai.analyzer import analyze_incident
-            ai_analysis = analyze_incident(
-                monitor_name=monitor.name,
-                monitor_url=monitor.url,
-                status=status,
-                status_code=getattr(check, "status_code", None),
-                response_time=getattr(check, "response_time", None),
-                error_message=getattr(check, "error_message", None),
-            )
-            if ai_analysis:
-                check.ai_analysis = ai_analysis
-            monitor.alert_sent = True
-            db.commit()
-            send_alerts.delay(str(monitor.id), status, previous_status or status, ai_analysis)
+        # Single transaction for check row, monitor state and alert flag
+        writer = CheckResultWriter(db, batch_size=1)
+        writer.add(spec, result)
+        writer.flush()
         
-        print(f"✓ Check completed: {monitor.name} - {status}")
+        timings = result.get("timings")
+        if timings:
+            reused = "reused" if timings["connection_reused"] else "new"
+            print(f"✓ Check completed: {spec['name']} - {result['status']} "
+                  f"(conn={reused} dns={timings['dns_ms']} connect={timings['connect_ms']} "
+                  f"tls={timings['tls_ms']} ttfb={timings['ttfb_ms']})")
+        else:
+            print(f"✓ Check completed: {spec['name']} - {result['status']}")
         
         return {
-            "monitor_id": str(monitor.id),
-            "status": status,
-            "response_time": getattr(check, 'response_time', None)
+            "monitor_id": spec["id"],
+            "status": result["status"],
+            "response_time": result["response_time"]
         }
         
     finally:
         db.close()
 
 
+@celery_app.task(name="app.tasks.check_monitor_batch")
+def check_monitor_batch(monitor_ids: list):
+    """
+    Check a chunk of monitors claimed by check_monitors.
+    All HTTP probes run concurrently on one asyncio event loop
+    (at most CHECK_CONCURRENCY in flight); results are then written in bulk.
+    """
+    from app.checker.executor import probe_batch
+
+    db = SessionLocal()
+
+    try:
+        monitors = db.query(Monitor).filter(
+            Monitor.id.in_(monitor_ids),
+            Monitor.is_active == True
+        ).all()
+
+        if not monitors:
+            return {"checked": 0}
+
+        specs = [probe_spec(m) for m in monitors]
+        plans = load_plans(db, specs)
+
+        started = time.time()
+        results = probe_batch(specs, plans)
+        print(f"[batch] Probed {len(specs)} monitors in {time.time() - started:.1f}s")
+
+        counts = {"up": 0, "degraded": 0, "down": 0}
+        writer = CheckResultWriter(db)
+        for spec, result in zip(specs, results):
+            writer.add(spec, result)
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        writer.flush()
+
+        print(f"✓ Batch completed: {counts}")
+
+        return {"checked": len(specs), **counts}
+
+    finally:
+        db.close()
+
+
 
 def is_in_maintenance(monitor, db) -> bool:
     """Check if monitor is currently in an active maintenance window"""
@@ -381,11 +285,52 @@ def send_channel_alert(self, channel_type: str, channel_config: dict,
         raise AlertDeliveryError(f"{channel_type} delivery failed")
 
 
+def _alert(monitor, new_status: str, old_status: str, ai_analysis: dict = None) -> dict:
+    """One status change as buffered / sent per channel (see app/alert_buffer.py)."""
+    return {
+        "monitor_id": str(monitor.id),
+        "monitor_name": monitor.name,
+        "monitor_url": monitor.url,
+        "new_status": new_status,
+        "old_status": old_status,
+        "ai_analysis": ai_analysis,
+        "at": datetime.utcnow().isoformat(),
+    }
+
+
+def _send_individual(channel_type: str, channel_config: dict, alert: dict) -> None:
+    send_channel_alert.delay(
+        channel_type,
+        channel_config,
+        alert["monitor_name"],
+        alert["monitor_url"],
+        alert["new_status"],
+        alert["old_status"],
+        alert["monitor_id"],
+        alert["ai_analysis"],
+    )
+
+
+def _dispatch_channel_alerts(pending: list) -> int:
+    """
+    pending: (AlertChannel, alert) pairs. Buffered for the digest window when
+    it is enabled, otherwise each is dispatched as its own retryable task.
+    """
+    if alert_buffer.is_enabled() and alert_buffer.buffer_alerts(
+        [(str(channel.id), alert) for channel, alert in pending]
+    ):
+        return len(pending)
+    for channel, alert in pending:
+        _send_individual(channel.type, channel.config, alert)
+    return len(pending)
+
+
 @celery_app.task(name="app.tasks.send_alerts")
 def send_alerts(monitor_id: str, new_status: str, old_status: str, ai_analysis: dict = None):
     """
     Send alerts when monitor status changes.
-    Dispatches each channel as a separate retryable task.
+    Each active channel gets the change through the alert buffer (or as a
+    separate retryable task when digests are off).
     """
     db = SessionLocal()
 
@@ -401,25 +346,12 @@ def send_alerts(monitor_id: str, new_status: str, old_status: str, ai_analysis:
 
         print(f"🚨 ALERT: {monitor.name} changed from {old_status} to {new_status}")
 
-        alert_channels = monitor.alert_channels
-        dispatched = 0
-
-        for channel in alert_channels:
-            if not channel.is_active:
-                continue
-            send_channel_alert.delay(
-                channel.type,
-                channel.config,
-                monitor.name,
-                monitor.url,
-                new_status,
-                old_status,
-                str(monitor.id),
-                ai_analysis,
-            )
-            dispatched += 1
+        alert = _alert(monitor, new_status, old_status, ai_analysis)
+        dispatched = _dispatch_channel_alerts([
+            (channel, alert) for channel in monitor.alert_channels if channel.is_active
+        ])
 
-        print(f"📤 Dispatched {dispatched} alert tasks for {monitor.name}")
+        print(f"📤 Dispatched {dispatched} channel alerts for {monitor.name}")
 
         return {
             "monitor_id": str(monitor.id),
@@ -430,49 +362,265 @@ def send_alerts(monitor_id: str, new_status: str, old_status: str, ai_analysis:
         db.close()
 
 
+@celery_app.task(name="app.tasks.send_alerts_batch")
+def send_alerts_batch(alerts: list):
+    """
+    Send alerts for many status changes at once.
+    alerts: [monitor_id, new_status, old_status] (optionally + ai_analysis) entries.
+    Monitors and their channels are loaded in one query; the changes then go
+    through the alert buffer like send_alerts.
+    """
+    from sqlalchemy.orm import selectinload
+
+    db = SessionLocal()
+
+    try:
+        monitor_ids = list({alert[0] for alert in alerts})
+        monitors = {
+            str(m.id): m
+            for m in db.query(Monitor).options(selectinload(Monitor.alert_channels)).filter(
+                Monitor.id.in_(monitor_ids)
+            ).all()
+        }
+
+        pending = []
+        for alert in alerts:
+            monitor_id, new_status, old_status = alert[:3]
+            ai_analysis = alert[3] if len(alert) > 3 else None
+            monitor = monitors.get(monitor_id)
+            if not monitor:
+                continue
+
+            if is_in_maintenance(monitor, db):
+                print(f"🔕 ALERT SUPPRESSED (maintenance window): {monitor.name} {old_status} -> {new_status}")
+                continue
+
+            print(f"🚨 ALERT: {monitor.name} changed from {old_status} to {new_status}")
+            change = _alert(monitor, new_status, old_status, ai_analysis)
+            pending.extend((channel, change) for channel in monitor.alert_channels if channel.is_active)
+
+        dispatched = _dispatch_channel_alerts(pending)
+        print(f"📤 Dispatched {dispatched} channel alerts for {len(alerts)} status changes")
+        return {"alerts": len(alerts), "dispatched": dispatched}
+
+    finally:
+        db.close()
+
+
+@celery_app.task(
+    name="app.tasks.send_channel_digest",
+    bind=True,
+    autoretry_for=(AlertDeliveryError,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    max_retries=4,
+    default_retry_delay=60,
+    ignore_result=True,
+)
+def send_channel_digest(self, channel_type: str, channel_config: dict, alerts: list):
+    """Send one grouped message for many status changes on a channel (same retry policy as send_channel_alert)."""
+    from app.alerts import send_discord_digest, send_slack_digest, send_telegram_digest
+
+    if channel_type == "slack":
+        success = send_slack_digest(channel_config, alerts)
+    elif channel_type == "telegram":
+        success = send_telegram_digest(channel_config, alerts)
+    elif channel_type == "discord":
+        success = send_discord_digest(channel_config, alerts)
+    else:
+        return
+
+    if not success:
+        attempt = self.request.retries + 1
+        print(f"⚠️  {channel_type} digest failed (attempt {attempt}/5), will retry")
+        raise AlertDeliveryError(f"{channel_type} digest delivery failed")
+
+
+@celery_app.task(
+    name="app.tasks.send_email_alert_batch",
+    bind=True,
+    max_retries=4,
+    ignore_result=True,
+)
+def send_email_alert_batch(self, messages: list):
+    """
+    Send one Resend batch (up to RESEND_BATCH_SIZE alert / digest emails).
+    Retried with the same backoff as send_channel_alert, but only with the
+    emails that were not delivered, so nobody gets a duplicate.
+    """
+    from celery.utils.time import get_exponential_backoff_interval
+    from app.alerts import send_email_batch
+
+    failed = send_email_batch(messages)
+    if failed:
+        attempt = self.request.retries + 1
+        print(f"⚠️  {len(failed)}/{len(messages)} batch emails failed (attempt {attempt}/5), will retry")
+        countdown = get_exponential_backoff_interval(
+            factor=1, retries=self.request.retries, maximum=300, full_jitter=True
+        )
+        raise self.retry(args=(failed,), countdown=countdown)
+
+
+@celery_app.task(name="app.tasks.flush_alert_buffers", ignore_result=True)
+def flush_alert_buffers(fallback: bool = False):
+    """
+    Send everything buffered during the last ALERT_DIGEST_WINDOW seconds:
+    a digest for channels with more than ALERT_DIGEST_THRESHOLD monitors
+    changed, individual alerts otherwise, all emails in one Resend batch.
+
+    fallback=True is the beat run: it only drains when the flush scheduled
+    by buffer_alerts is missing or overdue. Alerts not yet handed to a send
+    task when the flush fails go back into the buffer.
+    """
+    if fallback and not alert_buffer.flush_overdue():
+        return {"channels": 0}
+
+    drained = alert_buffer.drain()
+    if not drained:
+        return {"channels": 0}
+
+    pending = dict(drained)
+    try:
+        digests, individual = _flush_channels(drained, pending)
+    except Exception:
+        if pending:
+            print(f"⚠️  Alert flush failed, returning {len(pending)} channels to the buffer")
+            alert_buffer.restore(pending)
+        raise
+
+    print(f"📤 Alert flush: {len(drained)} channels, {digests} digests, {individual} individual alerts")
+    return {"channels": len(drained), "digests": digests, "individual": individual}
+
+
+def _flush_channels(drained: dict, pending: dict) -> tuple:
+    """
+    Dispatch drained alerts; a channel is removed from `pending` once all of
+    its alerts are queued for sending. Returns (digests, individual alerts).
+    """
+    from app.alerts import RESEND_BATCH_SIZE, build_email_alert, build_email_digest
+
+    db = SessionLocal()
+    try:
+        channels = {
+            str(c.id): c
+            for c in db.query(AlertChannel).filter(AlertChannel.id.in_(list(drained))).all()
+        }
+    finally:
+        db.close()
+
+    emails, owners, digests, individual = [], [], 0, 0  # owners[i]: channel id of emails[i]
+    for channel_id, alerts in drained.items():
+        channel = channels.get(channel_id)
+        if not channel or not channel.is_active:
+            pending.pop(channel_id, None)
+            continue
+
+        if channel.type == "email":
+            address = channel.config.get("email")
+            if not address:
+                pending.pop(channel_id, None)
+                continue
+            if alert_buffer.wants_digest("email", alerts):
+                emails.append(build_email_digest(address, alerts))
+                owners.append(channel_id)
+                digests += 1
+            else:
+                emails.extend(
+                    build_email_alert(address, a["monitor_name"], a["monitor_url"],
+                                      a["new_status"], a["old_status"], a["ai_analysis"])
+                    for a in alerts
+                )
+                owners.extend([channel_id] * len(alerts))
+                individual += len(alerts)
+            continue
+
+        if alert_buffer.wants_digest(channel.type, alerts):
+            send_channel_digest.delay(channel.type, channel.config, alerts)
+            digests += 1
+        else:
+            for alert in alerts:
+                _send_individual(channel.type, channel.config, alert)
+            individual += len(alerts)
+        pending.pop(channel_id, None)
+
+    # One task per batch request: a failed batch never holds back or re-sends another
+    for i in range(0, len(emails), RESEND_BATCH_SIZE):
+        send_email_alert_batch.delay(emails[i:i + RESEND_BATCH_SIZE])
+        # A channel whose emails span two batches stays pending until the last one is queued
+        for channel_id in set(owners[i:i + RESEND_BATCH_SIZE]) - set(owners[i + RESEND_BATCH_SIZE:]):
+            pending.pop(channel_id, None)
+    return digests, individual
+
+
 @celery_app.task(name="app.tasks.check_ssl_certificates")
 def check_ssl_certificates():
     """
     Daily task: check SSL expiry for all active HTTPS monitors.
     Alerts if certificate expires within ssl_expiry_days.
+
+    Certificates seen by regular probes within SSL_SWEEP_STALE_HOURS are reused;
+    the remaining hosts are handshaked concurrently, once per host:port.
     """
     db = SessionLocal()
     try:
         monitors = db.query(Monitor).filter(
             Monitor.is_active == True,
             Monitor.ssl_check == True,
+            Monitor.url.like("https://%"),
         ).all()
 
-        https_monitors = [m for m in monitors if m.url.startswith("https://")]
-        print(f"[SSL] Checking {len(https_monitors)} HTTPS monitors")
-
-        for monitor in https_monitors:
-            expiry_dt = check_ssl_expiry(monitor.url)
+        now = datetime.utcnow()
+        stale_before = now - timedelta(hours=settings.SSL_SWEEP_STALE_HOURS)
+        stale = [
+            m for m in monitors
+            if host_port(m.url) and (m.ssl_last_checked is None or m.ssl_last_checked < stale_before)
+        ]
+        print(f"[SSL] {len(monitors)} HTTPS monitors, {len(stale)} stale")
+
+        expiries = fetch_cert_expiries(host_port(m.url) for m in stale)
+        print(f"[SSL] Checked {len(expiries)} distinct hosts")
+
+        # Only alert on expiries read recently (by a probe or this sweep): a stored
+        # value whose handshake failed today may belong to a since-renewed certificate
+        stale_ids = {str(m.id) for m in stale}
+        expires_at = {str(m.id): m.ssl_expires_at for m in monitors if str(m.id) not in stale_ids}
+        rows = []
+        for monitor in stale:
+            expiry_dt = expiries.get(host_port(monitor.url))
             if expiry_dt is None:
                 continue
+            rows.append({"id": str(monitor.id), "ssl_expires_at": expiry_dt, "ssl_last_checked": now})
+            expires_at[str(monitor.id)] = expiry_dt
 
-            monitor.ssl_expires_at = expiry_dt
-            monitor.ssl_last_checked = datetime.utcnow()
-            days_left = (expiry_dt - datetime.utcnow()).days
-            print(f"[SSL] {monitor.name}: {days_left} days left")
-
-            if days_left <= monitor.ssl_expiry_days:
-                print(f"[SSL] ALERT: {monitor.name} expires in {days_left} days")
-                label = monitor.name + " [SSL]"
-                msg_new = "expires in " + str(days_left) + " days"
-                msg_old = "valid"
-                for channel in monitor.alert_channels:
-                    if not channel.is_active:
-                        continue
-                    send_channel_alert.delay(
-                        channel.type, channel.config,
-                        label, monitor.url,
-                        msg_new, msg_old,
-                        str(monitor.id),
-                    )
+        expiring = []
+        for monitor in monitors:
+            expiry_dt = expires_at.get(str(monitor.id))
+            if expiry_dt is None:
+                continue
+            days_left = (expiry_dt - now).days
+            threshold = 14 if monitor.ssl_expiry_days is None else monitor.ssl_expiry_days
+            if days_left <= threshold:
+                expiring.append((monitor, days_left))
 
+        bulk_update_monitors(db, rows)
         db.commit()
-        return {"checked": len(https_monitors)}
+
+        for monitor, days_left in expiring:
+            print(f"[SSL] ALERT: {monitor.name} expires in {days_left} days")
+            label = monitor.name + " [SSL]"
+            msg_new = "expires in " + str(days_left) + " days"
+            msg_old = "valid"
+            for channel in monitor.alert_channels:
+                if not channel.is_active:
+                    continue
+                send_channel_alert.delay(
+                    channel.type, channel.config,
+                    label, monitor.url,
+                    msg_new, msg_old,
+                    str(monitor.id),
+                )
+
+        return {"checked": len(monitors), "handshakes": len(expiries), "alerted": len(expiring)}
     finally:
         db.close()
 
@@ -484,55 +632,195 @@ def check_heartbeat_monitors():
     """
     Check heartbeat monitors for missing pings.
     Runs every minute.
+
+    Expired monitors are found with one set-based query
+    (last_ping_at + interval + grace < now), marked down with one UPDATE,
+    their checks are inserted in bulk and alerts go out as one batch task.
     """
-    from datetime import timedelta
     db = SessionLocal()
     try:
-        from app.models import Monitor
-        monitors = db.query(Monitor).filter(
+        now = datetime.utcnow()
+        interval = func.coalesce(Monitor.heartbeat_interval, 5)
+        grace = func.coalesce(Monitor.heartbeat_grace, 5)
+
+        expired = db.query(
+            Monitor.id, Monitor.last_status, Monitor.last_ping_at,
+            Monitor.heartbeat_interval, Monitor.heartbeat_grace,
+        ).filter(
             Monitor.monitor_type == "heartbeat",
             Monitor.is_active == True,
-        ).all()
+            Monitor.last_ping_at.isnot(None),  # Never pinged yet — stay pending
+            Monitor.last_status.isnot(None),
+            Monitor.last_status != "down",
+            _deadline_passed(Monitor.last_ping_at, interval + grace, now),
+        ).with_for_update(skip_locked=True).all()
+
+        if not expired:
+            return {"alerted": 0}
+
+        ids = [str(row.id) for row in expired]
+        for chunk_start in range(0, len(ids), 1000):
+            db.query(Monitor).filter(
+                Monitor.id.in_(ids[chunk_start:chunk_start + 1000])
+            ).update(
+                {"last_status": "down", "last_checked_at": now, "updated_at": now},
+                synchronize_session=False,
+            )
+
+        # Record failed checks
+        checks = []
+        for row in expired:
+            elapsed = (now - row.last_ping_at).total_seconds() / 60
+            checks.append({
+                "id": generate_uuid(),
+                "monitor_id": str(row.id),
+                "status": "down",
+                "status_code": None,
+                "response_time": None,
+                "error_message": f"No ping received in {elapsed:.0f}m (expected every {row.heartbeat_interval or 5}m + {row.heartbeat_grace or 5}m grace)",
+                "checked_at": now,
+            })
+        bulk_insert_checks(db, checks)
+        db.commit()
+
+        status_cache.invalidate(ids)
+        send_alerts_batch.delay([[str(row.id), "down", row.last_status] for row in expired])
+        return {"alerted": len(expired)}
+    finally:
+        db.close()
+
 
-        alerted = 0
+@celery_app.task(name="app.tasks.refresh_status_pages")
+def refresh_status_pages(monitor_ids: list):
+    """
+    Rebuild the cached public status payloads and badges of monitors that
+    changed state (queued by status_cache.invalidate for pages that were
+    being served), overwriting the previous entries.
+    """
+    db = SessionLocal()
+    try:
+        monitors = db.query(Monitor).filter(Monitor.id.in_(monitor_ids)).all()
         for monitor in monitors:
-            if not monitor.last_ping_at:
-                continue  # Never pinged yet — stay pending
-
-            interval = monitor.heartbeat_interval or 5
-            grace = monitor.heartbeat_grace or 5
-            threshold_minutes = interval + grace
-
-            now = datetime.utcnow()
-            elapsed = (now - monitor.last_ping_at).total_seconds() / 60
-
-            if elapsed > threshold_minutes:
-                if monitor.last_status not in ("down", None):
-                    previous_status = monitor.last_status
-                    monitor.last_status = "down"
-                    monitor.last_checked_at = now
-                    monitor.updated_at = now
-
-                    # Record failed check
-                    from app.models import Check
-                    check = Check(
-                        monitor_id=str(monitor.id),
-                        status="down",
-                        status_code=None,
-                        response_time=None,
-                        error_message=f"No ping received in {elapsed:.0f}m (expected every {interval}m + {grace}m grace)",
-                        checked_at=now,
-                    )
-                    db.add(check)
-                    db.commit()
-
-                    send_alerts.delay(str(monitor.id), "down", previous_status or "pending")
-                    alerted += 1
-
-        return {"checked": len(monitors), "alerted": alerted}
+            status_cache.store(db, monitor)
+        return {"refreshed": len(monitors)}
     finally:
         db.close()
 
+
+@celery_app.task(name="app.tasks.flush_heartbeat_pings")
+def flush_heartbeat_pings():
+    """
+    Write heartbeat pings coalesced in Redis to the database.
+    Runs every HEARTBEAT_FLUSH_INTERVAL seconds.
+    """
+    from app.heartbeats import flush_pings
+
+    db = SessionLocal()
+    try:
+        return {"flushed": flush_pings(db)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.archive_old_checks")
+def archive_old_checks():
+    """
+    Move checks of months that ended more than ARCHIVE_AFTER_DAYS ago into
+    the Parquet archive (app/archive.py). Runs daily at 2 AM, before cleanup.
+    Only plans whose retention outlives the archive horizon are archived —
+    anything else is deleted by cleanup_old_checks anyway.
+    """
+    if not archive.is_enabled():
+        return {"archived": 0}
+
+    db = SessionLocal()
+    try:
+        horizon = archive.archive_horizon()
+        plans = [p for p, days in RETENTION_DAYS.items() if days > settings.ARCHIVE_AFTER_DAYS]
+        monitor_ids = [
+            str(m.id) for m in db.query(Monitor.id).join(User, User.id == Monitor.user_id).filter(
+                User.plan.in_(plans)
+            )
+        ]
+
+        total = 0
+        for monitor_id in monitor_ids:
+            total += archive.archive_monitor(db, monitor_id, horizon)
+        print(f"[archive] Moved {total} checks older than {horizon:%Y-%m-%d} to the archive")
+        return {"archived": total}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.maintain_check_partitions")
+def maintain_check_partitions():
+    """
+    Pre-create today's and the next CHECK_PARTITION_PREMAKE_DAYS daily
+    partitions of the checks table. No-op unless checks is partitioned
+    (Postgres, migration 0019).
+    """
+    db = SessionLocal()
+    try:
+        if not partitions.is_partitioned(db):
+            return {"created": 0}
+        created = partitions.ensure_partitions(db)
+        db.commit()
+        if created:
+            print(f"[partitions] Created {', '.join(created)}")
+        return {"created": len(created)}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _sweep_partitioned_checks(db: Session, now: datetime) -> int:
+    """
+    Delete checks past their plan's retention on a partitioned table, one day
+    (one partition) per statement and transaction, from the oldest partition
+    up to the latest cutoff. Plans whose cutoff is past the whole day share
+    a statement. Rows older than every daily partition can only be in
+    checks_default and get one DELETE per plan. Returns the rows deleted.
+    """
+    cutoffs = {plan: now - timedelta(days=days) for plan, days in RETENTION_DAYS.items()}
+    live = partitions.list_partitions(db)
+    if not live:
+        return 0
+
+    def delete(plans, start, end):
+        plan_monitors = select(Monitor.id).join(User, User.id == Monitor.user_id).where(User.plan.in_(plans))
+        expired = [Check.monitor_id.in_(plan_monitors), Check.checked_at < end]
+        if start is not None:
+            expired.append(Check.checked_at >= start)
+        deleted = db.query(Check).filter(*expired).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    oldest = datetime.combine(live[0][1], datetime.min.time())
+    deleted = 0
+    for plan, cutoff in cutoffs.items():
+        deleted += delete([plan], None, min(cutoff, oldest))
+
+    day = oldest
+    last_cutoff = max(cutoffs.values())
+    while day < last_cutoff:
+        next_day = day + timedelta(days=1)
+        whole = [plan for plan, cutoff in cutoffs.items() if cutoff >= next_day]
+        if whole:
+            deleted += delete(whole, day, next_day)
+        for plan, cutoff in cutoffs.items():
+            if day < cutoff < next_day:
+                deleted += delete([plan], day, cutoff)
+        day = next_day
+
+    print(f"[cleanup] Swept {deleted} expired checks from {oldest:%Y-%m-%d} to {last_cutoff:%Y-%m-%d}")
+    return deleted
+
+
 @celery_app.task(name="app.tasks.cleanup_old_checks")
 def cleanup_old_checks():
     """
@@ -544,38 +832,56 @@ def cleanup_old_checks():
         starter  -> 30 days
         pro      -> 90 days
         business -> 365 days
+
+    On a partitioned checks table, days past the longest retention are
+    dropped as whole partitions. The shorter retentions are then swept one
+    day at a time from the oldest remaining partition up to each plan's
+    cutoff (see _sweep_partitioned_checks), so every DELETE is pruned to a
+    single partition and nothing older than a cutoff is ever skipped — e.g.
+    after a downgrade from business to free.
     """
     db = SessionLocal()
 
     try:
         total_deleted = 0
+        now = datetime.utcnow()
+        partitioned = partitions.is_partitioned(db)
 
-        for plan, days in RETENTION_DAYS.items():
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-            user_ids = [
-                u.id for u in db.query(User.id).filter(User.plan == plan).all()
-            ]
-            if not user_ids:
-                continue
-
-            monitor_ids = [
-                m.id for m in db.query(Monitor.id).filter(
-                    Monitor.user_id.in_(user_ids)
-                ).all()
-            ]
-            if not monitor_ids:
-                continue
+        if partitioned:
+            cutoff_date = now - timedelta(days=max(RETENTION_DAYS.values()))
+            dropped = partitions.drop_partitions_before(db, cutoff_date)
+            db.commit()
+            print(f"[cleanup] Dropped {len(dropped)} check partitions older than {cutoff_date:%Y-%m-%d}")
+            total_deleted += _sweep_partitioned_checks(db, now)
 
-            deleted = db.query(Check).filter(
-                Check.monitor_id.in_(monitor_ids),
-                Check.checked_at < cutoff_date
+        for plan, days in RETENTION_DAYS.items():
+            cutoff_date = now - timedelta(days=days)
+            plan_monitors = select(Monitor.id).join(User, User.id == Monitor.user_id).where(User.plan == plan)
+
+            deleted = 0
+            if not partitioned:
+                deleted = db.query(Check).filter(
+                    Check.monitor_id.in_(plan_monitors),
+                    Check.checked_at < cutoff_date,
+                ).delete(synchronize_session=False)
+
+            # Hour buckets expire with the checks; day buckets are kept for long-range reports
+            db.query(CheckRollup).filter(
+                CheckRollup.monitor_id.in_(plan_monitors),
+                CheckRollup.period == "hour",
+                CheckRollup.bucket_start < cutoff_date
             ).delete(synchronize_session=False)
+            db.commit()
 
             total_deleted += deleted
-            print(f"[cleanup] {plan} plan: deleted {deleted} checks older than {days} days")
+            if not partitioned:
+                print(f"[cleanup] {plan} plan: deleted {deleted} checks older than {days} days")
+
+            if archive.is_enabled():
+                monitor_ids = [str(m.id) for m in db.execute(plan_monitors)]
+                removed = archive.delete_months_before(monitor_ids, cutoff_date)
+                print(f"[cleanup] {plan} plan: removed {removed} archived monitor-months")
 
-        db.commit()
         print(f"[cleanup] Total deleted: {total_deleted} checks")
 
         return {"deleted": total_deleted}
@@ -584,96 +890,213 @@ def cleanup_old_checks():
         db.close()
 
 
-@celery_app.task(name="app.tasks.send_monthly_sla_reports")
-def send_monthly_sla_reports():
+@celery_app.task(name="app.tasks.backfill_rollups")
+def backfill_rollups(monitor_ids: list = None, days: int = None):
     """
-    Monthly task (1st of each month, 9 AM UTC):
-    Send SLA report emails to all Pro/Business users.
+    Recompute check_rollups buckets from raw checks — run once after deploying
+    the rollup table, or to repair buckets for specific monitors.
+    Monitors are rebuilt and committed 100 at a time (sketches are built in memory).
     """
-    from app.alerts import send_sla_report_email
-    from app.models import AlertChannel
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        if monitor_ids is None:
+            monitor_ids = [str(m.id) for m in db.query(Monitor.id).all()]
+
+        written = 0
+        for i in range(0, len(monitor_ids), 100):
+            written += rebuild_rollups(db, monitor_ids[i:i + 100], since)
+            db.commit()
+        print(f"[rollups] Rebuilt {written} buckets")
+        return {"buckets": written}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+SKETCH_WATERMARK_KEY = "checkapi:rollups:sketched_from"
+
+
+@celery_app.task(name="app.tasks.refresh_rollup_sketches", ignore_result=True)
+def refresh_rollup_sketches():
+    """
+    Rebuild the latency sketches of recent hour buckets (and their days) from
+    raw checks, 500 monitors per transaction. Starts from the hour the last
+    successful run started in (at most a day back), so missed runs are caught up.
+    """
+    from app.redis_client import get_redis
+
+    now = datetime.utcnow()
+    since = now - timedelta(seconds=settings.ROLLUP_SKETCH_INTERVAL)
+    try:
+        watermark = get_redis().get(SKETCH_WATERMARK_KEY)
+        if watermark:
+            since = max(min(since, datetime.fromisoformat(watermark)), now - timedelta(days=1))
+    except Exception as e:
+        print(f"[rollups] Sketch watermark unavailable: {e}")
+    since = since.replace(minute=0, second=0, microsecond=0)
 
     db = SessionLocal()
     try:
-        now = datetime.utcnow()
+        monitor_ids = [str(m) for (m,) in db.query(CheckRollup.monitor_id).filter(
+            CheckRollup.period == "hour",
+            CheckRollup.bucket_start >= since,
+        ).distinct()]
+
+        written = 0
+        for i in range(0, len(monitor_ids), 500):
+            written += refresh_sketches(db, monitor_ids[i:i + 500], since)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        # Last month's range
-        first_of_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_month_end = first_of_this_month - timedelta(seconds=1)
-        last_month_start = last_month_end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_label = last_month_start.strftime("%B %Y")
+    try:
+        get_redis().set(SKETCH_WATERMARK_KEY, now.replace(minute=0, second=0, microsecond=0).isoformat())
+    except Exception:
+        pass
+    print(f"[rollups] Refreshed {written} bucket sketches for {len(monitor_ids)} monitors since {since:%Y-%m-%d %H:00}")
+    return {"monitors": len(monitor_ids), "buckets": written}
 
-        users = db.query(User).filter(User.plan.in_(["pro", "business"]), User.is_active == True).all()
-        print(f"[sla-report] Sending to {len(users)} Pro/Business users for {month_label}")
 
-        sent = 0
-        for user in users:
-            monitors = db.query(Monitor).filter(
-                Monitor.user_id == user.id,
-                Monitor.is_active == True,
-            ).all()
+@celery_app.task(name="app.tasks.backfill_incidents")
+def backfill_incidents(monitor_ids: list = None):
+    """
+    Re-derive the incidents table from raw checks — run once after deploying
+    it, or to repair specific monitors. Committed 100 monitors at a time.
+    """
+    db = SessionLocal()
+    try:
+        if monitor_ids is None:
+            monitor_ids = [str(m.id) for m in db.query(Monitor.id).all()]
 
-            if not monitors:
-                continue
+        written = 0
+        for i in range(0, len(monitor_ids), 100):
+            written += rebuild_incidents(db, monitor_ids[i:i + 100])
+            db.commit()
+        print(f"[incidents] Rebuilt {written} incidents")
+        return {"incidents": written}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-            monitors_data = []
-            for monitor in monitors:
-                checks = db.query(Check).filter(
-                    Check.monitor_id == monitor.id,
-                    Check.checked_at >= last_month_start,
-                    Check.checked_at <= last_month_end,
-                ).all()
 
-                if not checks:
-                    continue
+# Shard users are processed in groups of this size (two SLA queries per group)
+SLA_REPORT_USERS_PER_QUERY = 200
+
+
+def _shard_range(shard: int, shards: int) -> tuple:
+    """[lo, hi) of users.shard_key covered by one of `shards` shards."""
+    return shard * SHARD_KEY_RANGE // shards, (shard + 1) * SHARD_KEY_RANGE // shards
+
+
+@celery_app.task(name="app.tasks.send_monthly_sla_reports")
+def send_monthly_sla_reports(month: str = None):
+    """
+    Monthly task (1st of each month, 9 AM UTC):
+    Send SLA report emails to all Pro/Business users.
+
+    Fans out one send_sla_report_shard task per user shard
+    (SLA_REPORT_SHARDS), so the run is spread across workers. Safe to re-run
+    for the same month — users already recorded in sla_report_deliveries are
+    skipped.
+    month: "YYYY-MM", defaults to last month.
+    """
+    if month is None:
+        first_of_this_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month = add_months(first_of_this_month, -1).strftime("%Y-%m")
 
-                total = len(checks)
-                up_count = sum(1 for c in checks if c.status == "up")
-                uptime_pct = round((up_count / total) * 100, 3)
+    shards = settings.SLA_REPORT_SHARDS
+    for shard in range(shards):
+        send_sla_report_shard.delay(month, shard, shards)
+    print(f"[sla-report] Dispatched {shards} shards for {month}")
+    return {"month": month, "shards": shards}
 
-                downtime_seconds = 0
-                in_incident = False
-                incident_start = None
-                incidents = 0
 
-                for c in sorted(checks, key=lambda x: x.checked_at):
-                    if c.status in ["down", "degraded"] and not in_incident:
-                        in_incident = True
-                        incident_start = c.checked_at
-                        incidents += 1
-                    elif c.status == "up" and in_incident:
-                        in_incident = False
-                        if incident_start:
-                            downtime_seconds += (c.checked_at - incident_start).total_seconds()
+@celery_app.task(
+    name="app.tasks.send_sla_report_shard",
+    acks_late=True,  # a shard lost with its worker is redelivered and resumes
+    reject_on_worker_lost=True,
+)
+def send_sla_report_shard(month: str, shard: int, shards: int):
+    """
+    Send the SLA report emails for one user shard. Each delivery is recorded
+    and committed right after its email, so a crashed shard resumes where it
+    stopped (at worst one email is sent twice).
+    """
+    from app.alerts import send_sla_report_email
 
-                if in_incident and incident_start:
-                    downtime_seconds += (last_month_end - incident_start).total_seconds()
+    db = SessionLocal()
+    try:
+        month_start = datetime.strptime(month, "%Y-%m")
+        month_label = month_start.strftime("%B %Y")
+        months = [(month_start, add_months(month_start, 1))]
+
+        lo, hi = _shard_range(shard, shards)
+        delivered = db.query(SlaReportDelivery.user_id).filter(
+            SlaReportDelivery.user_id == User.id,
+            SlaReportDelivery.month == month,
+        ).exists()
+        users = db.query(User.id, User.email, User.name).filter(
+            User.shard_key >= lo,
+            User.shard_key < hi,
+            User.plan.in_(["pro", "business"]),
+            User.is_active == True,
+            ~delivered,
+        ).all()
+        print(f"[sla-report] Shard {shard}/{shards}: {len(users)} users for {month_label}")
 
-                response_times = [c.response_time for c in checks if c.response_time]
-                avg_response = int(sum(response_times) / len(response_times)) if response_times else 0
+        sent = 0
+        for i in range(0, len(users), SLA_REPORT_USERS_PER_QUERY):
+            group = users[i:i + SLA_REPORT_USERS_PER_QUERY]
+            monitors = db.query(Monitor.id, Monitor.user_id, Monitor.name, Monitor.url).filter(
+                Monitor.user_id.in_([u.id for u in group]),
+                Monitor.is_active == True,
+            ).all()
+            sla = monthly_sla(db, [str(m.id) for m in monitors], months)
 
-                monitors_data.append({
+            by_user = {}
+            for monitor in monitors:
+                stats = sla[str(monitor.id)][0]
+                if not stats["total_checks"]:
+                    continue
+                by_user.setdefault(str(monitor.user_id), []).append({
                     "name": monitor.name,
                     "url": monitor.url,
-                    "uptime_percentage": uptime_pct,
-                    "downtime_minutes": round(downtime_seconds / 60, 1),
-                    "incidents": incidents,
-                    "avg_response_time": avg_response,
+                    "uptime_percentage": stats["uptime_percentage"],
+                    "downtime_minutes": stats["downtime_minutes"],
+                    "incidents": stats["incidents"],
+                    "avg_response_time": stats["avg_response_time"],
                 })
 
-            if not monitors_data:
-                continue
-
-            ok = send_sla_report_email(
-                user_email=user.email,
-                user_name=user.name or "",
-                month_label=month_label,
-                monitors_data=monitors_data,
-            )
-            if ok:
-                sent += 1
+            for user in group:
+                monitors_data = by_user.get(str(user.id))
+                if not monitors_data:
+                    continue
 
-        print(f"[sla-report] Done — sent {sent}/{len(users)} reports")
+                ok = send_sla_report_email(
+                    user_email=user.email,
+                    user_name=user.name or "",
+                    month_label=month_label,
+                    monitors_data=monitors_data,
+                )
+                if ok:
+                    sent += 1
+                    try:
+                        db.add(SlaReportDelivery(user_id=str(user.id), month=month))
+                        db.commit()
+                    except IntegrityError:
+                        # A redelivered copy of this shard recorded it first
+                        db.rollback()
+                        print(f"[sla-report] {user.email} already recorded for {month}")
+
+        print(f"[sla-report] Shard {shard}/{shards} done — sent {sent}/{len(users)} reports")
         return {"sent": sent, "total_users": len(users)}
 
     finally:
@@ -1,12 +1,15 @@
 #!/bin/bash
 
-# Run Celery worker and beat (scheduler)
+# Run Celery worker, beat and the check scheduler
 
 # Celery worker
 celery -A app.celery_app worker --loglevel=info --concurrency=4 &
 
-# Celery beat (scheduler)
+# Celery beat (periodic tasks; check_monitors only runs while app.scheduler is down)
 celery -A app.celery_app beat --loglevel=info &
 
-# Wait for both processes
+# Check scheduler (dispatches each monitor at its own due time; one leader across replicas)
+python -m app.scheduler &
+
+# Wait for all processes
 wait
@@ -0,0 +1,173 @@
+"""
+Benchmark the hot check/monitor queries before and after the indexes of
+migration 0020 (ix_checks_monitor_checked, ix_monitors_due).
+
+Seeds a scratch schema (bench) — the app's tables are never touched — with
+BENCH_MONITORS monitors and BENCH_ROWS checks (default 10M) spread over 90
+days, records EXPLAIN (ANALYZE, BUFFERS) of each query with only the old
+single-column indexes, adds the new ones, and records the plans again.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_check_indexes.py
+    BENCH_ROWS=1000000 BENCH_KEEP=1 ...   (smaller run / keep the bench schema)
+
+Writes reports/index-benchmark-<date>.md.
+"""
+
+import os
+import time
+from datetime import datetime
+
+import psycopg2
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL not set")
+    exit(1)
+
+ROWS = int(os.environ.get("BENCH_ROWS", 10_000_000))
+MONITORS = int(os.environ.get("BENCH_MONITORS", 2000))
+KEEP = os.environ.get("BENCH_KEEP") == "1"
+
+QUERIES = {
+    "check list keyset page (get_monitor_checks)": """
+        SELECT * FROM bench.checks
+        WHERE monitor_id = %(monitor_id)s AND checked_at >= now() - interval '30 days'
+          AND checked_at < now() - interval '1 day'
+        ORDER BY checked_at DESC LIMIT 50
+    """,
+    "24h history (public get_check_history)": """
+        SELECT checked_at, status, response_time, status_code FROM bench.checks
+        WHERE monitor_id = %(monitor_id)s AND checked_at >= now() - interval '24 hours'
+        ORDER BY checked_at
+    """,
+    "90-day uptime from raw checks (calculate_uptime, rollup rebuild)": """
+        SELECT count(*), count(*) FILTER (WHERE status = 'up'), avg(response_time)
+        FROM bench.checks
+        WHERE monitor_id = %(monitor_id)s AND checked_at >= now() - interval '90 days'
+    """,
+    "scheduler due scan (check_monitors)": """
+        SELECT id FROM bench.monitors
+        WHERE is_active AND (next_check_at IS NULL OR next_check_at <= now())
+    """,
+}
+
+NEW_INDEXES = [
+    "CREATE INDEX ix_checks_monitor_checked ON bench.checks (monitor_id, checked_at) "
+    "INCLUDE (status, response_time, status_code)",
+    "DROP INDEX bench.ix_checks_monitor_id",
+    "CREATE INDEX ix_monitors_due ON bench.monitors (next_check_at) WHERE is_active",
+]
+
+conn = psycopg2.connect(DATABASE_URL)
+conn.autocommit = True
+cur = conn.cursor()
+
+
+def seed():
+    print(f"Seeding {MONITORS} monitors / {ROWS} checks into schema bench...")
+    started = time.time()
+    cur.execute("DROP SCHEMA IF EXISTS bench CASCADE")
+    cur.execute("CREATE SCHEMA bench")
+    cur.execute("""
+        CREATE TABLE bench.monitors (
+            id VARCHAR(36) PRIMARY KEY,
+            is_active BOOLEAN,
+            next_check_at TIMESTAMP
+        )
+    """)
+    # 10% paused, due times spread over the next ~5 minutes (a few are due now)
+    cur.execute("""
+        INSERT INTO bench.monitors
+        SELECT md5(i::text), i %% 10 <> 0, now() + (i %% 300 - 5) * interval '1 second'
+        FROM generate_series(1, %s) i
+    """, (MONITORS,))
+    cur.execute("""
+        CREATE TABLE bench.checks (
+            id VARCHAR(36) PRIMARY KEY,
+            monitor_id VARCHAR(36) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            status_code INTEGER,
+            response_time INTEGER,
+            error_message TEXT,
+            checked_at TIMESTAMP NOT NULL
+        )
+    """)
+    # Round-robin over monitors, evenly spaced over 90 days (like a scheduler would write them)
+    cur.execute("""
+        INSERT INTO bench.checks
+        SELECT md5('c' || i::text),
+               md5((i %% %(monitors)s + 1)::text),
+               CASE WHEN random() < 0.02 THEN 'down' WHEN random() < 0.03 THEN 'degraded' ELSE 'up' END,
+               200,
+               (50 + random() * 400)::int,
+               NULL,
+               now() - interval '90 days' + (i::float / %(rows)s) * interval '90 days'
+        FROM generate_series(1, %(rows)s) i
+    """, {"monitors": MONITORS, "rows": ROWS})
+    # The indexes the tables had before 0020 (0001 + 0006)
+    cur.execute("CREATE INDEX ix_checks_monitor_id ON bench.checks (monitor_id)")
+    cur.execute("CREATE INDEX ix_checks_checked_at ON bench.checks (checked_at)")
+    cur.execute("CREATE INDEX ix_monitors_is_active ON bench.monitors (is_active)")
+    cur.execute("VACUUM ANALYZE bench.checks")
+    cur.execute("VACUUM ANALYZE bench.monitors")
+    print(f"Seeded in {time.time() - started:.0f}s")
+
+
+def explain_all():
+    params = {"monitor_id": "c4ca4238a0b923820dcc509a6f75849b"}  # md5('1')
+    plans = {}
+    for name, sql in QUERIES.items():
+        cur.execute(sql, params)  # warm the cache once
+        cur.fetchall()
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+        plans[name] = "\n".join(row[0] for row in cur.fetchall())
+    return plans
+
+
+def execution_ms(plan):
+    for line in plan.splitlines():
+        if line.startswith("Execution Time:"):
+            return float(line.split()[2])
+    return None
+
+
+seed()
+before = explain_all()
+
+started = time.time()
+for statement in NEW_INDEXES:
+    cur.execute(statement)
+cur.execute("VACUUM ANALYZE bench.checks")
+cur.execute("VACUUM ANALYZE bench.monitors")
+print(f"New indexes built in {time.time() - started:.0f}s")
+
+after = explain_all()
+
+cur.execute("SELECT pg_size_pretty(pg_relation_size('bench.ix_checks_monitor_checked'))")
+index_size = cur.fetchone()[0]
+
+lines = [
+    f"# Check index benchmark — {datetime.utcnow():%Y-%m-%d}",
+    "",
+    f"{ROWS:,} checks over 90 days, {MONITORS:,} monitors. "
+    f"ix_checks_monitor_checked size: {index_size}.",
+    "",
+    "| Query | Before (ms) | After (ms) |",
+    "|---|---|---|",
+]
+for name in QUERIES:
+    lines.append(f"| {name} | {execution_ms(before[name])} | {execution_ms(after[name])} |")
+for name in QUERIES:
+    lines += ["", f"## {name}", "", "Before:", "```", before[name], "```", "After:", "```", after[name], "```"]
+
+os.makedirs("reports", exist_ok=True)
+path = f"reports/index-benchmark-{datetime.utcnow():%Y-%m-%d}.md"
+with open(path, "w", encoding="utf-8") as f:
+    f.write("\n".join(lines) + "\n")
+print(f"Report written to {path}")
+
+if not KEEP:
+    cur.execute("DROP SCHEMA bench CASCADE")
+cur.close()
+conn.close()